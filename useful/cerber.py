@@ -7,26 +7,61 @@ Cerber - program do pilnowania zmian w plikach.
 Program sprawdzający czy i jakie zmiany zaszły w zawartości danego
 katalogu, tj. czy są nowe pliki oraz czy pliki zostały skasowane,
 przeniesione, zmienione lub nazwane inaczej. Program działa w ten sposób
-że nazwy plików i wartości funkcji skrótu (SHA-1) zapamiętuje w osobnym
-pliku cerber.p i przy kolejnych uruchomieniach porównuje stan obecny
-z tym co było zapamiętane oraz zapisuje plik cerber.p na nowo.
+że nazwy plików i wartości funkcji skrótu (domyślnie SHA-1, inną można
+wybrać opcją --algorithm) zapamiętuje w osobnym
+pliku cerber.db (baza danych SQLite) i przy kolejnych uruchomieniach
+porównuje stan obecny z tym co było zapamiętane oraz zapisuje w cerber.db
+zmiany. Starsze wersje zapisywały dane w pliku cerber.p, jest on czytany
+jeżeli nie ma jeszcze pliku cerber.db.
+
+W pliku cerber.db są zapamiętywane także wielkości, czasy modyfikacji
+i numery i-węzłów plików. Jeżeli się nie zmieniły, to wartość skrótu
+nie jest obliczana ponownie, bo jest brana z cerber.db. Opcja --paranoid
+wymusza obliczenie wartości skrótu wszystkich plików.
+
+Co minutę (--checkpoint-interval) już obliczone skróty są zapisywane
+w cerber.db, dlatego przerwane sprawdzanie folderu zaczyna się przy
+następnym uruchomieniu tam, gdzie zostało przerwane.
+
+W sieciowych systemach plików (NFS, SMB) czas zajmuje głównie czekanie na
+odpowiedzi serwera; opcja --async wykonuje wtedy wiele operacji na plikach
+jednocześnie (--in-flight), patrz create_digests_async().
+
+Opcja --progress wypisuje postęp pracy, a --profile PREFIX zapisuje profil
+cProfile (PREFIX.pstats) oraz czasy, liczby plików i bajtów w kolejnych
+etapach (PREFIX.json), patrz klasa Instruments.
+
+Opcja --format jsonl (lub csv) zamiast raportu tekstowego zapisuje rekordy
+JSON Lines (lub CSV), jeden rekord na każdą zmianę, przeznaczone dla innych
+programów. Rekordy są zapisywane na bieżąco, bez gromadzenia ich w pamięci;
+opcja --sort porządkuje je tak jak raport tekstowy, sortując przez pliki
+tymczasowe (sortowanie zewnętrzne).
+
+Klasa Snapshot przechowuje listę plików w zwartej postaci (wspólne nazwy
+folderów, skróty i nazwy plików w buforach bytearray i array), zajmującej
+kilka razy mniej pamięci niż lista krotek - patrz cerber_benchmark.py.
+Snapshot.merkle() oblicza skróty folderów (drzewo Merkle'a), dzięki którym
+iter_snapshot_changes() porównuje tylko pliki w zmienionych folderach.
+Tak są porównywane dwa zapisane stany (np. dwie kopie zapasowe) przez
+
+    python3 cerber.py diff A B
+
+gdzie A i B to foldery z plikami cerber.db albo same pliki baz danych.
 
 Obecna wersja nie jest doskonała.
 
-Aby obliczyć wartości skrótu wczytuje całe pliki, dlatego jest
-odpowiednia tylko dla niezbyt wielkich plików i może zawieść gdy natrafi
-np. na wielogigabajtowe pliki multimedialne (filmy).
-
-Problemem może być także wydajność jeżeli plików będzie dużo.
-Zastosowane algorytmy, przy założeniu że mamy N plików bez zmian, mają
-koszt O(N**2), tj. kwadratowy, bo porównują dane o każdym pliku nowym
-z danymi o każdym pliku starym. Zastosowanie słowników umożliwiłoby czas
-liniowy O(N), bo choć nadal mielibyśmy N plików do sprawdzenia,
-ale koszt wyszukiwania w słowniku (hash map) jest O(1), czyli stały.
-Przy 1000 plików mamy obecnie jednak tylko milion porównań. Dlatego
-w obecnej wersji program da sobie radę z np. kontrolą plików jednego
-projektu. Nie nadaje się do "wszystkich plików na komputerze PC",
-których - jak można to oszacować - będzie nieco ponad milion.
+Aby obliczyć wartości skrótu czyta pliki blokami (domyślnie po 1 MiB),
+dlatego radzi sobie także z wielogigabajtowymi plikami multimedialnymi
+(filmami) - zużycie pamięci nie zależy od wielkości plików.
+
+Pierwsze wersje programu porównywały dane o każdym pliku nowym z danymi
+o każdym pliku starym, co przy N plikach bez zmian dawało koszt O(N**2),
+tj. kwadratowy. Obecnie raporty są wyznaczane na podstawie słowników
+(klasa DigestsIndex) budowanych jednokrotnie dla starej i dla nowej listy
+plików. Koszt wyszukiwania w słowniku (hash map) jest O(1), czyli stały,
+więc cały koszt porównania jest liniowy O(N). Dzięki temu program nadaje
+się także do "wszystkich plików na komputerze PC", których - jak można
+to oszacować - będzie nieco ponad milion.
 
 CC-BY-NC-ND 2022 Sławomir Marczyński
 """
@@ -34,29 +69,74 @@ CC-BY-NC-ND 2022 Sławomir Marczyński
 # pylint: disable=unused-variable, too-many-locals, line-too-long
 
 
+import argparse
+import asyncio
+import cProfile
+import csv
+import fnmatch
 import hashlib
+import heapq
+import json
+import mmap
 import os
 import pickle
+import sqlite3
 import sys
-from collections import defaultdict
+import tempfile
+import threading
+import time
+from array import array
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import closing, contextmanager, nullcontext
+from functools import cached_property
+from itertools import groupby
+from operator import itemgetter
 
 DEFAULT_FOLDER = '.'
-DIGESTS_FILE_NAME = 'cerber.p'
+DIGESTS_STORE_NAME = 'cerber.db'
+DIGESTS_FILE_NAME = 'cerber.p'  # plik zapisywany przez starsze wersje
+DIGEST_BLOCK_SIZE = 1024 * 1024  # bajtów czytanych jednorazowo z pliku
+PENDING_PER_JOB = 16  # ile plików może czekać w kolejce na jeden wątek
+ASYNC_IN_FLIGHT = 64  # jednocześnie wykonywane operacje w create_digests_async()
+CHECKPOINT_INTERVAL = 60.0  # sekundy między zapisami częściowych wyników
+PROGRESS_INTERVAL = 0.5  # sekundy między zmianami linii z postępem (--progress)
+PARTIAL_DIGEST_SIZE = 64 * 1024  # fragmenty plików sprawdzane w find_duplicates()
+PARTIAL_DIGEST_MEMORY = 64 * 1024 * 1024  # bajtów końcówek plików trzymanych w pamięci
+STORE_CACHE_FOLDERS = 256  # foldery trzymane w pamięci przez StoreCache
+
+# Dostępne funkcje skrótu. MD5 i SHA-1 nie są już uważane za bezpieczne
+# kryptograficznie, ale do wykrywania przypadkowych zmian w plikach
+# w zupełności wystarczają. Która funkcja jest najszybsza zależy od procesora
+# (np. czy ma instrukcje SHA), można to sprawdzić programem cerber_benchmark.py.
+#
+HASH_ALGORITHMS = {
+    'sha1': hashlib.sha1,
+    'sha256': hashlib.sha256,
+    'blake2b': hashlib.blake2b,
+    'blake2s': hashlib.blake2s,
+    'md5': hashlib.md5,
+}
+DEFAULT_ALGORITHM = 'sha1'
+
+WATCH_INTERVAL = 0.2  # sekundy między sprawdzeniami folderów w trybie --watch
+WATCH_SETTLE = 0.3  # sekundy bez zmian zanim zostanie wypisany raport
+WATCH_MAX_DELAY = 5.0  # maksymalne opóźnienie raportu przy ciągłych zmianach
+WATCH_FULL_INTERVAL = 60.0  # sekundy między sprawdzeniami wszystkich plików
 
 REPORT_LINES_LEN = 80
+REPORT_SORT_CHUNK = 100_000  # rekordów sortowanych w pamięci przez --sort
+REPORT_PICKLE_BATCH = 1000  # rekordów zapisywanych jednym pickle.dump()
 
 
-def load_digests(folder):
+def load_pickle(folder):
     """
-    Odtworzenie danych o tym jakie pliki były w danym folderze.
+    Odtworzenie danych zapisanych przez starsze wersje programu.
 
-    Jest czytany plik pikle ze wskazanego folderu i o nazwie w zmiennej
-    globalnej DIGESTS_FILE_NAME. W tym pliku powinny być wszystkie
-    niezbędne informacje o tym co było wcześniej i z czym będziemy
-    porównywali stan obecny. Jest jednak możliwe że albo ten plik jest
-    pusty (tzn. nie ma w nim wpisów na temat plików), albo nawet nie ma
-    tego pliku. W takim przypadku funkcja load_digest() też zadziała,
-    tyle że zwróci listę pustą.
+    Starsze wersje programu zapisywały dane w pliku pikle o nazwie
+    w zmiennej globalnej DIGESTS_FILE_NAME: najpierw tylko listę krotek,
+    potem słownik z listą krotek i słownikiem wielkości, czasów modyfikacji
+    i numerów i-węzłów. Oba formaty są poprawnie czytane.
 
     Argumenty:
         folder: nazwa folderu w którym ma być plik o nazwie podanej
@@ -66,89 +146,1519 @@ def load_digests(folder):
         DIGESTS_FILE_NAME: nazwa pliku do przechowywania "pikla".
 
     Zwraca:
-        albo listę zawierającą krotki opisujące kolejne pliki, utworzoną
-        wcześniej przez dump_digests(), albo listę pustą jeżeli nie uda
-        się przeczytanie "pikla".
-
+        parę: listę krotek i słownik, tak jak DigestsStore.load(), albo
+        None jeżeli nie uda się przeczytanie "pikla".
     """
-    # @todo: biblioteka pickle nie jest bezpieczna i być może należałoby
-    #        mieć dane w innej postaci, np. w formacie JSON lub XML.
+    # @todo: biblioteka pickle nie jest bezpieczna, dlatego dane są teraz
+    #        zapisywane w bazie danych SQLite, a pikle są czytane tylko
+    #        po to, aby przenieść je do tej bazy.
 
-    digests_and_names_list = []
     try:
         file_name = os.path.join(folder, DIGESTS_FILE_NAME)
         with open(file_name, 'rb') as pickle_file:
-            digests_and_names_list = pickle.load(pickle_file)
+            state = pickle.load(pickle_file)
     except IOError:
-        pass
+        return None
+    if isinstance(state, list):
+        return state, {}
+    return state['digests'], state['stats']
+
+
+class DigestsStore:
+    """
+    Baza danych SQLite z informacjami o plikach.
+
+    W przeciwieństwie do pliku pikle, który trzeba było za każdym razem
+    czytać i zapisywać w całości, baza danych pozwala przeczytać tylko
+    potrzebne wiersze (np. pliki z danego folderu albo pliki o danej
+    wartości funkcji skrótu - są do tego indeksy) i zmieniać tylko te
+    wiersze, które dotyczą zmienionych plików.
+
+    W bazie danych jest także zapisana nazwa funkcji skrótu (atrybut
+    algorithm), tak aby nie porównywać skrótów obliczonych różnymi
+    funkcjami.
+
+    Obiekty DigestsStore są menadżerami kontekstu, tzn. mogą być użyte
+    w instrukcji with, która zadba o zamknięcie bazy danych.
+    """
+
+    def __init__(self, folder, file_name=None):
+        """
+        Inicjalizuje obiekt DigestsStore, w razie potrzeby tworzy bazę.
+
+        Jeżeli bazy danych jeszcze nie ma, a jest plik pikle zapisany przez
+        starszą wersję programu, to dane z pliku pikle są przenoszone do
+        nowo utworzonej bazy danych.
+
+        Argumenty:
+            folder: nazwa folderu w którym ma być plik o nazwie podanej
+                w DIGESTS_STORE_NAME.
+            file_name: nazwa pliku bazy danych, jeżeli ma to być inny plik
+                niż DIGESTS_STORE_NAME w folderze folder.
+
+        Globalne:
+            DIGESTS_STORE_NAME: nazwa pliku bazy danych.
+        """
+        if file_name is None:
+            file_name = os.path.join(folder, DIGESTS_STORE_NAME)
+        self.file_name = file_name
+        is_new = not os.path.exists(file_name)
+        self._connection = sqlite3.connect(file_name)
+        self._connection.executescript('''
+            CREATE TABLE IF NOT EXISTS files (
+                full TEXT NOT NULL UNIQUE,
+                digest BLOB NOT NULL,
+                name TEXT NOT NULL,
+                path TEXT NOT NULL,
+                size INTEGER,
+                mtime_ns INTEGER,
+                inode INTEGER);
+            CREATE INDEX IF NOT EXISTS files_digest ON files (digest);
+            CREATE INDEX IF NOT EXISTS files_path ON files (path);
+            CREATE TABLE IF NOT EXISTS checkpoint (
+                full TEXT NOT NULL UNIQUE,
+                digest BLOB NOT NULL,
+                name TEXT NOT NULL,
+                path TEXT NOT NULL,
+                size INTEGER,
+                mtime_ns INTEGER,
+                inode INTEGER);
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT);
+            ''')
+        if is_new:
+            state = load_pickle(folder)
+            if state is not None:
+                digests_and_names_list, stats = state
+                self.update(digests_and_names_list, stats)
+
+        # Starsze wersje programu nie zapisywały nazwy funkcji skrótu,
+        # ale zawsze używały SHA-1.
+        #
+        if self.algorithm is None and self._connection.execute(
+                'SELECT EXISTS (SELECT 1 FROM files)').fetchone()[0]:
+            self.algorithm = 'sha1'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Zamyka bazę danych."""
+        self._connection.close()
+
+    def _get_meta(self, key):
+        row = self._connection.execute(
+            'SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row is not None else None
+
+    def _set_meta(self, key, value):
+        with self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+                (key, value))
+
+    @property
+    def algorithm(self):
+        """Nazwa funkcji skrótu albo None, jeżeli baza jest nowa."""
+        return self._get_meta('algorithm')
+
+    @algorithm.setter
+    def algorithm(self, name):
+        self._set_meta('algorithm', name)
+
+    @property
+    def root(self):
+        """
+        Nazwa sprawdzanego folderu (taka jak w wywołaniu programu), od której
+        zaczynają się pełne nazwy plików, albo None jeżeli nie jest znana
+        (starsze wersje programu jej nie zapisywały).
+        """
+        return self._get_meta('root')
+
+    @root.setter
+    def root(self, folder):
+        self._set_meta('root', folder)
+
+    def _select(self, condition='', parameters=(), table='files'):
+        cursor = self._connection.execute(
+            f'SELECT digest, name, path, full, size, mtime_ns, inode FROM {table} '
+            + condition + ' ORDER BY rowid', parameters)
+        digests_and_names_list = []
+        stats = {}
+        for digest, name, path, full, size, mtime_ns, inode in cursor:
+            digests_and_names_list.append((digest, name, path, full))
+            if size is not None:
+                stats[full] = size, mtime_ns, inode
+        return digests_and_names_list, stats
+
+    def load(self):
+        """
+        Czyta informacje o wszystkich plikach.
+
+        Zwraca:
+            parę: listę zawierającą krotki opisujące kolejne pliki oraz
+            słownik, którego kluczami są pełne nazwy plików, a wartościami
+            krotki (wielkość, czas modyfikacji w ns, numer i-węzła).
+        """
+        return self._select()
+
+    def load_snapshot(self):
+        """
+        Czyta informacje o wszystkich plikach do zwartej listy Snapshot.
+
+        Wiersze są dodawane do obiektu Snapshot po kolei, bez tworzenia
+        listy krotek. Wielkości i czasy modyfikacji nie są czytane.
+
+        Zwraca:
+            obiekt Snapshot.
+        """
+        snapshot = Snapshot()
+        for digest, name, path, full in self._connection.execute(
+                'SELECT digest, name, path, full FROM files ORDER BY rowid'):
+            snapshot.append(digest, name, path, full)
+        return snapshot
+
+    def load_path(self, path):
+        """
+        Czyta informacje o plikach w danym folderze (bez podfolderów).
+
+        Zwraca:
+            parę: listę krotek i słownik, tak jak load().
+        """
+        return self._select('WHERE path = ?', (path,))
+
+    def load_digest(self, digest):
+        """
+        Czyta informacje o plikach o danej wartości funkcji skrótu.
+
+        Zwraca:
+            parę: listę krotek i słownik, tak jak load().
+        """
+        return self._select('WHERE digest = ?', (digest,))
+
+    def update(self, changed, stats=None, removed=(), table='files'):
+        """
+        Zapisuje zmienione i usuwa nieistniejące już pliki.
+
+        Argumenty:
+            changed: lista krotek opisujących pliki nowe lub zmienione;
+                wiersze dla plików o tej samej pełnej nazwie są zastępowane.
+            stats: słownik z wielkościami, czasami modyfikacji i numerami
+                i-węzłów plików, taki jak wypełnia create_digests();
+                może być None.
+            removed: pełne nazwy plików, które mają być usunięte z bazy.
+            table: nazwa tabeli, 'files' albo 'checkpoint'.
+        """
+        if stats is None:
+            stats = {}
+        with self._connection:  # transakcja
+            self._connection.executemany(
+                f'DELETE FROM {table} WHERE full = ?',
+                ((full,) for full in removed))
+            self._connection.executemany(
+                f'INSERT INTO {table} (full, digest, name, path, size, mtime_ns, inode)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?)'
+                ' ON CONFLICT (full) DO UPDATE SET digest = excluded.digest,'
+                ' name = excluded.name, path = excluded.path, size = excluded.size,'
+                ' mtime_ns = excluded.mtime_ns, inode = excluded.inode',
+                ((full, digest, name, path) + stats.get(full, (None, None, None))
+                 for digest, name, path, full in changed))
+
+    def synchronize(self, digests_and_names_list, stats=None):
+        """
+        Zapisuje nowy stan, zmieniając tylko te wiersze, które się różnią.
+
+        Daje ten sam wynik co update_store(), ale bez czytania całej bazy
+        do pamięci: wiersze są czytane kolejno, posortowane według pełnych
+        nazw (jest na nich indeks), i porównywane z listą nowych plików też
+        posortowaną według pełnych nazw (złączanie przez scalanie, merge
+        join). W pamięci są tylko numery plików w kolejności sortowania oraz
+        listy zmienionych i usuniętych plików.
+
+        Argumenty:
+            digests_and_names_list: lista krotek opisujących wszystkie pliki.
+            stats: słownik jak w update(), może być None.
+
+        Zwraca:
+            liczbę zmienionych i usuniętych wierszy bazy danych.
+        """
+        if stats is None:
+            stats = {}
+        order = sorted(range(len(digests_and_names_list)),
+                       key=lambda index: digests_and_names_list[index][3])
+        new_sorted = [digests_and_names_list[index] for index in order]
+        n_new = len(new_sorted)
+        changed = []
+        removed = []
+        position = 0
+        for full, digest, name, path, size, mtime_ns, inode in self._connection.execute(
+                'SELECT full, digest, name, path, size, mtime_ns, inode'
+                ' FROM files ORDER BY full'):
+            while position < n_new and new_sorted[position][3] < full:
+                changed.append(order[position])  # nowy plik
+                position += 1
+            if position < n_new and new_sorted[position][3] == full:
+                new_digest, new_name, new_path, new_full = new_sorted[position]
+                if (new_digest != digest or new_name != name or new_path != path
+                        or stats.get(full) != ((size, mtime_ns, inode) if size is not None
+                                               else None)):
+                    changed.append(order[position])
+                position += 1
+            else:
+                removed.append(full)
+        changed.extend(order[position:])
+        changed.sort()  # w kolejności z listy, tak jak w update_store()
+        self.update([digests_and_names_list[index] for index in changed], stats, removed)
+        return len(changed) + len(removed)
+
+    def save_checkpoint(self, digests_and_names_list, stats, algorithm):
+        """
+        Zapisuje pliki, dla których obliczono już skróty w przerwanym
+        (jeszcze nie zakończonym) sprawdzaniu folderu.
+
+        Argumenty:
+            digests_and_names_list: lista krotek opisujących pliki.
+            stats: słownik z wielkościami, czasami modyfikacji i numerami
+                i-węzłów, tak jak w update().
+            algorithm: nazwa funkcji skrótu; jeżeli zapisane wcześniej skróty
+                były obliczone inną funkcją, to są najpierw usuwane.
+        """
+        if self._get_meta('checkpoint_algorithm') != algorithm:
+            self.clear_checkpoint()
+            self._set_meta('checkpoint_algorithm', algorithm)
+        self.update(digests_and_names_list, stats, table='checkpoint')
+
+    def load_checkpoint(self, algorithm):
+        """
+        Czyta pliki zapisane przez save_checkpoint().
+
+        Argumenty:
+            algorithm: nazwa funkcji skrótu; jeżeli zapisane skróty były
+                obliczone inną funkcją, to są usuwane i pomijane.
+
+        Zwraca:
+            parę: listę krotek i słownik, tak jak load().
+        """
+        if self._get_meta('checkpoint_algorithm') != algorithm:
+            self.clear_checkpoint()
+            return [], {}
+        return self._select(table='checkpoint')
+
+    def clear_checkpoint(self):
+        """Usuwa pliki zapisane przez save_checkpoint()."""
+        with self._connection:
+            self._connection.execute('DELETE FROM checkpoint')
+
+    def replace_all(self, digests_and_names_list, stats=None):
+        """
+        Zastępuje całą zawartość bazy danych.
+
+        Argumenty:
+            digests_and_names_list: lista krotek opisujących pliki.
+            stats: słownik jak w update(), może być None.
+        """
+        with self._connection:
+            self._connection.execute('DELETE FROM files')
+        self.update(digests_and_names_list, stats)
+
+
+def update_store(store, old_list, old_stats, new_list, new_stats):
+    """
+    Zapisuje w bazie danych tylko różnice między starym i nowym stanem.
+
+    Argumenty:
+        store: obiekt DigestsStore.
+        old_list, old_stats: to co zwróciło wcześniej store.load().
+        new_list, new_stats: to co zwróciło (i wypełniło) create_digests().
+
+    Zwraca:
+        liczbę zmienionych i usuniętych wierszy bazy danych.
+    """
+    old_rows = {full: (digest, name, path, old_stats.get(full))
+                for digest, name, path, full in old_list}
+    changed = []
+    for entry in new_list:
+        digest, name, path, full = entry
+        if old_rows.pop(full, None) != (digest, name, path, new_stats.get(full)):
+            changed.append(entry)
+    removed = list(old_rows)  # zostały tylko pliki, których już nie ma
+    store.update(changed, new_stats, removed)
+    return len(changed) + len(removed)
+
+
+def load_state(folder):
+    """
+    Odtworzenie danych o tym jakie pliki były w danym folderze.
+
+    Jest czytana baza danych ze wskazanego folderu i o nazwie w zmiennej
+    globalnej DIGESTS_STORE_NAME. W niej powinny być wszystkie niezbędne
+    informacje o tym co było wcześniej i z czym będziemy porównywali stan
+    obecny. Jest jednak możliwe że albo baza jest pusta (tzn. nie ma w niej
+    wpisów na temat plików), albo nawet nie ma tego pliku. W takim przypadku
+    funkcja load_state() też zadziała, tyle że zwróci listę pustą i pusty
+    słownik.
+
+    Argumenty:
+        folder: nazwa folderu w którym ma być plik o nazwie podanej
+            w DIGESTS_STORE_NAME.
+
+    Zwraca:
+        parę: listę zawierającą krotki opisujące kolejne pliki oraz
+        słownik, którego kluczami są pełne nazwy plików, a wartościami
+        krotki (wielkość, czas modyfikacji w ns, numer i-węzła), tak
+        jak zapisała je wcześniej dump_digests().
+    """
+    with DigestsStore(folder) as store:
+        return store.load()
+
+
+def load_digests(folder):
+    """
+    Odtworzenie listy krotek opisujących pliki, patrz load_state().
+
+    Argumenty:
+        folder: nazwa folderu w którym ma być plik o nazwie podanej
+            w DIGESTS_STORE_NAME.
+
+    Zwraca:
+        listę zawierającą krotki opisujące kolejne pliki, utworzoną
+        wcześniej przez dump_digests(), albo listę pustą.
+    """
+    digests_and_names_list, stats = load_state(folder)
     return digests_and_names_list
 
 
-def dump_digests(digests_and_names_list, folder):
+def dump_digests(digests_and_names_list, folder, stats=None):
     """
     Zapis istotnych informacji o plikach.
 
     Zapisane informacje posłużą przy kolejnym uruchomieniu programu
-    do sprawdzenia jakie zaszły zmiany co do plików.
+    do sprawdzenia jakie zaszły zmiany co do plików. Cała zawartość bazy
+    danych jest zastępowana, aby zmienić tylko niektóre wiersze trzeba
+    użyć update_store().
 
     Argumenty:
         digests_and_names_list: lista krotek jaką trzeba zapisać;
         folder: katalog w którym należy zapisać plik o nazwie zadanej
-            przez globalny DIGEST_FILE_NAME.
+            przez globalny DIGESTS_STORE_NAME.
+        stats: słownik z wielkościami, czasami modyfikacji i numerami
+            i-węzłów plików, taki jak wypełnia create_digests(); może
+            być None.
+    """
+    with DigestsStore(folder) as store:
+        store.replace_all(digests_and_names_list, stats)
 
-    Globalne:
-        DIGESTS_FILE_NAME: nazwa pliku do przechowywania "pikla".
 
+class Snapshot:
+    """
+    Zwarta (oszczędzająca pamięć) lista plików.
+
+    Lista krotek (skrót, nazwa, ścieżka, pełna nazwa) to dla każdego pliku
+    osobny obiekt krotki, osobny obiekt bytes ze skrótem i dwa obiekty str
+    z nazwą i pełną nazwą, a pełna nazwa powtarza ścieżkę. Razem kilkaset
+    bajtów na plik. W obiekcie Snapshot:
+
+    - nazwy folderów są zapamiętane raz, w tablicy folders, a pliki mają
+      tylko numery folderów (array);
+    - wartości skrótu są zapisane jedna za drugą w jednym buforze bytearray;
+    - nazwy plików (w UTF-8) też są w jednym buforze, a ich końce w array;
+    - pełne nazwy nie są zapamiętywane, tylko wyznaczane przez os.path.join()
+      (wyjątkiem są pliki, dla których dałoby to inną nazwę).
+
+    Pliki są identyfikowane liczbami całkowitymi (kolejne numery od 0).
+    Indeksowanie i iterowanie daje obiekty FileView, które zachowują się
+    jak krotki (skrót, nazwa, ścieżka, pełna nazwa), więc obiekt Snapshot
+    może być użyty zamiast listy krotek np. w funkcjach report_...().
+    Tworzenie takich krotek przy każdym dostępie jest oczywiście wolniejsze
+    niż czytanie gotowych krotek z listy.
+
+    Atrybuty:
+        digest_size: długość wartości skrótu w bajtach, None dopóki lista
+            jest pusta.
+        folders: lista nazw folderów.
+        tree: drzewo skrótów folderów (drzewo Merkle'a) wyznaczone przez
+            merkle() albo None, patrz merkle().
+        root: folder podany w merkle() albo None.
+    """
+
+    def __init__(self, digests_and_names_list=()):
+        """
+        Inicjalizuje obiekt Snapshot.
+
+        Argumenty:
+            digests_and_names_list: krotki opisujące pliki, które mają być
+                dodane, tak jak w append().
+        """
+        self.digest_size = None
+        self.folders = []
+        self._folder_ids = {}
+        self._digests = bytearray()
+        self._names = bytearray()
+        self._name_ends = array('Q')
+        self._file_folders = array('I')
+        self._fulls = {}
+        self.tree = None
+        self.root = None
+        for digest, name, path, full in digests_and_names_list:
+            self.append(digest, name, path, full)
+
+    def append(self, digest, name, path, full):
+        """
+        Dodaje plik.
+
+        Argumenty:
+            digest: wartość skrótu, wszystkie muszą mieć tę samą długość.
+            name: nazwa pliku.
+            path: nazwa folderu.
+            full: pełna nazwa pliku.
+
+        Zwraca:
+            numer dodanego pliku.
+        """
+        if self.digest_size is None:
+            self.digest_size = len(digest)
+        elif len(digest) != self.digest_size:
+            raise ValueError(f'digest size {len(digest)} differs from {self.digest_size}')
+        folder_id = self._folder_ids.get(path)
+        if folder_id is None:
+            folder_id = self._folder_ids[path] = len(self.folders)
+            self.folders.append(path)
+        file_id = len(self._file_folders)
+        if full != os.path.join(path, name):
+            self._fulls[file_id] = full
+        self._digests += digest
+        self._names += name.encode('utf-8', 'surrogateescape')
+        self._name_ends.append(len(self._names))
+        self._file_folders.append(folder_id)
+        self.tree = None
+        return file_id
+
+    def merkle(self, root, algorithm=DEFAULT_ALGORITHM):
+        """
+        Wyznaczanie skrótów folderów (drzewo Merkle'a).
+
+        Skrót folderu jest obliczany ze skrótów i nazw plików w tym folderze
+        oraz ze skrótów i nazw jego podfolderów. Jeżeli skróty tego samego
+        folderu w dwóch obiektach Snapshot są równe, to (z dokładnością
+        do kolizji funkcji skrótu) w folderze i we wszystkich podfolderach
+        nic się nie zmieniło i nie trzeba tam niczego porównywać, patrz
+        changed_folders(). Foldery puste, bez żadnych plików w podfolderach,
+        są pomijane.
+
+        Wynik jest zapamiętany w atrybucie tree. Jest to słownik, którego
+        kluczami są nazwy folderów względem root (root to os.curdir),
+        a wartościami krotki (skrót folderu z podfolderami, skrót samych
+        plików w folderze, lista podfolderów, array numerów plików).
+
+        Argumenty:
+            root: folder w którym są wszystkie foldery z listy.
+            algorithm: nazwa funkcji skrótu, klucz w HASH_ALGORITHMS.
+
+        Zwraca:
+            skrót folderu root.
+        """
+        folder_files = defaultdict(lambda: array('I'))
+        for file_id, folder_id in enumerate(self._file_folders):
+            folder_files[folder_id].append(file_id)
+        files = {os.curdir: array('I')}
+        subfolders = defaultdict(set)
+        for folder_id, path in enumerate(self.folders):
+            relative = os.path.relpath(path, root)
+            if relative == os.pardir or relative.startswith(os.pardir + os.sep):
+                raise ValueError(f'{path} is not in {root}')
+            if relative in files:
+                files[relative].extend(folder_files[folder_id])
+                continue
+            files[relative] = folder_files[folder_id]
+            while relative != os.curdir:
+                parent = os.path.dirname(relative) or os.curdir
+                subfolders[parent].add(relative)
+                if parent in files:
+                    break
+                files[parent] = array('I')
+                relative = parent
+
+        # Foldery są przetwarzane od najgłębszych, tak aby skróty
+        # podfolderów były już gotowe.
+        #
+        new_hash = HASH_ALGORITHMS[algorithm]
+        tree = {}
+        def depth(folder):
+            return folder.count(os.sep) if folder != os.curdir else -1
+
+        for relative in sorted(files, key=depth, reverse=True):
+            hasher = new_hash()
+            for name, digest in sorted((self._names_bytes(file_id), self.digest(file_id))
+                                       for file_id in files[relative]):
+                hasher.update(b'f' + name + b'\0' + digest)
+            files_digest = hasher.digest()
+            hasher = new_hash(files_digest)
+            children = sorted(subfolders[relative]) if relative in subfolders else []
+            for child in children:
+                hasher.update(b'd' + os.fsencode(os.path.basename(child)) + b'\0' + tree[child][0])
+            tree[relative] = (hasher.digest(), files_digest, children, files[relative])
+        self.tree = tree
+        self.root = root
+        return tree[os.curdir][0]
+
+    def _names_bytes(self, file_id):
+        start = self._name_ends[file_id - 1] if file_id else 0
+        return bytes(self._names[start:self._name_ends[file_id]])
+
+    def __len__(self):
+        return len(self._file_folders)
+
+    def __getitem__(self, file_id):
+        if file_id < 0:
+            file_id += len(self)
+        if not 0 <= file_id < len(self):
+            raise IndexError('Snapshot index out of range')
+        return FileView(self, file_id)
+
+    def __iter__(self):
+        for file_id in range(len(self)):
+            yield FileView(self, file_id)
+
+    def digest(self, file_id):
+        """Wartość skrótu pliku o danym numerze."""
+        start = file_id * self.digest_size
+        return bytes(self._digests[start:start + self.digest_size])
+
+    def name(self, file_id):
+        """Nazwa pliku o danym numerze."""
+        start = self._name_ends[file_id - 1] if file_id else 0
+        return self._names[start:self._name_ends[file_id]].decode('utf-8', 'surrogateescape')
+
+    def path(self, file_id):
+        """Nazwa folderu pliku o danym numerze."""
+        return self.folders[self._file_folders[file_id]]
+
+    def folder_id(self, file_id):
+        """Numer folderu (indeks w folders) pliku o danym numerze."""
+        return self._file_folders[file_id]
+
+    def full(self, file_id):
+        """Pełna nazwa pliku o danym numerze."""
+        full = self._fulls.get(file_id)
+        if full is None:
+            full = os.path.join(self.path(file_id), self.name(file_id))
+        return full
+
+    def entry(self, file_id):
+        """Krotka (skrót, nazwa, ścieżka, pełna nazwa) pliku o danym numerze."""
+        return (self.digest(file_id), self.name(file_id), self.path(file_id),
+                self.full(file_id))
+
+
+class FileView:
+    """
+    Widok jednego pliku z obiektu Snapshot.
+
+    Obiekt FileView zawiera tylko odwołanie do obiektu Snapshot i numer
+    pliku (__slots__, bez słownika atrybutów). Można go rozpakować,
+    indeksować i porównywać tak jak krotkę (skrót, nazwa, ścieżka, pełna
+    nazwa), a także używać jako klucza w słownikach.
+    """
+
+    __slots__ = ('snapshot', 'id')
+
+    def __init__(self, snapshot, file_id):
+        self.snapshot = snapshot
+        self.id = file_id
+
+    @property
+    def digest(self):
+        """Wartość skrótu."""
+        return self.snapshot.digest(self.id)
+
+    @property
+    def name(self):
+        """Nazwa pliku."""
+        return self.snapshot.name(self.id)
+
+    @property
+    def path(self):
+        """Nazwa folderu."""
+        return self.snapshot.path(self.id)
+
+    @property
+    def full(self):
+        """Pełna nazwa pliku."""
+        return self.snapshot.full(self.id)
+
+    def __len__(self):
+        return 4
+
+    def __iter__(self):
+        return iter(self.snapshot.entry(self.id))
+
+    def __getitem__(self, index):
+        return self.snapshot.entry(self.id)[index]
+
+    def __eq__(self, other):
+        if isinstance(other, FileView):
+            if other.snapshot is self.snapshot:
+                return other.id == self.id
+            other = other.snapshot.entry(other.id)
+        if not isinstance(other, tuple):
+            return NotImplemented
+        return self.snapshot.entry(self.id) == other
+
+    def __hash__(self):
+        return hash(self.snapshot.entry(self.id))
+
+    def __repr__(self):
+        return f'FileView{self.snapshot.entry(self.id)!r}'
+
+
+def stat_key(stat_result):
+    """
+    Krotka z tych danych o pliku, które zmieniają się gdy zmienia się plik.
+
+    Argumenty:
+        stat_result: wynik os.stat() lub DirEntry.stat().
+
+    Zwraca:
+        krotkę (wielkość, czas modyfikacji w ns, numer i-węzła).
+    """
+    return stat_result.st_size, stat_result.st_mtime_ns, stat_result.st_ino
+
+
+def digests_cache(digests_and_names_list, stats):
+    """
+    Tworzy słownik pozwalający pominąć obliczanie skrótów niezmienionych plików.
+
+    Argumenty:
+        digests_and_names_list: lista krotek opisujących pliki.
+        stats: słownik pełna nazwa pliku -> krotka utworzona przez
+            stat_key(), taki jak zwraca load_state().
+
+    Zwraca:
+        słownik, którego kluczami są pełne nazwy plików, a wartościami
+        pary (krotka utworzona przez stat_key(), wartość funkcji skrótu).
+        Pliki, dla których nie ma danych w stats, są pomijane.
+    """
+    cache = {}
+    for digest, name, path, full in digests_and_names_list:
+        key = stats.get(full)
+        if key is not None:
+            cache[full] = key, digest
+    return cache
+
+
+class StoreCache:
+    """
+    Zastępstwo słownika z digests_cache() czytające bazę danych na bieżąco.
+
+    Słownik z digests_cache() trzeba utworzyć dla wszystkich plików, zanim
+    zacznie się sprawdzanie folderu, i przez cały czas trzymać w pamięci.
+    Obiekt StoreCache czyta z bazy danych wiersze z folderu, o który
+    zapytano, a w pamięci trzyma tylko ostatnio używane foldery (co
+    najwyżej STORE_CACHE_FOLDERS). Pliki są przeglądane folder po folderze,
+    więc zwykle wystarcza jedno zapytanie SQL na folder.
+
+    Obiekt ma osobne połączenie z bazą danych, które (razem z blokadą) może
+    być używane także w innych wątkach, np. w create_digests_async().
+    """
+
+    def __init__(self, file_name, max_folders=STORE_CACHE_FOLDERS):
+        """
+        Inicjalizuje obiekt StoreCache.
+
+        Argumenty:
+            file_name: nazwa pliku bazy danych, np. DigestsStore.file_name.
+            max_folders: ile folderów trzymać w pamięci.
+        """
+        self._connection = sqlite3.connect(file_name, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._folders = OrderedDict()
+        self._max_folders = max_folders
+        self._extra = {}
+
+    def close(self):
+        """Zamyka połączenie z bazą danych."""
+        self._connection.close()
+
+    def update(self, cache):
+        """Dodaje pliki ze słownika takiego jak zwraca digests_cache()."""
+        self._extra.update(cache)
+
+    def _rows(self, condition, parameter):
+        return {full: ((size, mtime_ns, inode), digest)
+                for full, digest, size, mtime_ns, inode in self._connection.execute(
+                    'SELECT full, digest, size, mtime_ns, inode FROM files '
+                    + condition, (parameter,))
+                if size is not None}
+
+    def get(self, full, default=None):
+        """
+        Para (krotka utworzona przez stat_key(), wartość funkcji skrótu) dla
+        pliku o danej pełnej nazwie, tak jak dict.get() dla digests_cache().
+        """
+        found = self._extra.get(full)
+        if found is not None:
+            return found
+        path = os.path.dirname(full)
+        with self._lock:
+            rows = self._folders.get(path)
+            if rows is None:
+                rows = self._folders[path] = self._rows('WHERE path = ?', path)
+                if len(self._folders) > self._max_folders:
+                    self._folders.popitem(last=False)
+            else:
+                self._folders.move_to_end(path)
+            found = rows.get(full)
+            if found is None:
+                # Ścieżka zapisana w bazie może się różnić od dirname(full),
+                # np. dla folderu podanego z ukośnikiem na końcu.
+                found = self._rows('WHERE full = ?', full).get(full)
+        return found if found is not None else default
+
+
+class Instruments:
+    """
+    Pomiary czasu, liczby plików i bajtów w kolejnych etapach działania
+    programu: przeglądania folderów (walk), os.stat() (stat), czytania
+    plików (read), obliczania skrótów (hash), porównywania (diff),
+    raportowania (report) i zapisu w bazie danych (store).
+
+    Pomiary są włączane przez set_instruments() (w programie przez opcje
+    --progress i --profile). Gdy są wyłączone, to kosztują tylko sprawdzenie
+    czy _instruments jest None - raz na folder i raz na plik. W procesach
+    (opcja --processes) pomiarów czytania i obliczania skrótów nie ma, bo
+    każdy proces ma własną zmienną _instruments.
+    """
+
+    def __init__(self, progress=False, stream=None):
+        """
+        Inicjalizuje obiekt Instruments.
+
+        Argumenty:
+            progress: True jeżeli ma być wypisywana (i co PROGRESS_INTERVAL
+                sekund zmieniana) linia z postępem pracy.
+            stream: strumień na linię z postępem, domyślnie sys.stderr.
+        """
+        self.progress = progress
+        self.stream = stream if stream is not None else sys.stderr
+        self.seconds = defaultdict(float)
+        self.files = defaultdict(int)
+        self.bytes = defaultdict(int)
+        self.start_time = time.perf_counter()
+        self._lock = threading.Lock()
+        self._progress_time = self.start_time
+
+    def add(self, stage, seconds, files=0, n_bytes=0):
+        """
+        Dodaje czas, liczbę plików i liczbę bajtów do danego etapu.
+        """
+        with self._lock:
+            self.seconds[stage] += seconds
+            self.files[stage] += files
+            self.bytes[stage] += n_bytes
+            if self.progress and time.perf_counter() - self._progress_time >= PROGRESS_INTERVAL:
+                self._progress_time = time.perf_counter()
+                self.print_progress()
+
+    @contextmanager
+    def stage(self, stage, files=0, n_bytes=0):
+        """
+        Menadżer kontekstu mierzący czas wykonywania instrukcji with.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start, files, n_bytes)
+
+    def print_progress(self, end=''):
+        """
+        Wypisuje (nadpisuje) linię z postępem pracy.
+        """
+        elapsed = time.perf_counter() - self.start_time
+        n_bytes = self.bytes['read']
+        print(f'\r{self.files["walk"]} folders, {self.files["stat"]} files, '
+              f'{self.files["read"]} read, {n_bytes / 2**20:.1f} MiB, '
+              f'{n_bytes / 2**20 / elapsed if elapsed else 0:.1f} MiB/s, {elapsed:.1f} s',
+              end=end, file=self.stream, flush=True)
+
+    def close(self):
+        """
+        Kończy linię z postępem pracy.
+        """
+        if self.progress:
+            self.print_progress(end='\n')
+
+    def summary(self):
+        """
+        Podsumowanie pomiarów.
+
+        Zwraca:
+            słownik (do zapisania jako JSON) z całkowitym czasem i dla każdego
+            etapu czasem, liczbą plików, liczbą bajtów i przepustowością.
+        """
+        stages = {}
+        for stage in self.seconds:
+            seconds = self.seconds[stage]
+            stages[stage] = {
+                'seconds': seconds,
+                'files': self.files[stage],
+                'bytes': self.bytes[stage],
+                'files_per_second': self.files[stage] / seconds if seconds else None,
+                'bytes_per_second': self.bytes[stage] / seconds if seconds else None,
+            }
+        return {'elapsed': time.perf_counter() - self.start_time, 'stages': stages}
+
+
+class _TimedFile:
+    """
+    Plik, którego metoda readinto() jest mierzona przez Instruments.
+    """
+
+    def __init__(self, file_stream, instruments):
+        self._file_stream = file_stream
+        self._instruments = instruments
+
+    def readinto(self, buffer):
+        start = time.perf_counter()
+        n_bytes = self._file_stream.readinto(buffer)
+        self._instruments.add('read', time.perf_counter() - start, 0, n_bytes or 0)
+        return n_bytes
+
+
+class _TimedHasher:
+    """
+    Obiekt funkcji skrótu, którego metoda update() jest mierzona przez
+    Instruments.
+    """
+
+    def __init__(self, hasher, instruments):
+        self._hasher = hasher
+        self._instruments = instruments
+
+    def update(self, data):
+        start = time.perf_counter()
+        self._hasher.update(data)
+        self._instruments.add('hash', time.perf_counter() - start, 0, len(data))
+
+    def digest(self):
+        return self._hasher.digest()
+
+
+_instruments = None
+
+
+def set_instruments(instruments):
+    """
+    Włącza (obiekt Instruments) albo wyłącza (None) pomiary.
+    """
+    global _instruments  # pylint: disable=global-statement
+    _instruments = instruments
+
+
+def measure(stage, files=0, n_bytes=0):
+    """
+    Menadżer kontekstu mierzący czas etapu, o ile pomiary są włączone.
+
+    Argumenty:
+        stage: nazwa etapu, patrz Instruments.
+        files: liczba plików (folderów) dodawana do licznika etapu.
+        n_bytes: liczba bajtów dodawana do licznika etapu.
+    """
+    if _instruments is None:
+        return nullcontext()
+    return _instruments.stage(stage, files, n_bytes)
+
+
+def create_digest(full_path_file_name, block_size=DIGEST_BLOCK_SIZE,
+                  buffer=None, use_mmap=False, algorithm=DEFAULT_ALGORITHM):
+    """
+    Oblicza wartość funkcji skrótu dla jednego pliku.
+
+    Plik jest czytany blokami po block_size bajtów, dlatego zużycie pamięci
+    nie zależy od wielkości pliku, nawet wielogigabajtowego. Bloki są
+    czytane metodą readinto() do bufora, który może być używany wielokrotnie
+    (dla kolejnych plików), albo - gdy use_mmap jest True - plik jest
+    odwzorowywany w pamięci (mmap) i funkcja skrótu dostaje kolejne
+    fragmenty tego odwzorowania bez ich kopiowania.
+
+    Argumenty:
+        full_path_file_name: nazwa pliku dla którego ma być
+            obliczony skrót.
+        block_size: wielkość bloku w bajtach.
+        buffer: bufor (np. bytearray) do wielokrotnego użycia; jeżeli
+            nie jest podany, to jest tworzony nowy o wielkości block_size.
+        use_mmap: True jeżeli plik ma być odwzorowany w pamięci zamiast
+            czytany do bufora.
+        algorithm: nazwa funkcji skrótu, jeden z kluczy HASH_ALGORITHMS.
+
+    Zwraca:
+        wartość funkcji skrótu.
+    """
+    instruments = _instruments
+    hasher = HASH_ALGORITHMS[algorithm]()
+    if instruments is not None:
+        hasher = _TimedHasher(hasher, instruments)
+        start = time.perf_counter()
+    with open(full_path_file_name, 'rb', buffering=0) as file_stream:
+        if instruments is not None:
+            instruments.add('read', time.perf_counter() - start, 1)
+            if not use_mmap:
+                file_stream = _TimedFile(file_stream, instruments)
+        if use_mmap:
+            # Pustych plików nie da się odwzorować w pamięci, ale też
+            # nie ma w nich czego czytać.
+            #
+            if os.fstat(file_stream.fileno()).st_size > 0:
+                with mmap.mmap(file_stream.fileno(), 0, access=mmap.ACCESS_READ) as mapped, \
+                        memoryview(mapped) as view:
+                    if instruments is not None:
+                        instruments.add('read', 0, 0, len(view))
+                    for offset in range(0, len(view), block_size):
+                        hasher.update(view[offset:offset + block_size])
+        else:
+            if buffer is None:
+                buffer = bytearray(block_size)
+            with memoryview(buffer) as view:
+                while True:
+                    n_bytes = file_stream.readinto(view)
+                    if not n_bytes:
+                        break
+                    hasher.update(view[:n_bytes])
+    return hasher.digest()
+
+
+def walk_files(folder, exclude=(), one_file_system=False):
+    """
+    Przeglądanie folderu i jego podfolderów, szybsze niż os.walk().
+
+    Funkcja używa os.scandir(), tak samo jak os.walk(), ale zamiast nazw
+    plików zwraca obiekty DirEntry. Dzięki nim nie trzeba łączyć nazw
+    folderu i pliku w os.path.join(), a informacje o pliku (DirEntry.stat())
+    są zapamiętywane w DirEntry, a niektóre systemy (Windows) dostarczają
+    je od razu, bez dodatkowego wywołania systemowego. Pliki i podfoldery
+    są zwracane w tej samej kolejności co przez os.walk(); tak samo jak
+    w os.walk() podfoldery będące dowiązaniami symbolicznymi są pomijane,
+    a foldery, których nie da się przeczytać, są ignorowane.
+
+    Argumenty:
+        folder: nazwa folderu do przeglądania.
+        exclude: wzorce (takie jak w fnmatch, np. '.git', 'node_modules',
+            '*.tmp') nazw plików i folderów, które mają być pominięte;
+            pominięcie folderu oznacza pominięcie wszystkiego co w nim jest.
+        one_file_system: True jeżeli mają być pominięte podfoldery
+            należące do innych systemów plików (punkty montowania).
+
+    Zwraca:
+        iterator krotek (nazwa pliku, nazwa folderu, pełna nazwa pliku,
+        obiekt DirEntry).
+    """
+    device = os.stat(folder).st_dev if one_file_system else None
+    stack = [folder]
+    while stack:
+        folder_name = stack.pop()
+        start = time.perf_counter() if _instruments is not None else None
+        try:
+            files, subfolders = scan_folder(folder_name, exclude, device)
+        except OSError:
+            continue
+        finally:
+            if start is not None:
+                _instruments.add('walk', time.perf_counter() - start, 1)
+        for entry in files:
+            yield entry.name, folder_name, entry.path, entry
+        stack.extend(reversed(subfolders))
+
+
+def scan_folder(folder_name, exclude=(), device=None):
+    """
+    Przeglądanie jednego folderu, bez zaglądania do podfolderów.
+
+    Argumenty:
+        folder_name: nazwa folderu.
+        exclude: wzorce nazw plików i folderów do pominięcia, patrz
+            walk_files().
+        device: numer urządzenia (st_dev) do którego mają należeć
+            podfoldery albo None, jeżeli może to być dowolne urządzenie.
+
+    Zwraca:
+        parę: listę obiektów DirEntry plików i listę pełnych nazw
+        podfolderów (bez dowiązań symbolicznych do folderów).
+    """
+    files = []
+    subfolders = []
+    with os.scandir(folder_name) as entries:
+        for entry in entries:
+            if any(fnmatch.fnmatch(entry.name, pattern) for pattern in exclude):
+                continue
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            if not is_dir:
+                files.append(entry)
+            elif not entry.is_symlink():
+                if device is None or entry.stat().st_dev == device:
+                    subfolders.append(entry.path)
+    return files, subfolders
+
+
+def state_files(folder):
+    """
+    Pełne nazwy plików z zapisanym stanem, których nie należy sprawdzać.
+
+    Argumenty:
+        folder: nazwa sprawdzanego folderu.
+
+    Zwraca:
+        zbiór pełnych nazw pliku bazy danych, jej plików pomocniczych
+        oraz pliku pikle zapisywanego przez starsze wersje programu.
+    """
+    return {os.path.join(folder, name) for name in (
+        DIGESTS_FILE_NAME, DIGESTS_STORE_NAME, DIGESTS_STORE_NAME + '-journal',
+        DIGESTS_STORE_NAME + '-wal', DIGESTS_STORE_NAME + '-shm')}
+
+
+_worker_data = threading.local()
+
+
+def _worker_create_digest(full_path_file_name, block_size, use_mmap, algorithm):
     """
-    file_name = os.path.join(folder, DIGESTS_FILE_NAME)
-    with open(file_name, 'wb') as pickle_file:
-        pickle.dump(digests_and_names_list, pickle_file)
+    Wywołuje create_digest() z buforem osobnym dla każdego wątku.
 
+    Funkcja musi być zdefiniowana na poziomie modułu, tak aby mogła być
+    przekazana (przez pickle) także do procesów ProcessPoolExecutor.
+    """
+    buffer = getattr(_worker_data, 'buffer', None)
+    if buffer is None or len(buffer) != block_size:
+        buffer = _worker_data.buffer = bytearray(block_size)
+    return create_digest(full_path_file_name, block_size, buffer, use_mmap, algorithm)
 
-def create_digests(folder):
+
+class Checkpoint:
+    """
+    Okresowe zapisywanie częściowych wyników create_digests().
+
+    Sprawdzanie dużego dysku może trwać godziny. Jeżeli zostanie przerwane,
+    to przy następnym uruchomieniu skróty plików zapisanych w punkcie
+    kontrolnym (checkpoint) nie są obliczane ponownie, tylko brane tak jak
+    z cache (o ile wielkość, czas modyfikacji i i-węzeł się nie zmieniły).
+    Traci się więc co najwyżej pracę z ostatnich interval sekund.
+
+    Obiekt Checkpoint jest wywoływany przez create_digests() po każdym
+    pliku, ale zapisuje (dopisuje do bazy) tylko pliki dodane od ostatniego
+    zapisu i tylko gdy od tego zapisu minęło interval sekund, więc jego
+    koszt jest pomijalny.
+    """
+
+    def __init__(self, store, algorithm=DEFAULT_ALGORITHM, interval=CHECKPOINT_INTERVAL):
+        """
+        Inicjalizuje obiekt Checkpoint.
+
+        Argumenty:
+            store: obiekt DigestsStore.
+            algorithm: nazwa funkcji skrótu.
+            interval: czas w sekundach między zapisami.
+        """
+        self.store = store
+        self.algorithm = algorithm
+        self.interval = interval
+        self._n_saved = 0
+        self._saved_time = time.monotonic()
+
+    def __call__(self, digests_and_names_list, stats):
+        """
+        Zapisuje nowe pliki, jeżeli minął już czas interval.
+
+        Argumenty:
+            digests_and_names_list: lista krotek (jak dotąd) utworzona przez
+                create_digests().
+            stats: słownik wypełniany przez create_digests().
+        """
+        if time.monotonic() - self._saved_time < self.interval:
+            return
+        self.store.save_checkpoint(digests_and_names_list[self._n_saved:], stats,
+                                   self.algorithm)
+        self._n_saved = len(digests_and_names_list)
+        self._saved_time = time.monotonic()
+
+
+def create_digests(folder, block_size=DIGEST_BLOCK_SIZE, use_mmap=False,
+                   cache=None, stats=None, jobs=1, use_processes=False,
+                   exclude=(), one_file_system=False, algorithm=DEFAULT_ALGORITHM,
+                   checkpoint=None):
     """
     Sporządza listę wartości funkcji skrótu z nazwami ścieżek i plików.
 
+    Jeżeli podany jest słownik cache (zob. digests_cache()), to dla plików
+    których wielkość, czas modyfikacji i numer i-węzła są takie same jak
+    zapamiętane, skrót nie jest obliczany, lecz brany z cache. Wtedy
+    zamiast czytać pliki wystarczy wywołać dla nich os.stat().
+
+    Gdy jobs jest większe niż 1, skróty są obliczane równolegle przez
+    pulę wątków (lub procesów). Wątki wystarczają, bo hashlib zwalnia GIL
+    podczas obliczania skrótu dużych bloków danych. Przeglądanie folderów
+    wyprzedza obliczenia co najwyżej o PENDING_PER_JOB plików na jeden
+    wątek, a wyniki są zbierane w kolejności przeglądania, dlatego lista
+    wynikowa jest taka sama jak przy obliczeniach sekwencyjnych.
+
     Argumenty:
         folder: nazwa folderu z którego (i z którego podfolderów) chcemy
             zbierać informacje.
+        block_size: wielkość bloku w bajtach, patrz create_digest().
+        use_mmap: True jeżeli pliki mają być odwzorowywane w pamięci,
+            patrz create_digest().
+        cache: słownik utworzony przez digests_cache() albo None jeżeli
+            skróty wszystkich plików mają być obliczone na nowo.
+        stats: słownik, do którego (o ile nie jest None) zostaną wpisane
+            krotki utworzone przez stat_key() dla wszystkich plików.
+        jobs: liczba wątków (procesów) obliczających skróty.
+        use_processes: True jeżeli zamiast wątków mają być procesy.
+        exclude: wzorce nazw plików i folderów do pominięcia, patrz
+            walk_files().
+        one_file_system: True jeżeli mają być pominięte inne systemy
+            plików, patrz walk_files().
+        algorithm: nazwa funkcji skrótu, jeden z kluczy HASH_ALGORITHMS;
+            cache musi zawierać skróty obliczone tą samą funkcją.
+        checkpoint: obiekt Checkpoint (albo inna funkcja o takich samych
+            argumentach) wywoływany po każdym pliku, albo None.
+
+    Globalne:
+        PENDING_PER_JOB: ile plików może czekać w kolejce na jeden wątek.
 
     Zwraca:
         listę krotek, każda krotka zawiera wartość funkcji skrótu, nazwę
         pliku, nazwę folderu oraz połączone ze sobą nazwy folderu
         i pliku; w szczególnych przypadkach może to być lista pusta.
     """
+    buffer = bytearray(block_size)  # jeden bufor dla wszystkich plików
+    forbidden = state_files(folder)
+    digests_and_names_list = []
+
+    executor = None
+    if jobs > 1:
+        executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        executor = executor_class(jobs)
+    max_pending = jobs * PENDING_PER_JOB if executor is not None else 0
+
+    # Kolejka krotek takich jak w digests_and_names_list, ale zamiast
+    # wartości funkcji skrótu może w nich być obiekt Future.
+    #
+    pending = deque()
+
+    def collect():
+        digest, file_name, folder_name, full_name = pending.popleft()
+        if isinstance(digest, Future):
+            digest = digest.result()
+        digests_and_names_list.append((digest, file_name, folder_name, full_name))
+        if checkpoint is not None:
+            checkpoint(digests_and_names_list, stats)
 
-    def create_digest(full_path_file_name):
+    try:
+        for file_name, folder_name, full_name, entry in walk_files(folder, exclude, one_file_system):
+            if full_name in forbidden:
+                continue
+            digest = None
+            if cache is not None or stats is not None:
+                if _instruments is None:
+                    key = stat_key(entry.stat())
+                else:
+                    with _instruments.stage('stat', 1):
+                        key = stat_key(entry.stat())
+                if stats is not None:
+                    stats[full_name] = key
+                if cache is not None:
+                    cached_key, cached_digest = cache.get(full_name, (None, None))
+                    if cached_key == key:
+                        digest = cached_digest
+            if digest is None:
+                if executor is None:
+                    digest = create_digest(full_name, block_size, buffer, use_mmap,
+                                           algorithm)
+                else:
+                    digest = executor.submit(_worker_create_digest, full_name,
+                                             block_size, use_mmap, algorithm)
+            pending.append((digest, file_name, folder_name, full_name))
+            while len(pending) > max_pending:
+                collect()
+        while pending:
+            collect()
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    return digests_and_names_list
+
+
+async def create_digests_async(folder, block_size=DIGEST_BLOCK_SIZE, use_mmap=False,
+                               cache=None, stats=None, in_flight=ASYNC_IN_FLIGHT,
+                               exclude=(), one_file_system=False,
+                               algorithm=DEFAULT_ALGORITHM, checkpoint=None):
+    """
+    Sporządza listę wartości funkcji skrótu tak jak create_digests(), ale
+    przez potok asyncio z wieloma jednocześnie obsługiwanymi plikami.
+
+    W sieciowych systemach plików (NFS, SMB) każde otwarcie pliku, odczyt,
+    os.stat() czy os.scandir() czeka na odpowiedź serwera. W create_digests()
+    wątki czytają pliki równolegle, ale foldery są przeglądane i os.stat()
+    jest wywoływane po kolei, w jednym wątku. Tutaj wszystkie te operacje
+    są wykonywane w puli wątków (loop.run_in_executor()), a semafor pozwala
+    na co najwyżej in_flight jednocześnie oczekujących operacji. Podfoldery
+    są przeglądane z wyprzedzeniem, zanim przyjdzie na nie kolej. Wyniki są
+    zbierane w kolejności przeglądania, dlatego lista wynikowa jest taka
+    sama jak z create_digests().
+
+    Argumenty:
+        folder, block_size, use_mmap, cache, stats, exclude, one_file_system,
+        algorithm, checkpoint: tak jak w create_digests().
+        in_flight: ile operacji (przeglądanie folderu, obliczanie skrótu
+            pliku) może być wykonywanych jednocześnie.
+
+    Globalne:
+        PENDING_PER_JOB: ile plików może czekać na zebranie wyniku, na jedną
+            jednocześnie wykonywaną operację.
+
+    Zwraca:
+        listę krotek, tak jak create_digests().
+    """
+    loop = asyncio.get_running_loop()
+    limit = asyncio.Semaphore(in_flight)
+    forbidden = state_files(folder)
+    device = os.stat(folder).st_dev if one_file_system else None
+    digests_and_names_list = []
+
+    def digest_file(full_name, entry):
+        digest = None
+        if cache is not None or stats is not None:
+            if _instruments is None:
+                key = stat_key(entry.stat())
+            else:
+                with _instruments.stage('stat', 1):
+                    key = stat_key(entry.stat())
+            if stats is not None:
+                stats[full_name] = key
+            if cache is not None:
+                cached_key, cached_digest = cache.get(full_name, (None, None))
+                if cached_key == key:
+                    digest = cached_digest
+        if digest is None:
+            digest = _worker_create_digest(full_name, block_size, use_mmap, algorithm)
+        return digest
+
+    async def run(function, *args):
+        async with limit:
+            return await loop.run_in_executor(executor, function, *args)
+
+    def scan_measured(folder_name):
+        with measure('walk', 1):
+            return scan_folder(folder_name, exclude, device)
+
+    def scan(folder_name):
+        return folder_name, asyncio.ensure_future(run(scan_measured, folder_name))
+
+    # Kolejka krotek takich jak w digests_and_names_list, ale zamiast
+    # wartości funkcji skrótu jest w nich obiekt Task.
+    #
+    pending = deque()
+    stack = []
+
+    async def collect():
+        task, file_name, folder_name, full_name = pending.popleft()
+        digests_and_names_list.append((await task, file_name, folder_name, full_name))
+        if checkpoint is not None:
+            checkpoint(digests_and_names_list, stats)
+
+    with ThreadPoolExecutor(in_flight) as executor:
+        try:
+            stack.append(scan(folder))
+            while stack:
+                folder_name, scanning = stack.pop()
+                try:
+                    files, subfolders = await scanning
+                except OSError:
+                    continue
+                subfolders = [scan(subfolder) for subfolder in subfolders]
+                for entry in files:
+                    if entry.path in forbidden:
+                        continue
+                    task = asyncio.ensure_future(run(digest_file, entry.path, entry))
+                    pending.append((task, entry.name, folder_name, entry.path))
+                    while len(pending) > in_flight * PENDING_PER_JOB:
+                        await collect()
+                stack.extend(reversed(subfolders))
+            while pending:
+                await collect()
+        finally:
+            for task in [task for task, *_ in pending] + [task for _, task in stack]:
+                task.cancel()
+    return digests_and_names_list
+
+
+class DigestsIndex:
+    """
+    Słowniki (indeksy) umożliwiające szybkie wyszukiwanie plików.
+
+    Zamiast dla każdego pliku przeglądać całą listę krotek (co daje koszt
+    O(N**2)) budujemy, jednokrotnie i kosztem O(N), słowniki w których
+    kluczami są wartości funkcji skrótu, pełne nazwy plików itd.,
+    a wartościami zbiory krotek. Zbiorami są słowniki (z wartościami None),
+    bo zachowują kolejność z listy źródłowej, dzięki czemu raporty mają tę
+    samą kolejność co raporty tworzone przez porównywanie "każdy z każdym",
+    a usunięcie krotki kosztuje O(1) (z listy kosztowałoby O(k) dla
+    k krotek o tym samym kluczu, np. wielu pustych plików).
+
+    Słowniki są tworzone dopiero wtedy, gdy są potrzebne. Dla listy
+    "nowych" plików wystarczają zwykle tylko dwa z nich.
+    """
+
+    # Nazwy słowników i funkcje wyznaczające klucze z krotek.
+    #
+    KEYS = {
+        'by_digest': itemgetter(0),
+        'by_full': itemgetter(3),
+        'by_path_and_name': itemgetter(2, 1),
+        'by_digest_and_path': itemgetter(0, 2),
+        'by_digest_and_name': itemgetter(0, 1),
+    }
+
+    def __init__(self, digests_and_names_list):
         """
-        Oblicza wartość funkcji skrótu dla jednego pliku.
+        Inicjalizuje obiekt DigestsIndex.
 
         Argumenty:
-            full_name: nazwa pliku dla którego ma być
-                obliczony skrót.
+            digests_and_names_list: lista krotek opisujących pliki, każda
+                krotka powinna się składać z wartości funkcji skrótu, nazwy,
+                ścieżki oraz pełnej nazwy pliku.
+        """
+        self._list = digests_and_names_list
+
+    def _build(self, name):
+        key = self.KEYS[name]
+        dictionary = defaultdict(dict)
+        for entry in self._list:
+            dictionary[key(entry)][entry] = None
+        return dictionary
+
+    @cached_property
+    def by_digest(self):
+        """Słownik: wartość funkcji skrótu -> zbiór krotek."""
+        return self._build('by_digest')
+
+    @cached_property
+    def by_full(self):
+        """Słownik: pełna nazwa pliku -> zbiór krotek."""
+        return self._build('by_full')
+
+    @cached_property
+    def by_path_and_name(self):
+        """Słownik: (ścieżka, nazwa) -> zbiór krotek."""
+        return self._build('by_path_and_name')
+
+    @cached_property
+    def by_digest_and_path(self):
+        """Słownik: (wartość funkcji skrótu, ścieżka) -> zbiór krotek."""
+        return self._build('by_digest_and_path')
+
+    @cached_property
+    def by_digest_and_name(self):
+        """Słownik: (wartość funkcji skrótu, nazwa) -> zbiór krotek."""
+        return self._build('by_digest_and_name')
+
+    def update(self, removed=(), added=()):
+        """
+        Usuwa jedne i dodaje inne krotki bez tworzenia słowników na nowo.
 
-        Zwraca:
-            wartość funkcji skrótu.
+        Wszystkie słowniki, które jeszcze nie zostały utworzone, są przy tym
+        tworzone, tak aby później nie trzeba było już korzystać z listy
+        podanej przy inicjalizacji obiektu.
+
+        Argumenty:
+            removed: krotki do usunięcia (muszą być w indeksach).
+            added: krotki do dodania.
         """
-        algorithm = hashlib.sha1()  # można zastąpić inną funkcją skrótu
-        with open(full_path_file_name, 'rb') as file_stream:
-            file_bytes = file_stream.read()  # @todo: long files support
-            algorithm.update(file_bytes)
-        return algorithm.digest()
+        for name, key in self.KEYS.items():
+            dictionary = getattr(self, name)
+            for entry in removed:
+                entries = dictionary[key(entry)]
+                del entries[entry]
+                if not entries:
+                    del dictionary[key(entry)]
+            for entry in added:
+                dictionary[key(entry)][entry] = None
+        self._list = None
+
+    def _find(self, name, key):
+        # Zwykłe dictionary[key] dopisywałoby do defaultdict puste słowniki.
+        return getattr(self, name).get(key, ())
+
+    def with_digest(self, digest):
+        """Pliki o danej wartości funkcji skrótu."""
+        return self._find('by_digest', digest)
+
+    def with_full(self, full):
+        """Pliki o danej pełnej nazwie."""
+        return self._find('by_full', full)
+
+    def with_path_and_name(self, path, name):
+        """Pliki o danej ścieżce i danej nazwie."""
+        return self._find('by_path_and_name', (path, name))
+
+    def with_digest_and_path(self, digest, path):
+        """Pliki o danej wartości funkcji skrótu w danym folderze."""
+        return self._find('by_digest_and_path', (digest, path))
+
+    def with_digest_and_name(self, digest, name):
+        """Pliki o danej wartości funkcji skrótu i danej nazwie."""
+        return self._find('by_digest_and_name', (digest, name))
+
+
+class DigestsIndexOverlay(DigestsIndex):
+    """
+    Indeksy listy różniącej się od listy zaindeksowanej w innym obiekcie
+    DigestsIndex tylko niewieloma krotkami.
 
-    forbidden = os.path.join(folder, DIGESTS_FILE_NAME)
-    digests_and_names_list = []
-    for folder_name, _, files_names in os.walk(folder):
-        for file_name in files_names:
-            full_name = os.path.join(folder_name, file_name)
-            digest = create_digest(full_name)
-            digest_and_names = digest, file_name, folder_name, full_name
-            if full_name != forbidden:
-                digests_and_names_list.append(digest_and_names)
-    return digests_and_names_list
+    Zamiast tworzyć słowniki dla całej takiej listy, tworzone są tylko
+    słowniki dla dodanych krotek, a wyniki wyszukiwania w "bazowym"
+    obiekcie DigestsIndex są uzupełniane o dodane krotki i pozbawiane
+    krotek usuniętych.
+    """
+
+    def __init__(self, base, removed, added):
+        """
+        Inicjalizuje obiekt DigestsIndexOverlay.
+
+        Argumenty:
+            base: obiekt DigestsIndex.
+            removed: krotki, których ma nie być (choć są w base).
+            added: krotki, które mają być dodane.
+        """
+        super().__init__(added)
+        self._base = base
+        self._removed = set(removed)
+
+    def _find(self, name, key):
+        found = [entry for entry in self._base._find(name, key)
+                 if entry not in self._removed]
+        found.extend(super()._find(name, key))
+        return found
+
+
+def iter_removed(old_list, new_list, old_index=None, new_index=None):
+    """
+    Tak jak report_removed(), ale pary krotek są zwracane przez iterator
+    (generator), bez tworzenia listy.
+    """
+    if new_index is None:
+        new_index = DigestsIndex(new_list)
+    for f_old in old_list:
+        old_digest, old_name, old_path, old_full = f_old
+        if not (new_index.with_digest(old_digest) or new_index.with_full(old_full)):
+            yield f_old, None
 
 
-def report_removed(old_list, new_list):
+def report_removed(old_list, new_list, old_index=None, new_index=None):
     """
     Tworzenie raportu o plikach usuniętych.
 
@@ -166,24 +1676,31 @@ def report_removed(old_list, new_list):
             plików.
         new_list: lista krotek "nowych" plików, każda krotka taka jak
             dla parametru old_list.
+        old_index, new_index: opcjonalne obiekty DigestsIndex zbudowane
+            dla old_list i new_list; jeżeli nie zostały podane, to
+            w razie potrzeby są tworzone na nowo.
 
     Zwraca:
         listę par (krotek) z informacjami nt. usuniętego pliku i None
         (bo nie ma nowego pliku); lista ta może być pusta.
     """
-    result = []
-    for f_old in old_list:
-        old_digest, old_name, old_path, old_full = f_old
-        for f_new in new_list:
-            new_digest, new_name, new_path, new_full = f_new
-            if old_digest == new_digest or old_full == new_full:
-                break
-        else:
-            result.append((f_old, None))
-    return result
+    return list(iter_removed(old_list, new_list, old_index, new_index))
 
 
-def report_new(old_list, new_list):
+def iter_new(old_list, new_list, old_index=None, new_index=None):
+    """
+    Tak jak report_new(), ale pary krotek są zwracane przez iterator
+    (generator), bez tworzenia listy.
+    """
+    if old_index is None:
+        old_index = DigestsIndex(old_list)
+    for f_new in new_list:
+        new_digest, new_name, new_path, new_full = f_new
+        if not (old_index.with_digest(new_digest) or old_index.with_full(new_full)):
+            yield None, f_new
+
+
+def report_new(old_list, new_list, old_index=None, new_index=None):
     """
     Tworzenie raportu o nowych plikach.
 
@@ -199,24 +1716,33 @@ def report_new(old_list, new_list):
             plików.
         new_list: lista krotek "nowych" plików, każda krotka taka jak
             dla parametru old_list.
+        old_index, new_index: opcjonalne obiekty DigestsIndex zbudowane
+            dla old_list i new_list; jeżeli nie zostały podane, to
+            w razie potrzeby są tworzone na nowo.
 
     Zwraca:
         listę par (krotek), każda para to None i informacje na temat
         nowego pliku; lista ta może być pusta.
     """
-    result = []
+    return list(iter_new(old_list, new_list, old_index, new_index))
+
+
+def iter_changed(old_list, new_list, old_index=None, new_index=None):
+    """
+    Tak jak report_changed(), ale pary krotek są zwracane przez iterator
+    (generator), bez tworzenia listy.
+    """
+    if old_index is None:
+        old_index = DigestsIndex(old_list)
     for f_new in new_list:
         new_digest, new_name, new_path, new_full = f_new
-        for f_old in old_list:
+        for f_old in old_index.with_full(new_full):
             old_digest, old_name, old_path, old_full = f_old
-            if old_digest == new_digest or old_full == new_full:
-                break
-        else:
-            result.append((None, f_new))
-    return result
+            if old_digest != new_digest:
+                yield None, f_new
 
 
-def report_changed(old_list, new_list):
+def report_changed(old_list, new_list, old_index=None, new_index=None):
     """
     Tworzenie raportu o zmodyfikowanych plikach.
 
@@ -232,27 +1758,333 @@ def report_changed(old_list, new_list):
             plików.
         new_list: lista krotek "nowych" plików, każda krotka taka jak
             dla parametru old_list.
+        old_index, new_index: opcjonalne obiekty DigestsIndex zbudowane
+            dla old_list i new_list; jeżeli nie zostały podane, to
+            w razie potrzeby są tworzone na nowo.
+
+    Zwraca:
+        listę par (krotek), każda para to None i informacje na temat
+        aktualnego pliku; lista ta może być pusta.
+    """
+    return list(iter_changed(old_list, new_list, old_index, new_index))
+
+
+def iter_renamed_only(old_list, new_list, old_index=None, new_index=None):
+    """
+    Tak jak report_renamed_only(), ale pary krotek są zwracane przez iterator
+    (generator), bez tworzenia listy.
+    """
+    if old_index is None:
+        old_index = DigestsIndex(old_list)
+    for f_new in new_list:
+        new_digest, new_name, new_path, new_full = f_new
+        for f_old in old_index.with_digest_and_path(new_digest, new_path):
+            old_digest, old_name, old_path, old_full = f_old
+            if old_name != new_name:
+                yield f_old, f_new
+
+
+def report_renamed_only(old_list, new_list, old_index=None, new_index=None):
+    """
+    Tworzenie raportu o plikach ze zmienioną tylko nazwą.
+
+    Jako plik ze zmienioną nazwą jest określany taki plik, którego
+    zawartość nie uległa zmianie, ale który ma nadaną inną nazwę.
+
+    Argumenty:
+        old_list: lista krotek "starych" plików, każda krotka powinna
+            się składać z wartości funkcji skrótu, nazwy, ścieżki oraz
+            pełnej nazwy pliku (czyli ścieżki i nazwy razem).
+            Lista może być pusta, np. jeżeli nie było wcześniej żadnych
+            plików.
+        new_list: lista krotek "nowych" plików, każda krotka taka jak
+            dla parametru old_list.
+        old_index, new_index: opcjonalne obiekty DigestsIndex zbudowane
+            dla old_list i new_list; jeżeli nie zostały podane, to
+            w razie potrzeby są tworzone na nowo.
+
+    Zwraca:
+        listę par (krotek), każda para to informacje na temat pliku
+        przed zmianą nazwy i informacje na temat pliku po zmiane nazwy;
+        lista ta może być pusta.
+    """
+    return list(iter_renamed_only(old_list, new_list, old_index, new_index))
+
+
+def iter_moved_only(old_list, new_list, old_index=None, new_index=None):
+    """
+    Tak jak report_moved_only(), ale pary krotek są zwracane przez iterator
+    (generator), bez tworzenia listy.
+    """
+    if old_index is None:
+        old_index = DigestsIndex(old_list)
+    for f_new in new_list:
+        new_digest, new_name, new_path, new_full = f_new
+        file_changed_or_deleted = True
+        for f_old in old_index.with_path_and_name(new_path, new_name):
+            old_digest, old_name, old_path, old_full = f_old
+            if old_digest == new_digest:
+                file_changed_or_deleted = False
+                break
+        if file_changed_or_deleted:
+            for f_old in old_index.with_digest_and_name(new_digest, new_name):
+                old_digest, old_name, old_path, old_full = f_old
+                if old_path != new_path:
+                    yield f_old, f_new
+
+
+def report_moved_only(old_list, new_list, old_index=None, new_index=None):
+    """
+    Tworzenie raportu o plikach przeniesionych i/lub kopiach.
+
+    Argumenty:
+        old_list: lista krotek "starych" plików, każda krotka powinna
+            się składać z wartości funkcji skrótu, nazwy, ścieżki oraz
+            pełnej nazwy pliku (czyli ścieżki i nazwy razem).
+            Lista może być pusta, np. jeżeli nie było wcześniej żadnych
+            plików.
+        new_list: lista krotek "nowych" plików, każda krotka taka jak
+            dla parametru old_list.
+        old_index, new_index: opcjonalne obiekty DigestsIndex zbudowane
+            dla old_list i new_list; jeżeli nie zostały podane, to
+            w razie potrzeby są tworzone na nowo.
+
+    Zwraca:
+        listę par (krotek), każda para to informacje na temat pliku
+        przed i informacje na temat pliku po; lista ta może być pusta.
+    """
+    return list(iter_moved_only(old_list, new_list, old_index, new_index))
+
+
+def report_duplicated(new_list):
+    """
+    Tworzenie raportu o obecnie zduplikowanych.
+
+    Argumenty:
+        new_list: lista list krotek "nowych" plików, każda krotka powinna
+            się składać z wartości funkcji skrótu, nazwy, ścieżki oraz
+            pełnej nazwy pliku (czyli ścieżki i nazwy razem).
+            Lista może być pusta, np. jeżeli nie było wcześniej żadnych
+            plików.
+    Zwraca:
+        listę opisującą pliki zduplikowane; lista ta może być pusta.
+    """
+    result = []
+    digest_dict = defaultdict(list)
+    for f_new in new_list:
+        new_digest, new_name, new_path, new_full = f_new
+        digest_dict[new_digest].append(f_new)
+    for f_list in digest_dict.values():
+        if len(f_list) > 1:
+            result.append(f_list)
+    return result
+
+
+def create_partial_digest(full_path_file_name, size, part_size=PARTIAL_DIGEST_SIZE,
+                          algorithm=DEFAULT_ALGORITHM):
+    """
+    Oblicza wartość funkcji skrótu początku i końca pliku.
+
+    Jeżeli plik nie jest dłuższy niż dwa fragmenty po part_size bajtów,
+    to jest czytany cały i wynik jest taki sam jak create_digest().
+
+    Argumenty:
+        full_path_file_name: nazwa pliku.
+        size: wielkość pliku w bajtach.
+        part_size: wielkość początkowego i końcowego fragmentu.
+        algorithm: nazwa funkcji skrótu, jeden z kluczy HASH_ALGORITHMS.
+
+    Zwraca:
+        wartość funkcji skrótu.
+    """
+    hasher, tail = _read_head_and_tail(full_path_file_name, size, part_size, algorithm)
+    hasher.update(tail)
+    return hasher.digest()
+
+
+def _read_head_and_tail(full_path_file_name, size, part_size, algorithm):
+    """
+    Czyta początek i koniec pliku, patrz create_partial_digest().
+
+    Zwraca:
+        krotkę: obiekt funkcji skrótu po przeczytaniu początku pliku
+        (albo całego pliku, jeżeli jest krótki) oraz koniec pliku (albo
+        puste bajty, jeżeli plik jest krótki).
+    """
+    hasher = HASH_ALGORITHMS[algorithm]()
+    with open(full_path_file_name, 'rb') as file_stream:
+        if size <= 2 * part_size:
+            hasher.update(file_stream.read())
+            return hasher, b''
+        hasher.update(file_stream.read(part_size))
+        file_stream.seek(-part_size, os.SEEK_END)
+        return hasher, file_stream.read(part_size)
+
+
+def _finish_digest(full_path_file_name, size, part_size, head, tail, buffer):
+    """
+    Kończy obliczanie skrótu całego pliku zaczęte przez _read_head_and_tail().
+
+    Czytany jest tylko środek pliku, bez początku już przeczytanego
+    w obiekcie head. Jeżeli koniec pliku nie został zachowany (tail jest
+    None), to jest czytany razem ze środkiem.
+
+    Argumenty:
+        full_path_file_name: nazwa pliku.
+        size: wielkość pliku w bajtach.
+        part_size: wielkość początkowego i końcowego fragmentu.
+        head: obiekt funkcji skrótu po przeczytaniu początku pliku.
+        tail: koniec pliku albo None.
+        buffer: bufor (bytearray) do wielokrotnego użycia.
+
+    Zwraca:
+        krotkę: wartość funkcji skrótu i liczbę przeczytanych bajtów.
+    """
+    n_read = 0
+    remaining = size - 2 * part_size if tail is not None else None
+    with open(full_path_file_name, 'rb', buffering=0) as file_stream, \
+            memoryview(buffer) as view:
+        file_stream.seek(part_size)
+        while remaining is None or remaining > 0:
+            n_bytes = file_stream.readinto(view if remaining is None else view[:remaining])
+            if not n_bytes:
+                break
+            head.update(view[:n_bytes])
+            n_read += n_bytes
+            if remaining is not None:
+                remaining -= n_bytes
+    if tail is not None:
+        head.update(tail)
+    return head.digest(), n_read
+
+
+def find_duplicates(folder, block_size=DIGEST_BLOCK_SIZE, exclude=(),
+                    one_file_system=False, part_size=PARTIAL_DIGEST_SIZE,
+                    algorithm=DEFAULT_ALGORITHM):
+    """
+    Wyszukiwanie zduplikowanych plików bez czytania wszystkich plików.
+
+    W odróżnieniu od report_duplicated(), które potrzebuje skrótów
+    wszystkich plików, wyszukiwanie odbywa się etapami:
+
+    1. pliki są grupowane według wielkości (wystarczy stat(), nie trzeba
+       czytać plików) - pliki o unikalnej wielkości nie mogą mieć
+       duplikatów i w ogóle nie są czytane;
+    2. w grupach plików o tej samej wielkości jest obliczany skrót
+       początku i końca (po part_size bajtów) każdego pliku;
+    3. w plikach o takich samych skrótach początku i końca jest czytany
+       środek, a skrót całego pliku jest kontynuacją skrótu początku
+       z etapu 2, zaś przeczytany wtedy koniec pliku jest trzymany w pamięci
+       (do PARTIAL_DIGEST_MEMORY bajtów na grupę plików o tej samej
+       wielkości, końce pozostałych plików są czytane jeszcze raz). Krótkie
+       pliki w etapie 2 zostały już przeczytane w całości.
+
+    Dzięki temu żaden bajt pliku nie jest czytany dwukrotnie, o ile
+    wystarcza pamięci na końce plików.
+
+    Argumenty:
+        folder: nazwa folderu z którego (i z którego podfolderów) chcemy
+            zbierać informacje.
+        block_size: wielkość bloku w bajtach, patrz create_digest().
+        exclude: wzorce nazw plików i folderów do pominięcia, patrz
+            walk_files().
+        one_file_system: True jeżeli mają być pominięte inne systemy
+            plików, patrz walk_files().
+        part_size: wielkość fragmentów czytanych w etapie 2.
+        algorithm: nazwa funkcji skrótu, jeden z kluczy HASH_ALGORITHMS.
 
     Zwraca:
-        listę par (krotek), każda para to None i informacje na temat
-        aktualnego pliku; lista ta może być pusta.
+        krotkę: listę taką jak zwraca report_duplicated(), listę krotek
+        (opis etapu, liczba plików, liczba przeczytanych bajtów) oraz
+        łączną wielkość wszystkich plików.
     """
+    forbidden = state_files(folder)
+    walk_order = {}
+    by_size = defaultdict(list)
+    for file_name, folder_name, full_name, entry in walk_files(folder, exclude, one_file_system):
+        if full_name not in forbidden:
+            walk_order[full_name] = len(walk_order)
+            by_size[entry.stat().st_size].append((file_name, folder_name, full_name))
+    total_size = sum(size * len(files) for size, files in by_size.items())
+
+    buffer = bytearray(block_size)
+    partial_files = partial_bytes = full_files = full_bytes = 0
     result = []
+    for size, files in by_size.items():
+        if len(files) < 2:
+            continue
+        by_partial_digest = defaultdict(list)
+        tails_size = 0
+        for file_name, folder_name, full_name in files:
+            hasher, tail = _read_head_and_tail(full_name, size, part_size, algorithm)
+            head = hasher.copy()
+            hasher.update(tail)
+            digest = hasher.digest()
+            if tails_size + len(tail) > PARTIAL_DIGEST_MEMORY:
+                tail = None
+            else:
+                tails_size += len(tail)
+            by_partial_digest[digest].append((digest, file_name, folder_name, full_name,
+                                              head, tail))
+        partial_files += len(files)
+        partial_bytes += len(files) * min(size, 2 * part_size)
+        for candidates in by_partial_digest.values():
+            if len(candidates) < 2:
+                continue
+            if size <= 2 * part_size:
+                # Skróty już są skrótami całych plików.
+                #
+                result.append([candidate[:4] for candidate in candidates])
+                continue
+            by_digest = defaultdict(list)
+            for _, file_name, folder_name, full_name, head, tail in candidates:
+                digest, n_bytes = _finish_digest(full_name, size, part_size, head, tail, buffer)
+                by_digest[digest].append((digest, file_name, folder_name, full_name))
+                full_bytes += n_bytes
+            full_files += len(candidates)
+            result.extend(f_list for f_list in by_digest.values() if len(f_list) > 1)
+
+    # Kolejność taka jak w report_duplicated(), tj. według pierwszych plików.
+    #
+    result.sort(key=lambda f_list: walk_order[f_list[0][3]])
+    stages = [('size', len(walk_order), 0),
+              ('head and tail', partial_files, partial_bytes),
+              ('full', full_files, full_bytes)]
+    return result, stages, total_size
+
+
+def iter_moved_and_renamed(old_list, new_list, old_index=None, new_index=None):
+    """
+    Tak jak report_moved_and_renamed(), ale pary krotek są zwracane przez iterator
+    (generator), bez tworzenia listy.
+    """
+    if old_index is None:
+        old_index = DigestsIndex(old_list)
     for f_new in new_list:
         new_digest, new_name, new_path, new_full = f_new
-        for f_old in old_list:
+        candidates = old_index.with_digest(new_digest)
+
+        # Wiele plików może mieć tę samą zawartość (np. puste __init__.py
+        # w każdym folderze). Zanim przejrzymy wszystkie takie pliki
+        # sprawdzamy, licząc elementy list w indeksach, czy w ogóle jest
+        # wśród nich jakiś plik z inną nazwą i w innym folderze.
+        #
+        same_name = len(old_index.with_digest_and_name(new_digest, new_name))
+        same_path = len(old_index.with_digest_and_path(new_digest, new_path))
+        same_both = sum(1 for f_old in old_index.with_path_and_name(new_path, new_name)
+                        if f_old[0] == new_digest)
+        if len(candidates) - same_name - same_path + same_both == 0:
+            continue
+
+        for f_old in candidates:
             old_digest, old_name, old_path, old_full = f_old
-            if old_digest != new_digest and old_full == new_full:
-                result.append((None, f_new))
-    return result
+            if old_path != new_path and old_name != new_name:
+                yield f_old, f_new
 
 
-def report_renamed_only(old_list, new_list):
+def report_moved_and_renamed(old_list, new_list, old_index=None, new_index=None):
     """
-    Tworzenie raportu o plikach ze zmienioną tylko nazwą.
-
-    Jako plik ze zmienioną nazwą jest określany taki plik, którego
-    zawartość nie uległa zmianie, ale który ma nadaną inną nazwę.
+    Tworzenie raportu o plikach przeniesionych ze zmianą nazwy.
 
     Argumenty:
         old_list: lista krotek "starych" plików, każda krotka powinna
@@ -262,105 +2094,237 @@ def report_renamed_only(old_list, new_list):
             plików.
         new_list: lista krotek "nowych" plików, każda krotka taka jak
             dla parametru old_list.
+        old_index, new_index: opcjonalne obiekty DigestsIndex zbudowane
+            dla old_list i new_list; jeżeli nie zostały podane, to
+            w razie potrzeby są tworzone na nowo.
 
     Zwraca:
         listę par (krotek), każda para to informacje na temat pliku
-        przed zmianą nazwy i informacje na temat pliku po zmiane nazwy;
-        lista ta może być pusta.
+        przed i informacje na temat pliku po; lista ta może być pusta.
     """
-    result = []
-    for f_new in new_list:
-        new_digest, new_name, new_path, new_full = f_new
-        for f_old in old_list:
-            old_digest, old_name, old_path, old_full = f_old
-            if old_digest == new_digest and old_path == new_path and old_name != new_name:
-                result.append((f_old, f_new))
-    return result
+    return list(iter_moved_and_renamed(old_list, new_list, old_index, new_index))
+
 
+REPORTS = (('removed files', report_removed),
+           ('new files', report_new),
+           ('changed files', report_changed),
+           ('moved files', report_moved_only),
+           ('renamed files', report_renamed_only),
+           ('moved and renamed files', report_moved_and_renamed))
 
-def report_moved_only(old_list, new_list):
+
+def compare_digests(old_list, new_list):
     """
-    Tworzenie raportu o plikach przeniesionych i/lub kopiach.
+    Porównanie dwóch list krotek opisujących pliki, wszystkie raporty.
+
+    Indeksy DigestsIndex są budowane tylko raz, dla starej i dla nowej
+    listy, i potem są używane przez wszystkie funkcje report_...().
 
     Argumenty:
-        old_list: lista krotek "starych" plików, każda krotka powinna
-            się składać z wartości funkcji skrótu, nazwy, ścieżki oraz
-            pełnej nazwy pliku (czyli ścieżki i nazwy razem).
-            Lista może być pusta, np. jeżeli nie było wcześniej żadnych
-            plików.
-        new_list: lista krotek "nowych" plików, każda krotka taka jak
-            dla parametru old_list.
+        old_list: lista krotek "starych" plików.
+        new_list: lista krotek "nowych" plików.
+
+    Globalne:
+        REPORTS: krotka par (opis raportu, funkcja tworząca raport).
 
     Zwraca:
-        listę par (krotek), każda para to informacje na temat pliku
-        przed i informacje na temat pliku po; lista ta może być pusta.
+        listę par (opis raportu, wynik funkcji tworzącej raport), w takiej
+        kolejności jak w REPORTS.
     """
-    result = []
-    for f_new in new_list:
-        new_digest, new_name, new_path, new_full = f_new
-        file_changed_or_deleted = True
-        for f_old in old_list:
-            old_digest, old_name, old_path, old_full = f_old
-            if old_digest == new_digest and old_path == new_path and old_name == new_name:
-                file_changed_or_deleted = False
-                break
-        if file_changed_or_deleted:
-            for f_old in old_list:
-                old_digest, old_name, old_path, old_full = f_old
-                if old_digest == new_digest and old_path != new_path and old_name == new_name:
-                    result.append((f_old, f_new))
-    return result
+    old_index = DigestsIndex(old_list)
+    new_index = DigestsIndex(new_list)
+    return [(description, procedure(old_list, new_list, old_index, new_index))
+            for description, procedure in REPORTS]
 
 
-def report_duplicated(new_list):
+ITER_REPORTS = (('removed files', iter_removed),
+                ('new files', iter_new),
+                ('changed files', iter_changed),
+                ('moved files', iter_moved_only),
+                ('renamed files', iter_renamed_only),
+                ('moved and renamed files', iter_moved_and_renamed))
+
+
+REPORT_ORDER = {description: i for i, (description, procedure)
+                in enumerate(ITER_REPORTS)}
+
+
+def iter_changes(old_list, new_list):
     """
-    Tworzenie raportu o obecnie zduplikowanych.
+    Porównanie dwóch list krotek opisujących pliki, wszystkie raporty jako
+    jeden strumień rekordów.
+
+    W odróżnieniu od compare_digests() wyniki nie są zbierane w listach,
+    każdy rekord jest przekazywany dalej od razu gdy zostanie znaleziony.
+    W pamięci są tylko listy plików i indeksy DigestsIndex, a nie raporty.
 
     Argumenty:
-        new_list: lista list krotek "nowych" plików, każda krotka powinna
-            się składać z wartości funkcji skrótu, nazwy, ścieżki oraz
-            pełnej nazwy pliku (czyli ścieżki i nazwy razem).
-            Lista może być pusta, np. jeżeli nie było wcześniej żadnych
-            plików.
+        old_list: lista krotek "starych" plików.
+        new_list: lista krotek "nowych" plików.
+
+    Globalne:
+        ITER_REPORTS: krotka par (opis raportu, generator par krotek).
+
     Zwraca:
-        listę opisującą pliki zduplikowane; lista ta może być pusta.
+        iterator krotek (opis raportu, stary plik, nowy plik), kolejno dla
+        raportów takich jak w ITER_REPORTS. Stary albo nowy plik może być
+        None (pliki usunięte i nowe).
     """
-    result = []
-    digest_dict = defaultdict(list)
-    for f_new in new_list:
-        new_digest, new_name, new_path, new_full = f_new
-        digest_dict[new_digest].append(f_new)
-    for f_list in digest_dict.values():
-        if len(f_list) > 1:
-            result.append(f_list)
-    return result
+    old_index = DigestsIndex(old_list)
+    new_index = DigestsIndex(new_list)
+    for description, procedure in ITER_REPORTS:
+        for f_old, f_new in procedure(old_list, new_list, old_index, new_index):
+            yield description, f_old, f_new
 
 
-def report_moved_and_renamed(old_list, new_list):
+def changed_folders(old_snapshot, new_snapshot):
     """
-    Tworzenie raportu o plikach przeniesionych ze zmianą nazwy.
+    Wyszukiwanie folderów w których zmieniły się pliki.
+
+    Drzewa folderów (drzewa Merkle'a, patrz Snapshot.merkle()) są
+    przeglądane od korzenia; jeżeli skrót folderu jest taki sam w obu
+    obiektach, to cały folder razem z podfolderami jest pomijany. Dlatego
+    koszt jest proporcjonalny do liczby zmienionych folderów (i ich
+    folderów nadrzędnych), a nie do liczby wszystkich plików.
 
     Argumenty:
-        old_list: lista krotek "starych" plików, każda krotka powinna
-            się składać z wartości funkcji skrótu, nazwy, ścieżki oraz
-            pełnej nazwy pliku (czyli ścieżki i nazwy razem).
-            Lista może być pusta, np. jeżeli nie było wcześniej żadnych
-            plików.
-        new_list: lista krotek "nowych" plików, każda krotka taka jak
-            dla parametru old_list.
+        old_snapshot: "stary" obiekt Snapshot, po wywołaniu merkle().
+        new_snapshot: "nowy" obiekt Snapshot, po wywołaniu merkle().
 
     Zwraca:
-        listę par (krotek), każda para to informacje na temat pliku
-        przed i informacje na temat pliku po; lista ta może być pusta.
+        listę nazw folderów (względnych, tak jak w Snapshot.tree), w których
+        pliki (nie licząc podfolderów) są inne w starym i nowym obiekcie,
+        lub które są tylko w jednym z nich.
     """
-    result = []
-    for f_new in new_list:
-        new_digest, new_name, new_path, new_full = f_new
-        for f_old in old_list:
-            old_digest, old_name, old_path, old_full = f_old
-            if old_digest == new_digest and old_path != new_path and old_name != new_name:
-                result.append((f_old, f_new))
-    return result
+    if old_snapshot.tree is None or new_snapshot.tree is None:
+        raise ValueError('Snapshot.merkle() must be called first')
+    missing = (None, None, [], ())
+    changed = []
+    stack = [os.curdir]
+    while stack:
+        relative = stack.pop()
+        old_digest, old_files_digest, old_children, old_files = old_snapshot.tree.get(relative, missing)
+        new_digest, new_files_digest, new_children, new_files = new_snapshot.tree.get(relative, missing)
+        if old_digest == new_digest:
+            continue
+        if old_files_digest != new_files_digest:
+            changed.append(relative)
+        stack.extend(sorted(set(old_children).union(new_children), reverse=True))
+    return changed
+
+
+def snapshot_files(snapshot, folders, digests=None, relative=True):
+    """
+    Lista krotek opisujących pliki w danych folderach.
+
+    Ścieżki i pełne nazwy w krotkach są względne, liczone od folderu root
+    podanego w Snapshot.merkle(). Dzięki temu można porównywać np. dwie
+    kopie tego samego folderu w różnych miejscach.
+
+    Argumenty:
+        snapshot: obiekt Snapshot, po wywołaniu merkle().
+        folders: nazwy folderów względne, takie jak zwraca changed_folders().
+        digests: zbiór wartości skrótu albo None; jeżeli podany, to na liście
+            są tylko pliki o wartościach skrótu z tego zbioru.
+        relative: False jeżeli ścieżki i pełne nazwy mają być takie, jak
+            zapisane w obiekcie Snapshot, a nie względne.
+
+    Zwraca:
+        listę krotek (skrót, nazwa, ścieżka, pełna nazwa).
+    """
+    digests_and_names_list = []
+    for folder in folders:
+        if folder not in snapshot.tree:
+            continue
+        for file_id in snapshot.tree[folder][3]:
+            if digests is not None and snapshot.digest(file_id) not in digests:
+                continue
+            if not relative:
+                digests_and_names_list.append(snapshot.entry(file_id))
+                continue
+            name = snapshot.name(file_id)
+            full = os.path.join(folder, name) if folder != os.curdir else name
+            digests_and_names_list.append((snapshot.digest(file_id), name, folder, full))
+    return digests_and_names_list
+
+
+def iter_snapshot_changes(old_snapshot, new_snapshot, relative=True):
+    """
+    Porównanie dwóch obiektów Snapshot z pomijaniem niezmienionych folderów.
+
+    Tak jak iter_changes() dla wszystkich plików, ale przeglądane są tylko
+    pliki z folderów znalezionych przez changed_folders(). Z niezmienionych
+    folderów brane są tylko pliki o tej samej zawartości (wartości skrótu)
+    co któryś z plików w zmienionych folderach. Wystarczają one, bo pliki
+    są wyszukiwane w indeksach DigestsIndex według wartości skrótu albo
+    według folderu, a niezmienione foldery są takie same w obu obiektach.
+    Dlatego np. plik skopiowany z niezmienionego folderu jest raportowany
+    jako przeniesiony, a nie jako nowy.
+
+    Raporty są takie same jak z iter_changes() (i compare_digests()) dla
+    wszystkich plików, ale bez par plików, z których oba są w niezmienionych
+    folderach. Takie pary to tylko kopie tego samego pliku (np. puste
+    __init__.py), a nie zmiany. Przykładowo, gdy w obu obiektach są pliki
+    a/x i b/y o tej samej zawartości, a zmienił się tylko plik c/z, to
+    compare_digests() dla wszystkich plików raportuje zmieniony c/z oraz
+    pary a/x -> b/y i b/y -> a/x jako "moved and renamed files", a tutaj
+    jest raportowany tylko zmieniony c/z. Jest to zamierzona różnica
+    względem raportów tworzonych przed wprowadzeniem drzew Merkle'a.
+
+    Argumenty:
+        old_snapshot: "stary" obiekt Snapshot, po wywołaniu merkle().
+        new_snapshot: "nowy" obiekt Snapshot, po wywołaniu merkle().
+        relative: tak jak w snapshot_files().
+
+    Zwraca:
+        iterator krotek (opis raportu, stary plik, nowy plik), z nazwami
+        względnymi (albo nie) tak jak w snapshot_files().
+    """
+    folders = changed_folders(old_snapshot, new_snapshot)
+    old_list = snapshot_files(old_snapshot, folders, relative=relative)
+    new_list = snapshot_files(new_snapshot, folders, relative=relative)
+    digests = {entry[0] for entry in old_list}
+    digests.update(entry[0] for entry in new_list)
+    changed = set(folders)
+    unchanged = [folder for folder in new_snapshot.tree if folder not in changed]
+    old_copies = snapshot_files(old_snapshot, unchanged, digests, relative) if digests else []
+    new_copies = snapshot_files(new_snapshot, unchanged, digests, relative) if digests else []
+    old_copied = {entry[3] for entry in old_copies}
+    new_copied = {entry[3] for entry in new_copies}
+    for description, f_old, f_new in iter_changes(old_list + old_copies,
+                                                  new_list + new_copies):
+        if f_old is None or f_new is None or not (f_old[3] in old_copied
+                                                  and f_new[3] in new_copied):
+            yield description, f_old, f_new
+
+
+def iter_folder_changes(folder, old_snapshot, new_list):
+    """
+    Porównanie zapisanego stanu folderu z nową listą plików.
+
+    Tak jak iter_changes(), ale przez skróty folderów (drzewa Merkle'a),
+    czyli z pomijaniem niezmienionych folderów, patrz iter_snapshot_changes().
+    Jeżeli zapisane pliki nie są w folderze folder (np. program był wcześniej
+    uruchomiony w innym folderze bieżącym), porównywane są wszystkie pliki.
+
+    Argumenty:
+        folder: sprawdzany folder.
+        old_snapshot: obiekt Snapshot ze "starymi" plikami, np. z
+            DigestsStore.load_snapshot().
+        new_list: lista krotek "nowych" plików.
+
+    Zwraca:
+        iterator krotek (opis raportu, stary plik, nowy plik), z nazwami
+        takimi jak zapisane, a nie względnymi.
+    """
+    new_snapshot = Snapshot(new_list)
+    try:
+        old_snapshot.merkle(folder)
+        new_snapshot.merkle(folder)
+    except ValueError:
+        return iter_changes([old_snapshot.entry(file_id) for file_id in range(len(old_snapshot))],
+                            new_list)
+    return iter_snapshot_changes(old_snapshot, new_snapshot, relative=False)
 
 
 def print_report(description, result):
@@ -402,6 +2366,24 @@ def print_report(description, result):
             print(item)
 
 
+def print_changes(records):
+    """
+    Wypisywanie raportów z rekordów takich jak z iter_changes().
+
+    Argumenty:
+        records: iterator krotek (opis raportu, stary plik, nowy plik),
+            kolejno dla raportów w kolejności ITER_REPORTS.
+
+    Zwraca:
+        True jeżeli wypisano jakiś raport, False jeżeli nie było zmian.
+    """
+    changes_detected = False
+    for description, group in groupby(records, key=itemgetter(0)):
+        changes_detected = True
+        print_report(description, [(f_old, f_new) for _, f_old, f_new in group])
+    return changes_detected
+
+
 def print_duplicates(description, list_lists_duplicates):
     """
     """
@@ -418,42 +2400,738 @@ def print_duplicates(description, list_lists_duplicates):
             print()
 
 
-def main():
+def print_duplicates_stages(stages, total_size):
     """
-    Funkcja odpowiadająca za uruchomienie całego programu.
+    Wypisywanie ile plików i ile bajtów przeczytano w kolejnych etapach
+    wyszukiwania duplikatów przez find_duplicates().
 
-    Istotną przyczyną istnienia funkcji main() jest to że izoluje
-    ona zmienne lokalne, które - gdyby nie main() - byłby zmiennymi
-    globalnymi.
+    Argumenty:
+        stages: lista krotek (opis etapu, liczba plików, liczba bajtów).
+        total_size: łączna wielkość wszystkich plików w bajtach.
     """
-    folder = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_FOLDER
+    print('=' * REPORT_LINES_LEN)
+    total_read = 0
+    for description, n_files, n_bytes in stages:
+        print(f'{description:15} {n_files:10} files {n_bytes:16} bytes read')
+        total_read += n_bytes
+    percent = 100 * total_read / total_size if total_size else 0
+    print(f'{"total":15} {total_read:33} bytes read of {total_size} ({percent:.1f}%)')
 
-    old = load_digests(folder)
-    new = create_digests(folder)
 
-    tests = (('removed files', report_removed),
-             ('new files', report_new),
-             ('changed files', report_changed),
-             ('moved files', report_moved_only),
-             ('renamed files', report_renamed_only),
-             ('moved and renamed files', report_moved_and_renamed))
+def report_record_text(f_old, f_new):
+    """
+    Tekst opisujący zmianę, taki jak wypisywany przez print_report().
 
-    duplicates = report_duplicated(new)
-    print_duplicates('duplicates', duplicates)
+    Argumenty:
+        f_old: krotka opisująca stary plik albo None.
+        f_new: krotka opisująca nowy plik albo None.
 
-    changes_detected = False
-    for description, procedure in tests:
-        result = procedure(old, new)
-        if result:
-            changes_detected = True
-            print_report(description, result)
-
-    if changes_detected:
-        dump_digests(new, folder)
+    Zwraca:
+        pełną nazwę pliku albo "stara nazwa -> nowa nazwa".
+    """
+    if f_old is not None and f_new is not None:
+        return f_old[3] + ' -> ' + f_new[3]
+    return (f_old or f_new)[3]
+
+
+def report_sort_key(record):
+    """
+    Klucz sortowania rekordów (opis raportu, stary plik, nowy plik).
+
+    Rekordy są porządkowane tak samo jak w raportach tekstowych: najpierw
+    według kolejności raportów w ITER_REPORTS, potem alfabetycznie.
+    """
+    description, f_old, f_new = record
+    return REPORT_ORDER[description], report_record_text(f_old, f_new)
+
+
+def _read_sorted_chunk(file):
+    """
+    Czytanie rekordów zapisanych przez external_sort() w pliku tymczasowym.
+    """
+    file.seek(0)
+    while True:
+        try:
+            yield from pickle.load(file)
+        except EOFError:
+            return
+
+
+def external_sort(records, key, chunk_size=REPORT_SORT_CHUNK):
+    """
+    Sortowanie zewnętrzne (external sort) strumienia rekordów.
+
+    Rekordy są czytane porcjami po chunk_size, każda porcja jest sortowana
+    i zapisywana (pickle) w osobnym pliku tymczasowym. Potem posortowane
+    pliki są scalane przez heapq.merge(). W pamięci jest jednocześnie
+    najwyżej jedna porcja rekordów i po jednym rekordzie z każdego pliku,
+    niezależnie od tego ile jest wszystkich rekordów.
+
+    Argumenty:
+        records: iterator rekordów, które można zapisać przez pickle.
+        key: funkcja wyznaczająca klucz sortowania.
+        chunk_size: ile rekordów jest sortowanych w pamięci.
+
+    Zwraca:
+        iterator posortowanych rekordów.
+    """
+    files = []
+    try:
+        chunk = []
+        for record in records:
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                files.append(_dump_sorted_chunk(chunk, key))
+                chunk = []
+        if not files:
+            yield from sorted(chunk, key=key)
+            return
+        if chunk:
+            files.append(_dump_sorted_chunk(chunk, key))
+        chunk = None
+        yield from heapq.merge(*map(_read_sorted_chunk, files), key=key)
+    finally:
+        for file in files:
+            file.close()
+
+
+def _dump_sorted_chunk(chunk, key):
+    """
+    Sortowanie porcji rekordów i zapisywanie jej do pliku tymczasowego.
+
+    Rekordy są zapisywane po REPORT_PICKLE_BATCH, tak aby przy czytaniu nie
+    trzeba było wczytywać od razu całej porcji.
+    """
+    chunk.sort(key=key)
+    file = tempfile.TemporaryFile()
+    for i in range(0, len(chunk), REPORT_PICKLE_BATCH):
+        pickle.dump(chunk[i:i + REPORT_PICKLE_BATCH], file, pickle.HIGHEST_PROTOCOL)
+    return file
+
+
+class ReportWriter:
+    """
+    Zapisywanie rekordów raportów w formie czytelnej dla innych programów.
+
+    Każdy rekord opisuje jedną zmianę: opis raportu (taki jak w REPORTS),
+    pełne nazwy starego i nowego pliku oraz wartości skrótu (szesnastkowo).
+    Dla plików nowych brak starego pliku, dla usuniętych nowego - wtedy
+    odpowiednie pola są puste. Rekordy są zapisywane od razu, nic nie jest
+    gromadzone w pamięci.
+
+    Atrybuty:
+        count: ile rekordów zostało zapisanych.
+    """
+
+    FIELDS = ('report', 'old', 'new', 'old_digest', 'new_digest')
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.count = 0
+
+    @staticmethod
+    def record(description, f_old, f_new):
+        """
+        Rekord raportu jako słownik o kluczach FIELDS.
+        """
+        return {'report': description,
+                'old': f_old[3] if f_old is not None else None,
+                'new': f_new[3] if f_new is not None else None,
+                'old_digest': f_old[0].hex() if f_old is not None else None,
+                'new_digest': f_new[0].hex() if f_new is not None else None}
+
+    def write(self, description, f_old, f_new):
+        """
+        Zapisywanie jednego rekordu.
+        """
+        self.count += 1
+
+
+class JsonLinesReportWriter(ReportWriter):
+    """
+    Zapisywanie raportów jako JSON Lines, jeden obiekt JSON w każdej linii.
+    """
+
+    def write(self, description, f_old, f_new):
+        super().write(description, f_old, f_new)
+        self.stream.write(json.dumps(self.record(description, f_old, f_new),
+                                     ensure_ascii=False))
+        self.stream.write('\n')
+
+
+class CsvReportWriter(ReportWriter):
+    """
+    Zapisywanie raportów jako CSV, w pierwszym wierszu są nazwy kolumn.
+    """
+
+    def __init__(self, stream):
+        super().__init__(stream)
+        self.writer = csv.DictWriter(stream, self.FIELDS)
+        self.writer.writeheader()
+
+    def write(self, description, f_old, f_new):
+        super().write(description, f_old, f_new)
+        self.writer.writerow(self.record(description, f_old, f_new))
+
+
+REPORT_WRITERS = {'jsonl': JsonLinesReportWriter, 'csv': CsvReportWriter}
+
+
+def write_changes(old_list, new_list, format_name, file_name=None, sort=False):
+    """
+    Zapisywanie wszystkich raportów jako strumienia rekordów.
+
+    Rekordy są zapisywane w miarę jak są wyznaczane przez iter_changes(),
+    więc zużycie pamięci nie zależy od liczby zmian. Z sortowaniem zależy
+    tylko od REPORT_SORT_CHUNK.
+
+    Argumenty:
+        old_list: lista krotek "starych" plików.
+        new_list: lista krotek "nowych" plików.
+        format_name: klucz w REPORT_WRITERS, np. 'jsonl'.
+        file_name: nazwa pliku wynikowego, None to standardowe wyjście.
+        sort: czy sortować rekordy (external_sort()).
+
+    Zwraca:
+        liczbę zapisanych rekordów.
+    """
+    return write_records(iter_changes(old_list, new_list), format_name, file_name, sort)
+
+
+def write_records(records, format_name, file_name=None, sort=False):
+    """
+    Zapisywanie strumienia rekordów, tak jak w write_changes().
+
+    Argumenty:
+        records: iterator krotek (opis raportu, stary plik, nowy plik),
+            np. z iter_changes() albo iter_snapshot_changes().
+        format_name: klucz w REPORT_WRITERS, np. 'jsonl'.
+        file_name: nazwa pliku wynikowego, None to standardowe wyjście.
+        sort: czy sortować rekordy (external_sort()).
+
+    Zwraca:
+        liczbę zapisanych rekordów.
+    """
+    if sort:
+        records = external_sort(records, report_sort_key, REPORT_SORT_CHUNK)
+    stream = open(file_name, 'w', encoding='utf-8', newline='') if file_name else sys.stdout
+    try:
+        writer = REPORT_WRITERS[format_name](stream)
+        for description, f_old, f_new in records:
+            writer.write(description, f_old, f_new)
+    finally:
+        if file_name:
+            stream.close()
+    return writer.count
+
+
+class Watcher:
+    """
+    Śledzenie zmian w folderze przez program działający bez przerwy.
+
+    Obiekt Watcher przechowuje w pamięci krotki opisujące pliki, pogrupowane
+    według folderów, oraz czasy modyfikacji folderów. Utworzenie, usunięcie
+    lub zmiana nazwy pliku zmienia czas modyfikacji folderu, dlatego
+    w każdym cyklu wystarczy sprawdzić (os.stat) czasy modyfikacji folderów
+    i przejrzeć ponownie tylko te foldery, w których coś się zmieniło.
+    Skróty są obliczane tylko dla plików nowych lub zmienionych.
+
+    Zapisanie nowej zawartości do istniejącego pliku nie zmienia czasu
+    modyfikacji folderu. Takie zmiany są wykrywane rzadziej, co full_interval
+    sekund (opcja --watch-full-interval), przez sprawdzenie os.stat()
+    wszystkich plików (ale bez czytania ich zawartości).
+
+    Zmiany następujące szybko po sobie (np. kopiowanie wielu plików) są
+    łączone: raport jest tworzony dopiero wtedy, gdy przez settle sekund
+    nie było nowych zmian (ale nie później niż max_delay sekund po
+    pierwszej zmianie).
+    """
+
+    def __init__(self, folder, digests_and_names_list, stats, store=None,
+                 block_size=DIGEST_BLOCK_SIZE, algorithm=DEFAULT_ALGORITHM,
+                 exclude=(), one_file_system=False):
+        """
+        Inicjalizuje obiekt Watcher.
+
+        Argumenty:
+            folder: nazwa śledzonego folderu.
+            digests_and_names_list: lista krotek opisujących pliki, taka
+                jak zwraca create_digests().
+            stats: słownik wypełniony przez create_digests().
+            store: obiekt DigestsStore, w którym mają być zapisywane
+                zmiany, albo None.
+            block_size: wielkość bloku w bajtach, patrz create_digest().
+            algorithm: nazwa funkcji skrótu, jeden z kluczy HASH_ALGORITHMS.
+            exclude: wzorce nazw plików i folderów do pominięcia, patrz
+                walk_files().
+            one_file_system: True jeżeli mają być pominięte inne systemy
+                plików, patrz walk_files().
+        """
+        self.folder = folder
+        self.store = store
+        self.block_size = block_size
+        self.algorithm = algorithm
+        self.exclude = exclude
+        self.device = os.stat(folder).st_dev if one_file_system else None
+        self.forbidden = state_files(folder)
+        self.buffer = bytearray(block_size)
+
+        self.stats = dict(stats)
+        self.entries = defaultdict(list)  # folder -> krotki opisujące pliki
+        for entry in digests_and_names_list:
+            self.entries[entry[2]].append(entry)
+        self.index = DigestsIndex(digests_and_names_list)
+        self.index.update()  # tworzy od razu wszystkie słowniki
+        self.mtimes = {}  # folder -> czas modyfikacji folderu
+        self.subfolders = {}  # folder -> lista podfolderów
+
+        # Stan folderów sprzed zmian, które jeszcze nie zostały zgłoszone
+        # w raporcie: folder -> lista krotek opisujących pliki.
+        #
+        self.pending = {}
+        self.pending_stats = {}
+
+        self._add_tree(folder, scan_files=False)
+        self.pending.clear()
+        self.pending_stats.clear()
+
+    def _add_tree(self, folder_name, scan_files=True):
+        # Dodaje folder wraz z podfolderami; gdy scan_files jest False
+        # zakładamy, że krotki opisujące pliki są już w self.entries.
+        stack = [folder_name]
+        while stack:
+            folder_name = stack.pop()
+            self._mark_pending(folder_name)
+            try:
+                self.mtimes[folder_name] = os.stat(folder_name).st_mtime_ns
+                files, subfolders = scan_folder(folder_name, self.exclude, self.device)
+            except OSError:
+                self.mtimes.pop(folder_name, None)
+                continue
+            if scan_files:
+                self._update_files(folder_name, files)
+            self.subfolders[folder_name] = subfolders
+            stack.extend(subfolders)
+
+    def _remove_tree(self, folder_name):
+        stack = [folder_name]
+        while stack:
+            folder_name = stack.pop()
+            self._mark_pending(folder_name)
+            removed = self.entries.pop(folder_name, ())
+            for digest, name, path, full in removed:
+                self.stats.pop(full, None)
+            self.index.update(removed=removed)
+            self.mtimes.pop(folder_name, None)
+            stack.extend(self.subfolders.pop(folder_name, ()))
+
+    def _mark_pending(self, folder_name):
+        if folder_name not in self.pending:
+            old_entries = list(self.entries.get(folder_name, ()))
+            self.pending[folder_name] = old_entries
+            for digest, name, path, full in old_entries:
+                self.pending_stats[full] = self.stats.get(full)
+
+    def _update_files(self, folder_name, files):
+        old_entries = self.entries.get(folder_name, ())
+        old_digests = {full: digest for digest, name, path, full in old_entries}
+        new_entries = []
+        for entry in files:
+            full_name = entry.path
+            if full_name in self.forbidden:
+                continue
+            try:
+                key = stat_key(entry.stat())
+                digest = old_digests.get(full_name)
+                if digest is None or self.stats.get(full_name) != key:
+                    digest = create_digest(full_name, self.block_size, self.buffer,
+                                           algorithm=self.algorithm)
+            except OSError:
+                continue  # plik zniknął zanim zdążyliśmy go przeczytać
+            self.stats[full_name] = key
+            new_entries.append((digest, entry.name, folder_name, full_name))
+        for full_name in old_digests.keys() - {entry[3] for entry in new_entries}:
+            self.stats.pop(full_name, None)
+        unchanged = set(old_entries) & set(new_entries)
+        self.index.update([entry for entry in old_entries if entry not in unchanged],
+                          [entry for entry in new_entries if entry not in unchanged])
+        self.entries[folder_name] = new_entries
+
+    def _rescan_folder(self, folder_name):
+        self._mark_pending(folder_name)
+        try:
+            self.mtimes[folder_name] = os.stat(folder_name).st_mtime_ns
+            files, subfolders = scan_folder(folder_name, self.exclude, self.device)
+        except OSError:
+            self._remove_tree(folder_name)
+            return
+        self._update_files(folder_name, files)
+        old_subfolders = set(self.subfolders.get(folder_name, ()))
+        for subfolder in old_subfolders - set(subfolders):
+            self._remove_tree(subfolder)
+        for subfolder in subfolders:
+            if subfolder not in old_subfolders:
+                self._add_tree(subfolder)
+        self.subfolders[folder_name] = subfolders
+
+    def poll(self, check_files=False):
+        """
+        Jeden cykl sprawdzania zmian.
+
+        Argumenty:
+            check_files: True jeżeli mają być sprawdzone (os.stat) także
+                wszystkie pliki, a nie tylko foldery.
+
+        Zwraca:
+            True jeżeli wykryto jakiekolwiek zmiany.
+        """
+        changed = set()
+        for folder_name, mtime in self.mtimes.items():
+            try:
+                if os.stat(folder_name).st_mtime_ns != mtime:
+                    changed.add(folder_name)
+            except OSError:
+                changed.add(folder_name)
+        if check_files:
+            for folder_name, entries in self.entries.items():
+                for digest, name, path, full in entries:
+                    try:
+                        if stat_key(os.stat(full)) != self.stats.get(full):
+                            changed.add(folder_name)
+                            break
+                    except OSError:
+                        changed.add(folder_name)
+                        break
+        for folder_name in sorted(changed):
+            if folder_name in self.mtimes or folder_name in self.entries:
+                self._rescan_folder(folder_name)
+        return bool(changed)
+
+    def report(self):
+        """
+        Wypisuje raporty o zmianach wykrytych od poprzedniego raportu
+        i zapisuje te zmiany w bazie danych (jeżeli jest).
+
+        Raporty obejmują tylko pliki z folderów, w których były zmiany,
+        ale pliki te są porównywane ze wszystkimi plikami (np. plik
+        skopiowany z niezmienionego folderu jest raportowany jako
+        "moved files", tak samo jak przez compare_digests()).
+
+        Zwraca:
+            True jeżeli w raportach było cokolwiek do wypisania.
+        """
+        old_affected = [entry for entries in self.pending.values() for entry in entries]
+        new_affected = [entry for folder_name in self.pending
+                        for entry in self.entries.get(folder_name, ())]
+        new_index = self.index
+        old_index = DigestsIndexOverlay(self.index, new_affected, old_affected)
+        changes_detected = False
+        for description, procedure in REPORTS:
+            result = procedure(old_affected, new_affected, old_index, new_index)
+            if result:
+                if not changes_detected:
+                    print()
+                    print(time.strftime('%Y-%m-%d %H:%M:%S'))
+                changes_detected = True
+                print_report(description, result)
+        if self.store is not None:
+            update_store(self.store, old_affected, self.pending_stats,
+                         new_affected, self.stats)
+        self.pending = {}
+        self.pending_stats = {}
+        return changes_detected
+
+    def run(self, interval=WATCH_INTERVAL, settle=WATCH_SETTLE,
+            max_delay=WATCH_MAX_DELAY, full_interval=WATCH_FULL_INTERVAL):
+        """
+        Śledzenie zmian aż do przerwania programu (Ctrl+C).
+
+        Argumenty:
+            interval: czas w sekundach między kolejnymi cyklami.
+            settle: ile sekund bez zmian musi upłynąć przed raportem.
+            max_delay: maksymalne opóźnienie raportu po pierwszej zmianie.
+            full_interval: co ile sekund sprawdzać wszystkie pliki.
+        """
+        self.pending = {}
+        self.pending_stats = {}
+        first_change = last_change = None
+        last_full_check = time.monotonic()
+        try:
+            while True:
+                time.sleep(interval)
+                now = time.monotonic()
+                check_files = now - last_full_check >= full_interval
+                if check_files:
+                    last_full_check = now
+                if self.poll(check_files):
+                    last_change = now
+                    if first_change is None:
+                        first_change = now
+                if first_change is not None and (now - last_change >= settle
+                                                 or now - first_change >= max_delay):
+                    self.report()
+                    first_change = last_change = None
+        except KeyboardInterrupt:
+            if self.pending:
+                self.report()
+
+
+def add_report_arguments(parser):
+    """
+    Dodaje do parsera argumentów opcje --format, --output i --sort.
+    """
+    parser.add_argument('--format', choices=['text'] + sorted(REPORT_WRITERS), default='text',
+                        help='format raportu: tekst do czytania (domyślnie) albo '
+                             'rekordy JSON Lines lub CSV do przetwarzania przez inne programy')
+    parser.add_argument('--output', metavar='FILE',
+                        help='plik do którego jest zapisywany raport w formacie '
+                             'jsonl lub csv (domyślnie standardowe wyjście)')
+    parser.add_argument('--sort', action='store_true',
+                        help='sortowanie rekordów jsonl lub csv tak jak w raporcie '
+                             'tekstowym, przez pliki tymczasowe')
+
+
+def load_snapshot(name):
+    """
+    Czytanie zapisanego stanu folderu jako obiektu Snapshot z drzewem
+    skrótów folderów (Snapshot.merkle()).
+
+    Argumenty:
+        name: folder z plikiem DIGESTS_STORE_NAME albo nazwa pliku bazy
+            danych (np. skopiowanego z innego komputera).
+
+    Zwraca:
+        parę: obiekt Snapshot i nazwę funkcji skrótu.
+    """
+    if os.path.isdir(name):
+        folder, file_name = name, os.path.join(name, DIGESTS_STORE_NAME)
     else:
+        folder, file_name = os.path.dirname(name), name
+    if not os.path.isfile(file_name):
+        raise FileNotFoundError(f'{file_name} does not exist')
+    with DigestsStore(folder, file_name) as store:
+        snapshot = store.load_snapshot()
+        root, algorithm = store.root, store.algorithm
+    if root is None:
+        root = os.path.commonpath(snapshot.folders) if snapshot.folders else os.curdir
+    snapshot.merkle(root)
+    return snapshot, algorithm
+
+
+def main_diff(argv):
+    """
+    Porównanie dwóch zapisanych stanów, bez przeglądania folderów.
+
+    Program uruchomiony jako "cerber.py diff A B" porównuje stany zapisane
+    w dwóch bazach danych, np. dwóch kopii zapasowych albo tego samego
+    folderu w dwóch różnych dniach. Pliki nie są czytane, więc porównanie
+    jest ograniczone szybkością pamięci, a nie dysków. Bazy są czytane do
+    obiektów Snapshot i porównywane są tylko pliki w zmienionych folderach
+    oraz ich kopie w pozostałych folderach (iter_snapshot_changes()), a raport
+    jest taki sam jak z compare_digests() dla wszystkich plików. Nazwy plików
+    w raportach są względne, bo porównywane foldery mogą być w różnych
+    miejscach.
+
+    Argumenty:
+        argv: argumenty wywołania programu występujące po "diff".
+    """
+    parser = argparse.ArgumentParser(
+        prog='cerber.py diff',
+        description='Cerber - porównanie dwóch zapisanych stanów folderów.')
+    parser.add_argument('old', help=f'"stary" stan: folder z plikiem {DIGESTS_STORE_NAME} '
+                                    'albo plik bazy danych')
+    parser.add_argument('new', help='"nowy" stan, tak samo jak "stary"')
+    add_report_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.format == 'text' and (args.output or args.sort):
+        parser.error('--output and --sort require --format jsonl or csv')
+
+    try:
+        old_snapshot, old_algorithm = load_snapshot(args.old)
+        new_snapshot, new_algorithm = load_snapshot(args.new)
+    except (OSError, sqlite3.Error) as error:
+        parser.error(str(error))
+    if old_algorithm != new_algorithm:
+        parser.error(f'{old_algorithm} digests cannot be compared with {new_algorithm} digests')
+
+    records = iter_snapshot_changes(old_snapshot, new_snapshot)
+    if args.format != 'text':
+        write_records(records, args.format, args.output, args.sort)
+        return
+    if not print_changes(records):
         print('=' * REPORT_LINES_LEN)
         print('nothing changes')
 
 
+def main():
+    """
+    Funkcja odpowiadająca za uruchomienie całego programu.
+
+    Istotną przyczyną istnienia funkcji main() jest to że izoluje
+    ona zmienne lokalne, które - gdyby nie main() - byłby zmiennymi
+    globalnymi.
+    """
+    if sys.argv[1:2] == ['diff']:
+        main_diff(sys.argv[2:])
+        return
+
+    parser = argparse.ArgumentParser(description='Cerber - program do pilnowania zmian w plikach.')
+    parser.add_argument('folder', nargs='?', default=DEFAULT_FOLDER,
+                        help='folder do sprawdzenia (domyślnie bieżący)')
+    parser.add_argument('--block-size', type=int, default=DIGEST_BLOCK_SIZE,
+                        help='wielkość bloku czytanego z pliku, w bajtach')
+    parser.add_argument('--mmap', action='store_true',
+                        help='odwzorowywanie plików w pamięci zamiast czytania')
+    parser.add_argument('--paranoid', action='store_true',
+                        help='obliczanie skrótów wszystkich plików, także tych '
+                             'które mają niezmienioną wielkość i czas modyfikacji')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='liczba wątków obliczających skróty')
+    parser.add_argument('--processes', action='store_true',
+                        help='procesy zamiast wątków obliczających skróty')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='przeglądanie folderów i obliczanie skrótów przez asyncio, '
+                             'przydatne w sieciowych systemach plików')
+    parser.add_argument('--in-flight', type=int, default=ASYNC_IN_FLIGHT, metavar='N',
+                        help='liczba jednocześnie obsługiwanych plików w trybie --async')
+    parser.add_argument('--exclude', action='append', default=[], metavar='PATTERN',
+                        help='pomijanie plików i folderów o pasujących nazwach, '
+                             'np. --exclude .git --exclude node_modules')
+    parser.add_argument('--one-file-system', action='store_true',
+                        help='pomijanie folderów z innych systemów plików')
+    parser.add_argument('--duplicates', action='store_true',
+                        help='tylko wyszukiwanie duplikatów, bez czytania '
+                             'wszystkich plików i bez porównywania ze stanem zapisanym')
+    parser.add_argument('--algorithm', choices=sorted(HASH_ALGORITHMS),
+                        help='funkcja skrótu (domyślnie taka jak zapisana w '
+                             f'{DIGESTS_STORE_NAME} albo {DEFAULT_ALGORITHM})')
+    parser.add_argument('--watch', action='store_true',
+                        help='po sprawdzeniu folderu dalsze śledzenie zmian, '
+                             'aż do przerwania programu (Ctrl+C)')
+    parser.add_argument('--watch-interval', type=float, default=WATCH_INTERVAL,
+                        help='czas w sekundach między sprawdzeniami w trybie --watch')
+    parser.add_argument('--watch-full-interval', type=float, default=WATCH_FULL_INTERVAL,
+                        help='czas w sekundach między sprawdzeniami wszystkich plików '
+                             'w trybie --watch (zmiana zawartości pliku nie zmienia '
+                             'czasu modyfikacji folderu)')
+    parser.add_argument('--checkpoint-interval', type=float, default=CHECKPOINT_INTERVAL,
+                        help='czas w sekundach między zapisami częściowych wyników, '
+                             'od których zaczyna się przerwane sprawdzanie; 0 wyłącza zapisy')
+    parser.add_argument('--progress', action='store_true',
+                        help='wypisywanie (na stderr) linii z postępem pracy')
+    parser.add_argument('--profile', metavar='PREFIX',
+                        help='zapisanie profilu cProfile do pliku PREFIX.pstats '
+                             'i czasów kolejnych etapów do pliku PREFIX.json')
+    add_report_arguments(parser)
+    args = parser.parse_args()
+    if args.format == 'text' and (args.output or args.sort):
+        parser.error('--output and --sort require --format jsonl or csv')
+
+    instruments = None
+    if args.progress or args.profile:
+        instruments = Instruments(progress=args.progress)
+        set_instruments(instruments)
+    profiler = cProfile.Profile() if args.profile else None
+    try:
+        if profiler is not None:
+            profiler.enable()
+        check_folder(parser, args)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile + '.pstats')
+            with open(args.profile + '.json', 'w', encoding='utf-8') as file:
+                json.dump(instruments.summary(), file, indent=4)
+        if instruments is not None:
+            instruments.close()
+            set_instruments(None)
+
+
+def check_folder(parser, args):
+    """
+    Sprawdzenie folderu (albo wyszukanie duplikatów) tak jak zadają to
+    argumenty wywołania programu.
+
+    Zmiany są wyszukiwane przez iter_folder_changes(), czyli tylko
+    w zmienionych folderach. Raporty nie zawierają więc par kopii tego
+    samego pliku leżących w niezmienionych folderach (np. pustych
+    __init__.py w różnych folderach jako "moved and renamed files"), które
+    porównywanie wszystkich plików przez compare_digests() raportowałoby
+    przy każdym uruchomieniu, patrz iter_snapshot_changes().
+
+    Argumenty:
+        parser: obiekt ArgumentParser, do zgłaszania błędów.
+        args: argumenty wywołania programu.
+    """
+    folder = args.folder
+
+    if args.duplicates:
+        duplicates, stages, total_size = find_duplicates(
+            folder, args.block_size, args.exclude, args.one_file_system,
+            algorithm=args.algorithm or DEFAULT_ALGORITHM)
+        print_duplicates('duplicates', duplicates)
+        print_duplicates_stages(stages, total_size)
+        return
+
+    with DigestsStore(folder) as store:
+        algorithm = args.algorithm or store.algorithm or DEFAULT_ALGORITHM
+        if store.algorithm not in (None, algorithm):
+            parser.error(f'{DIGESTS_STORE_NAME} contains {store.algorithm} digests, '
+                         f'they cannot be compared with {algorithm} digests')
+        # Zapisany stan nie jest czytany w całości przed sprawdzaniem
+        # folderu: skróty niezmienionych plików są czytane z bazy danych
+        # folder po folderze (StoreCache), a do porównania wystarcza zwarty
+        # obiekt Snapshot.
+        #
+        new_stats = {}
+        with closing(StoreCache(store.file_name)) if not args.paranoid else nullcontext({}) as cache:
+            done, done_stats = store.load_checkpoint(algorithm)
+            if done:
+                print(f'resuming interrupted check, {len(done)} files already done',
+                      file=sys.stderr)
+                cache.update(digests_cache(done, done_stats))
+            checkpoint = None
+            if args.checkpoint_interval > 0:
+                checkpoint = Checkpoint(store, algorithm, args.checkpoint_interval)
+            if args.use_async:
+                new = asyncio.run(create_digests_async(
+                    folder, args.block_size, args.mmap, cache or None, new_stats,
+                    args.in_flight, args.exclude, args.one_file_system, algorithm,
+                    checkpoint))
+            else:
+                new = create_digests(folder, args.block_size, args.mmap, cache or None,
+                                     new_stats, args.jobs, args.processes, args.exclude,
+                                     args.one_file_system, algorithm, checkpoint)
+
+        with measure('store'):
+            old = store.load_snapshot()
+        if args.format == 'text':
+            with measure('diff'):
+                duplicates = report_duplicated(new)
+                records = list(iter_folder_changes(folder, old, new))
+            with measure('report'):
+                print_duplicates('duplicates', duplicates)
+                changes_detected = print_changes(records)
+        else:
+            with measure('report'):  # razem z porównywaniem (diff)
+                changes_detected = write_records(iter_folder_changes(folder, old, new),
+                                                 args.format, args.output, args.sort)
+        del old
+
+        with measure('store'):
+            store.synchronize(new, new_stats)
+            store.clear_checkpoint()
+        store.algorithm = algorithm
+        store.root = folder
+        if not changes_detected and args.format == 'text':
+            print('=' * REPORT_LINES_LEN)
+            print('nothing changes')
+
+        if args.watch:
+            watcher = Watcher(folder, new, new_stats, store, args.block_size,
+                              algorithm, args.exclude, args.one_file_system)
+            watcher.run(args.watch_interval, full_interval=args.watch_full_interval)
+
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,582 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Pomiary wydajności programu cerber.py.
+
+Program uruchamia wybrane pomiary (podane jako argumenty wywołania,
+domyślnie wszystkie) i wypisuje czasy ich wykonania. Przykładowo::
+
+    python3 cerber_benchmark.py compare
+
+Dane do pomiarów są generowane syntetycznie, tak aby nie było potrzeby
+przygotowywania prawdziwych katalogów z milionem plików.
+
+CC-BY-NC-ND 2022 Sławomir Marczyński
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import multiprocessing
+import os
+import pickle
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import cerber
+
+COMPARE_SIZES = (10_000, 100_000, 1_000_000)
+HASHING_FILE_SIZE = 256 * 1024 * 1024
+PARALLEL_FILES = 1000
+PARALLEL_FILE_SIZE = 256 * 1024
+PARALLEL_JOBS = (1, 2, 4, 8)
+STORE_SIZE = 1_000_000
+WALK_FILES = 500_000
+WALK_FILES_PER_FOLDER = 100
+ALGORITHMS_BUFFER_SIZES = (64, 4096, 64 * 1024, 1024 * 1024, 16 * 1024 * 1024)
+ALGORITHMS_TOTAL_SIZE = 16 * 1024 * 1024
+WATCH_FILES = 100_000
+REPORT_SIZE = 200_000
+REPORT_FRACTION = 0.5
+SNAPSHOT_SIZE = 1_000_000
+MERKLE_SIZE = 1_000_000
+MERKLE_FRACTIONS = (0.0001, 0.001, 0.01)
+LATENCY = 0.005  # sekundy, opóźnienie każdej operacji w "sieciowym" systemie plików
+LATENCY_FILES = 400
+LATENCY_IN_FLIGHT = (8, 32, 128)
+CHECKPOINT_FILES = 20_000
+CHECKPOINT_INTERVALS = (None, 60.0, 1.0, 0.1)
+INSTRUMENTS_FILES = 20_000
+
+
+def synthetic_digests(n_files, seed=0):
+    """
+    Tworzy listę krotek opisujących fikcyjne pliki.
+
+    Argumenty:
+        n_files: liczba plików.
+        seed: ziarno generatora liczb pseudolosowych.
+
+    Zwraca:
+        listę krotek takich jak tworzy cerber.create_digests().
+    """
+    rng = random.Random(seed)
+    n_folders = max(1, n_files // 50)
+    folders = [os.path.join('root', f'd{i // 100}', f'd{i}')
+               for i in range(n_folders)]
+    result = []
+    for i in range(n_files):
+        folder_name = folders[rng.randrange(n_folders)]
+        file_name = f'f{i}.dat'
+        digest = hashlib.sha1(str(i).encode()).digest()
+        result.append((digest, file_name, folder_name,
+                       os.path.join(folder_name, file_name)))
+    return result
+
+
+def synthetic_changes(old_list, fraction=0.01, seed=1):
+    """
+    Tworzy "nową" listę plików wprowadzając zmiany do listy "starej".
+
+    Około fraction plików jest usuwanych, tyle samo zmienianych,
+    przenoszonych, przemianowywanych i dodawanych.
+
+    Argumenty:
+        old_list: lista krotek "starych" plików.
+        fraction: jaka część plików ma być zmieniona każdym rodzajem zmian.
+        seed: ziarno generatora liczb pseudolosowych.
+
+    Zwraca:
+        listę krotek "nowych" plików.
+    """
+    rng = random.Random(seed)
+    new_list = []
+    for digest, file_name, folder_name, full_name in old_list:
+        draw = rng.random() / fraction
+        if draw < 1:
+            continue  # usunięty
+        if draw < 2:
+            digest = hashlib.sha1(digest).digest()  # zmieniony
+        elif draw < 3:
+            folder_name = os.path.join(folder_name, 'moved')  # przeniesiony
+        elif draw < 4:
+            file_name = 'renamed_' + file_name  # przemianowany
+        new_list.append((digest, file_name, folder_name,
+                         os.path.join(folder_name, file_name)))
+    for i in range(int(len(old_list) * fraction)):
+        digest = hashlib.sha1(b'new' + str(i).encode()).digest()
+        new_list.append((digest, f'new{i}.dat', 'root',
+                         os.path.join('root', f'new{i}.dat')))
+    return new_list
+
+
+def benchmark_compare():
+    """
+    Pomiar czasu porównywania list plików przez cerber.compare_digests().
+    """
+    print('compare_digests()')
+    for n_files in COMPARE_SIZES:
+        old_list = synthetic_digests(n_files)
+        new_list = synthetic_changes(old_list)
+        start = time.perf_counter()
+        reports = cerber.compare_digests(old_list, new_list)
+        elapsed = time.perf_counter() - start
+        counts = ', '.join(f'{len(result)} {description}'
+                           for description, result in reports)
+        print(f'{n_files:10} files {elapsed:8.3f} s  ({counts})')
+
+
+def hash_whole_file(full_name):
+    """
+    Dawny sposób obliczania skrótu: cały plik jest wczytywany do pamięci.
+    """
+    with open(full_name, 'rb') as file_stream:
+        return hashlib.sha1(file_stream.read()).digest()
+
+
+def measure_hashing(method, full_name):
+    """
+    Oblicza skrót pliku zadaną metodą, mierzy czas i zużycie pamięci.
+
+    Funkcja jest wywoływana w osobnym procesie, tak aby maksymalne
+    zużycie pamięci (ru_maxrss) dotyczyło tylko jednej metody.
+
+    Zwraca:
+        parę: czas w sekundach i maksymalne zużycie pamięci w kilobajtach.
+    """
+    start = time.perf_counter()
+    if method == 'read()':
+        hash_whole_file(full_name)
+    elif method == 'readinto()':
+        cerber.create_digest(full_name)
+    elif method == 'mmap':
+        cerber.create_digest(full_name, use_mmap=True)
+    elapsed = time.perf_counter() - start
+    return elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def benchmark_hashing():
+    """
+    Pomiar przepustowości (MB/s) i zużycia pamięci przy obliczaniu skrótu.
+
+    Uwaga: strony pliku odwzorowanego przez mmap są liczone do RSS procesu,
+    choć są stronami pamięci podręcznej systemu plików i mogą być w każdej
+    chwili zwolnione.
+    """
+    print(f'create_digest(), file {HASHING_FILE_SIZE // 2**20} MiB')
+    context = multiprocessing.get_context('spawn')
+    with tempfile.NamedTemporaryFile() as file:
+        block = os.urandom(2**20)
+        for _ in range(HASHING_FILE_SIZE // len(block)):
+            file.write(block)
+        file.flush()
+        for method in ('read()', 'readinto()', 'mmap'):
+            with context.Pool(1) as pool:
+                elapsed, max_rss = pool.apply(measure_hashing, (method, file.name))
+            speed = HASHING_FILE_SIZE / elapsed / 1e6
+            print(f'{method:12} {speed:8.1f} MB/s  max RSS {max_rss // 1024:6} MiB')
+
+
+def create_files(folder, n_files, file_size, n_folders=10):
+    """
+    Tworzy w folderze n_files plików z losową zawartością.
+
+    Argumenty:
+        folder: folder w którym mają być utworzone podfoldery i pliki.
+        n_files: liczba plików.
+        file_size: wielkość każdego pliku w bajtach.
+        n_folders: liczba podfolderów między które są rozdzielane pliki.
+
+    Zwraca:
+        łączną wielkość plików w bajtach.
+    """
+    for i in range(n_files):
+        subfolder = os.path.join(folder, f'd{i % n_folders}')
+        os.makedirs(subfolder, exist_ok=True)
+        with open(os.path.join(subfolder, f'f{i}.dat'), 'wb') as file:
+            file.write(os.urandom(file_size))
+    return n_files * file_size
+
+
+def benchmark_parallel():
+    """
+    Pomiar szybkości (pliki/s, MB/s) obliczania skrótów przez pulę wątków
+    i pulę procesów dla różnej liczby wątków (procesów).
+    """
+    print(f'create_digests(), {PARALLEL_FILES} files '
+          f'{PARALLEL_FILE_SIZE // 1024} KiB each')
+    with tempfile.TemporaryDirectory() as folder:
+        total_size = create_files(folder, PARALLEL_FILES, PARALLEL_FILE_SIZE)
+        expected = cerber.create_digests(folder)  # także "rozgrzewa" cache
+        for use_processes in (False, True):
+            kind = 'processes' if use_processes else 'threads'
+            for jobs in PARALLEL_JOBS:
+                start = time.perf_counter()
+                result = cerber.create_digests(folder, jobs=jobs,
+                                               use_processes=use_processes)
+                elapsed = time.perf_counter() - start
+                assert result == expected
+                print(f'{jobs:3} {kind:10} {PARALLEL_FILES / elapsed:10.1f} files/s'
+                      f' {total_size / elapsed / 1e6:8.1f} MB/s')
+
+
+def load_store(method, folder):
+    """
+    Czyta zapisane dane o plikach zadaną metodą.
+    """
+    if method == 'pickle':
+        with open(os.path.join(folder, cerber.DIGESTS_FILE_NAME), 'rb') as file:
+            pickle.load(file)
+    else:
+        with cerber.DigestsStore(folder) as store:
+            if method == 'sqlite, all':
+                store.load()
+            elif method == 'sqlite, snapshot':
+                store.load_snapshot()
+            elif method == 'sqlite, folder':
+                store.load_path(os.path.join('root', 'd0', 'd0'))
+            elif method == 'sqlite, digest':
+                store.load_digest(hashlib.sha1(b'0').digest())
+
+
+def benchmark_store():
+    """
+    Porównanie pliku pikle i bazy danych SQLite jako miejsca przechowywania
+    informacji o plikach: czas i pamięć potrzebne na odczyt oraz czas
+    zapisu zmian (1% plików), także bez czytania całej bazy
+    (DigestsStore.synchronize()).
+    """
+    print(f'DigestsStore, {STORE_SIZE} files')
+    old_list = synthetic_digests(STORE_SIZE)
+    new_list = synthetic_changes(old_list)
+    with tempfile.TemporaryDirectory() as folder:
+        start = time.perf_counter()
+        with open(os.path.join(folder, cerber.DIGESTS_FILE_NAME), 'wb') as file:
+            pickle.dump({'digests': new_list, 'stats': {}}, file)
+        print(f'{"pickle, write all":24} {time.perf_counter() - start:8.3f} s')
+        with cerber.DigestsStore(folder) as store:  # przenosi dane z pikla
+            store.replace_all(old_list)
+            start = time.perf_counter()
+            n_rows = cerber.update_store(store, old_list, {}, new_list, {})
+            print(f'{"sqlite, update":24} {time.perf_counter() - start:8.3f} s'
+                  f'  ({n_rows} rows)')
+            store.replace_all(old_list)
+            start = time.perf_counter()
+            n_rows = store.synchronize(new_list)
+            print(f'{"sqlite, synchronize":24} {time.perf_counter() - start:8.3f} s'
+                  f'  ({n_rows} rows)')
+            store.replace_all(new_list)
+        for method in ('pickle', 'sqlite, all', 'sqlite, snapshot', 'sqlite, folder',
+                       'sqlite, digest'):
+            start = time.perf_counter()
+            load_store(method, folder)
+            elapsed = time.perf_counter() - start
+            tracemalloc.start()
+            load_store(method, folder)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f'{method + ", read":24} {elapsed:8.3f} s  peak {peak / 2**20:8.1f} MiB')
+
+
+def benchmark_walk():
+    """
+    Porównanie os.walk() i cerber.walk_files() na wygenerowanym drzewie
+    folderów z pustymi plikami; dla każdego pliku jest też odczytywany
+    wynik stat(), tak jak robi to create_digests().
+    """
+    print(f'walk_files(), {WALK_FILES} files')
+    with tempfile.TemporaryDirectory() as folder:
+        for i in range(WALK_FILES // WALK_FILES_PER_FOLDER):
+            subfolder = os.path.join(folder, f'd{i // 100}', f'd{i}')
+            os.makedirs(subfolder)
+            for j in range(WALK_FILES_PER_FOLDER):
+                open(os.path.join(subfolder, f'f{j}'), 'wb').close()
+
+        start = time.perf_counter()
+        n_files = 0
+        for folder_name, _, files_names in os.walk(folder):
+            for file_name in files_names:
+                os.stat(os.path.join(folder_name, file_name))
+                n_files += 1
+        elapsed = time.perf_counter() - start
+        print(f'{"os.walk()":20} {elapsed:8.3f} s  {n_files / elapsed:10.0f} files/s')
+
+        start = time.perf_counter()
+        n_files = 0
+        for _, _, _, entry in cerber.walk_files(folder):
+            entry.stat()
+            n_files += 1
+        elapsed = time.perf_counter() - start
+        print(f'{"walk_files()":20} {elapsed:8.3f} s  {n_files / elapsed:10.0f} files/s')
+
+
+def benchmark_algorithms():
+    """
+    Pomiar szybkości (MB/s) funkcji skrótu z cerber.HASH_ALGORITHMS
+    dla buforów w pamięci o różnych wielkościach; dla każdej wielkości
+    obliczane są skróty ALGORITHMS_TOTAL_SIZE bajtów.
+    """
+    print('HASH_ALGORITHMS, MB/s for buffer sizes')
+    print(f'{"":10}' + ''.join(f'{size:>12}' for size in ALGORITHMS_BUFFER_SIZES))
+    for name, constructor in cerber.HASH_ALGORITHMS.items():
+        line = f'{name:10}'
+        for size in ALGORITHMS_BUFFER_SIZES:
+            buffer = os.urandom(size)
+            n_buffers = max(1, ALGORITHMS_TOTAL_SIZE // size)
+            start = time.perf_counter()
+            for _ in range(n_buffers):
+                constructor(buffer).digest()
+            elapsed = time.perf_counter() - start
+            line += f'{n_buffers * size / elapsed / 1e6:12.1f}'
+        print(line)
+
+
+def benchmark_watch():
+    """
+    Pomiar czasu jednego cyklu cerber.Watcher.poll() bez zmian i czasu
+    od zmiany pliku do wypisania raportu, dla drzewa z WATCH_FILES plików.
+    """
+    print(f'Watcher, {WATCH_FILES} files')
+    with tempfile.TemporaryDirectory() as folder:
+        create_files(folder, WATCH_FILES, 16, n_folders=WATCH_FILES // 100)
+        stats = {}
+        digests_and_names_list = cerber.create_digests(folder, stats=stats)
+        watcher = cerber.Watcher(folder, digests_and_names_list, stats)
+
+        start = time.perf_counter()
+        watcher.poll()
+        print(f'{"poll(), no changes":30} {time.perf_counter() - start:8.3f} s')
+
+        start = time.perf_counter()
+        watcher.poll(check_files=True)
+        print(f'{"poll(), all files":30} {time.perf_counter() - start:8.3f} s')
+
+        time.sleep(0.01)  # aby czas modyfikacji folderu na pewno się zmienił
+        start = time.perf_counter()
+        os.rename(os.path.join(folder, 'd0', 'f0.dat'),
+                  os.path.join(folder, 'd1', 'moved.dat'))
+        watcher.poll()
+        watcher.report()
+        print(f'{"change -> report":30} {time.perf_counter() - start:8.3f} s'
+              ' (without WATCH_INTERVAL and WATCH_SETTLE)')
+
+
+def report_text(old_list, new_list):
+    """
+    Raporty tekstowe tak jak w cerber.main(), wypisywane do os.devnull.
+    """
+    with open(os.devnull, 'w') as file, contextlib.redirect_stdout(file):
+        for description, result in cerber.compare_digests(old_list, new_list):
+            cerber.print_report(description, result)
+
+
+def benchmark_report():
+    """
+    Porównanie czasu i szczytowego zużycia pamięci przy tworzeniu raportów
+    tekstowych (listy w pamięci) i strumieniowych (JSON Lines), także
+    z sortowaniem zewnętrznym, dla REPORT_SIZE plików z których zmieniła się
+    część REPORT_FRACTION.
+    """
+    print(f'reports, {REPORT_SIZE} files, {REPORT_FRACTION:.0%} changed')
+    old_list = synthetic_digests(REPORT_SIZE)
+    new_list = synthetic_changes(old_list, REPORT_FRACTION)
+    methods = {
+        'text': lambda: report_text(old_list, new_list),
+        'jsonl': lambda: cerber.write_changes(old_list, new_list, 'jsonl', os.devnull),
+        'jsonl, sorted': lambda: cerber.write_changes(old_list, new_list, 'jsonl',
+                                                      os.devnull, sort=True),
+    }
+    for method, procedure in methods.items():
+        start = time.perf_counter()
+        procedure()
+        elapsed = time.perf_counter() - start
+        tracemalloc.start()
+        procedure()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f'{method:20} {elapsed:8.3f} s  peak {peak / 2**20:8.1f} MiB')
+
+
+def benchmark_snapshot():
+    """
+    Porównanie pamięci zajmowanej przez listę krotek i przez cerber.Snapshot
+    dla SNAPSHOT_SIZE plików oraz czasu przeglądania obu struktur.
+    """
+    print(f'Snapshot, {SNAPSHOT_SIZE} files')
+    tracemalloc.start()
+    digests_and_names_list = synthetic_digests(SNAPSHOT_SIZE)
+    list_size = tracemalloc.get_traced_memory()[0]
+    snapshot = cerber.Snapshot(digests_and_names_list)
+    snapshot_size = tracemalloc.get_traced_memory()[0] - list_size
+    tracemalloc.stop()
+    for method, structure, size in (('list of tuples', digests_and_names_list, list_size),
+                                    ('Snapshot', snapshot, snapshot_size)):
+        start = time.perf_counter()
+        for digest, name, path, full in structure:
+            pass
+        elapsed = time.perf_counter() - start
+        print(f'{method:20} {size / 2**20:8.1f} MiB {size / SNAPSHOT_SIZE:8.1f} B/file'
+              f'  iteration {elapsed:8.3f} s')
+
+
+def benchmark_merkle():
+    """
+    Porównanie czasu porównywania dwóch obiektów cerber.Snapshot z MERKLE_SIZE
+    plikami: wszystkich plików (cerber.iter_changes()) i tylko plików
+    w zmienionych folderach (cerber.iter_snapshot_changes()). Czas obliczania
+    skrótów folderów (Snapshot.merkle()) jest podany osobno, bo jest on
+    ponoszony raz, przy tworzeniu obiektu Snapshot.
+    """
+    print(f'Merkle tree, {MERKLE_SIZE} files')
+    old_list = synthetic_digests(MERKLE_SIZE)
+    old_snapshot = cerber.Snapshot(old_list)
+    start = time.perf_counter()
+    old_snapshot.merkle('root')
+    print(f'{"Snapshot.merkle()":30} {time.perf_counter() - start:8.3f} s')
+    for fraction in MERKLE_FRACTIONS:
+        new_list = synthetic_changes(old_list, fraction)
+        new_snapshot = cerber.Snapshot(new_list)
+        new_snapshot.merkle('root')
+        start = time.perf_counter()
+        n_full = sum(1 for record in cerber.iter_changes(old_list, new_list))
+        elapsed_full = time.perf_counter() - start
+        start = time.perf_counter()
+        n_folders = len(cerber.changed_folders(old_snapshot, new_snapshot))
+        n_fast = sum(1 for record in cerber.iter_snapshot_changes(old_snapshot, new_snapshot))
+        elapsed_fast = time.perf_counter() - start
+        print(f'{fraction:8.2%} changed, {n_folders:6} folders:'
+              f' all files {elapsed_full:8.3f} s ({n_full} records),'
+              f' changed folders {elapsed_fast:8.3f} s ({n_fast} records)')
+
+
+@contextlib.contextmanager
+def added_latency(latency):
+    """
+    Zastępstwo sieciowego systemu plików: opóźnienie operacji w cerber.
+
+    Na czas wykonywania instrukcji with funkcje cerber.scan_folder(),
+    cerber.stat_key() i cerber.create_digest() są zastępowane funkcjami,
+    które przed wywołaniem oryginału czekają latency sekund (time.sleep()
+    zwalnia GIL, tak jak oczekiwanie na odpowiedź serwera NFS).
+    """
+    def delayed(function):
+        def wrapper(*args, **kwargs):
+            time.sleep(latency)
+            return function(*args, **kwargs)
+        return wrapper
+
+    names = ('scan_folder', 'stat_key', 'create_digest')
+    originals = {name: getattr(cerber, name) for name in names}
+    try:
+        for name, function in originals.items():
+            setattr(cerber, name, delayed(function))
+        yield
+    finally:
+        for name, function in originals.items():
+            setattr(cerber, name, function)
+
+
+def benchmark_latency():
+    """
+    Porównanie czasu obliczania skrótów LATENCY_FILES plików, gdy każda
+    operacja na plikach i folderach trwa dodatkowo LATENCY sekund: po kolei,
+    przez wątki (cerber.create_digests()) i przez potok asyncio
+    (cerber.create_digests_async()).
+    """
+    print(f'{LATENCY_FILES} files, {LATENCY * 1000:.0f} ms latency')
+    with tempfile.TemporaryDirectory() as folder:
+        create_files(folder, LATENCY_FILES, 4096, n_folders=LATENCY_FILES // 20)
+        methods = {'sequential': lambda: cerber.create_digests(folder, stats={})}
+        for n in LATENCY_IN_FLIGHT:
+            methods[f'threads, jobs={n}'] = lambda n=n: cerber.create_digests(
+                folder, stats={}, jobs=n)
+        for n in LATENCY_IN_FLIGHT:
+            methods[f'asyncio, in_flight={n}'] = lambda n=n: asyncio.run(
+                cerber.create_digests_async(folder, stats={}, in_flight=n))
+        with added_latency(LATENCY):
+            for method, procedure in methods.items():
+                start = time.perf_counter()
+                procedure()
+                print(f'{method:25} {time.perf_counter() - start:8.3f} s')
+
+
+def benchmark_checkpoint():
+    """
+    Pomiar narzutu zapisywania częściowych wyników (cerber.Checkpoint)
+    podczas obliczania skrótów CHECKPOINT_FILES plików, dla różnych odstępów
+    czasu między zapisami (None - bez zapisów).
+    """
+    print(f'Checkpoint, {CHECKPOINT_FILES} files')
+    with tempfile.TemporaryDirectory() as folder, \
+            tempfile.TemporaryDirectory() as store_folder:
+        create_files(folder, CHECKPOINT_FILES, 4096, n_folders=CHECKPOINT_FILES // 100)
+        cerber.create_digests(folder)  # aby pliki były w pamięci podręcznej systemu
+        for interval in CHECKPOINT_INTERVALS:
+            with cerber.DigestsStore(store_folder) as store:
+                checkpoint = None
+                if interval is not None:
+                    checkpoint = cerber.Checkpoint(store, interval=interval)
+                start = time.perf_counter()
+                cerber.create_digests(folder, stats={}, checkpoint=checkpoint)
+                elapsed = time.perf_counter() - start
+                n_saved = len(store.load_checkpoint(cerber.DEFAULT_ALGORITHM)[0])
+                store.clear_checkpoint()
+            print(f'interval {str(interval):6} {elapsed:8.3f} s  ({n_saved} files saved)')
+
+
+def benchmark_instruments():
+    """
+    Pomiar narzutu pomiarów (cerber.Instruments) przy obliczaniu skrótów
+    INSTRUMENTS_FILES małych plików, gdy są wyłączone i gdy są włączone.
+    """
+    print(f'Instruments, {INSTRUMENTS_FILES} files')
+    with tempfile.TemporaryDirectory() as folder:
+        create_files(folder, INSTRUMENTS_FILES, 4096, n_folders=INSTRUMENTS_FILES // 100)
+        cerber.create_digests(folder)  # aby pliki były w pamięci podręcznej systemu
+        for method in ('disabled', 'enabled', 'disabled', 'enabled'):
+            instruments = cerber.Instruments() if method == 'enabled' else None
+            cerber.set_instruments(instruments)
+            start = time.perf_counter()
+            cerber.create_digests(folder, stats={})
+            elapsed = time.perf_counter() - start
+            cerber.set_instruments(None)
+            print(f'{method:10} {elapsed:8.3f} s')
+        for stage, summary in instruments.summary()['stages'].items():
+            print(f'{stage:10} {summary["seconds"]:8.3f} s {summary["files"]:8} files'
+                  f' {summary["bytes"]:12} bytes')
+
+
+BENCHMARKS = {
+    'compare': benchmark_compare,
+    'hashing': benchmark_hashing,
+    'parallel': benchmark_parallel,
+    'store': benchmark_store,
+    'walk': benchmark_walk,
+    'algorithms': benchmark_algorithms,
+    'watch': benchmark_watch,
+    'report': benchmark_report,
+    'snapshot': benchmark_snapshot,
+    'merkle': benchmark_merkle,
+    'latency': benchmark_latency,
+    'checkpoint': benchmark_checkpoint,
+    'instruments': benchmark_instruments,
+}
+
+
+def main():
+    """
+    Uruchamia pomiary wybrane argumentami wywołania programu.
+    """
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        BENCHMARKS[name]()
+        print()
+
+
+if __name__ == '__main__':
+    main()
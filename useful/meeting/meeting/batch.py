@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Wyszukiwanie terminów spotkań dla wielu zapytań jednocześnie, w wielu
+procesach.
+
+Zapytania (obiekty Query) różnią się uczestnikami, czasem trwania spotkania
+i godzinami pracy, ale dotyczą tych samych danych. Dane nie są przesyłane
+razem z każdym zapytaniem: w systemach, w których nowe procesy są tworzone
+przez fork (Linux), procesy robocze dziedziczą je po procesie głównym
+(zmienna globalna _data), a w pozostałych każdy proces roboczy dostaje je
+jeden raz, na początku (initializer w multiprocessing.Pool). Wyniki są
+zwracane w kolejności zapytań.
+
+CC-BY-NC-ND 2024 Sławomir Marczyński
+"""
+
+import multiprocessing
+from collections import namedtuple
+from datetime import timedelta
+
+try:
+    from . import meeting
+except ImportError:
+    import meeting
+
+RESOLUTION = timedelta(minutes=5)
+CHUNK_SIZE = 8
+
+Query = namedtuple("Query",
+                   "participants duration workday_begin workday_end resolution holidays",
+                   defaults=(None, meeting.MEETING_DURATION, meeting.WORKDAY_BEGIN,
+                             meeting.WORKDAY_END, RESOLUTION, meeting.HOLIDAYS))
+Query.__doc__ = """
+Zapytanie o termin spotkania.
+
+participants to identyfikatory uczestników (None oznacza wszystkie osoby
+z danych), holidays to dni wolne od pracy, tak jak w meeting.main(),
+a pozostałe pola są takie jak argumenty meeting.find_suggestions().
+"""
+
+_data = {}  # dane dla solve(), w procesach roboczych ustawiane przez _set_data()
+
+
+def _set_data(data):
+    """
+    Ustawienie danych dla solve() w procesie roboczym.
+    """
+    global _data
+    _data = data
+
+
+def solve(query, data=None):
+    """
+    Odpowiedź na jedno zapytanie.
+
+    Uczestnicy, których nie ma w danych, nie mają żadnych zajętych terminów.
+
+    Args:
+        query: obiekt Query.
+        data: słownik, taki jak zwraca meeting.read_data(); domyślnie
+            dane ustawione dla procesu roboczego.
+
+    Returns:
+        Krotkę (before, after, suggestions) taką jak zwraca
+        service.Scheduler.suggest(); gdy uczestnicy nie mają żadnych
+        zajętych terminów: (None, None, []).
+    """
+    if data is None:
+        data = _data
+    if query.participants is None:
+        subset = data
+    else:
+        subset = {name: data.get(name, []) for name in query.participants}
+    flatten_data = meeting.flatten(subset)
+    if not flatten_data:
+        return None, None, []
+    total_begin, total_end, before, after = meeting.search_bounds(
+        flatten_data, query.resolution, query.duration,
+        query.workday_begin, query.workday_end, query.holidays)
+    suggestions = list(meeting.find_suggestions_sweep(
+        subset, total_begin, total_end, after, query.resolution, query.duration,
+        query.workday_begin, query.workday_end, query.holidays))
+    return before, after, suggestions
+
+
+def solve_all(data, queries, processes=None, chunk_size=CHUNK_SIZE):
+    """
+    Odpowiedzi na wiele zapytań, obliczane w wielu procesach.
+
+    Args:
+        data: słownik, taki jak zwraca meeting.read_data().
+        queries: lista obiektów Query.
+        processes: liczba procesów roboczych, domyślnie tyle ile procesorów;
+            0 oznacza obliczenia w bieżącym procesie, bez procesów roboczych.
+        chunk_size: liczba zapytań przekazywanych procesowi roboczemu
+            za jednym razem.
+
+    Returns:
+        Listę wyników solve(), w kolejności zapytań.
+    """
+    if processes == 0:
+        return [solve(query, data) for query in queries]
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+        _set_data(data)  # procesy robocze dziedziczą dane
+        arguments = {}
+    else:
+        context = multiprocessing.get_context()
+        arguments = {"initializer": _set_data, "initargs": (data,)}
+    try:
+        with context.Pool(processes, **arguments) as pool:
+            return pool.map(solve, queries, chunk_size)
+    finally:
+        _set_data({})
@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Pomiary wydajności programu meeting.py.
+
+Program uruchamia wybrane pomiary (podane jako argumenty wywołania,
+domyślnie wszystkie) i wypisuje czasy ich wykonania. Przykładowo::
+
+    python3 benchmark.py vectorized
+
+Dane do pomiarów są generowane syntetycznie: zajęte terminy setek osób
+w dniach roboczych przez cały rok.
+
+CC-BY-NC-ND 2024 Sławomir Marczyński
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from datetime import time as time_of_day
+
+try:
+    from . import batch, fastread, intervals, meeting, vectorized
+except ImportError:
+    import batch
+    import fastread
+    import intervals
+    import meeting
+    import vectorized
+
+RESOLUTION = timedelta(minutes=5)
+SMALL_PEOPLES = 50
+SMALL_DAYS = 28
+LARGE_PEOPLES = 300
+LARGE_DAYS = 365
+DATA_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "data")
+FIXTURES = ("input3.txt", "input4.txt", "input10.txt", "input15.txt")
+PARSER_SCALE = 1000
+LINEAR_QUERIES = 200
+INDEX_QUERIES = 20000
+BATCH_PEOPLES = 100
+BATCH_DAYS = 90
+BATCH_QUERIES = 400
+SCALED_FIXTURE = "input15.txt"
+SCALED_COPIES = 20
+SCALED_SHIFT = timedelta(weeks=5)
+
+
+def synthetic_data(n_peoples, n_days, per_day=3, seed=0):
+    """
+    Tworzy słownik zajętych terminów fikcyjnych osób.
+
+    Każda osoba ma w każdym dniu od poniedziałku do piątku średnio per_day
+    zajętych terminów, zaczynających się między 7:00 a 17:00 i trwających
+    od 15 minut do 2 godzin.
+
+    Args:
+        n_peoples: liczba osób.
+        n_days: liczba kolejnych dni, od poniedziałku 2024-03-25.
+        per_day: średnia liczba zajętych terminów dziennie.
+        seed: ziarno generatora liczb pseudolosowych.
+
+    Returns:
+        Słownik taki jak zwraca meeting.read_data().
+    """
+    rng = random.Random(seed)
+    first_day = datetime(2024, 3, 25)
+    data = {}
+    for person in range(n_peoples):
+        intervals = []
+        for day in range(n_days):
+            date = first_day + timedelta(days=day)
+            if date.weekday() >= 5:
+                continue
+            for _ in range(rng.randrange(2 * per_day + 1)):
+                begin = date + timedelta(hours=7, minutes=5 * rng.randrange(120))
+                end = begin + timedelta(minutes=15 * rng.randrange(1, 9))
+                intervals.append((begin, end))
+        data[f"Osoba {person:04}"] = intervals
+    return data
+
+
+def search_arguments(data, resolution=RESOLUTION):
+    """
+    Argumenty funkcji find_suggestions() takie, jakie wyznacza meeting.main().
+    """
+    total_begin, total_end, before, after = meeting.search_bounds(meeting.flatten(data),
+                                                                  resolution)
+    return data, total_begin, total_end, after, resolution
+
+
+def measure(search, arguments):
+    """
+    Czas wyszukiwania wszystkich terminów i liczba znalezionych terminów.
+    """
+    start = time.perf_counter()
+    suggestions = list(search(*arguments))
+    return time.perf_counter() - start, suggestions
+
+
+def benchmark_vectorized():
+    """
+    Porównanie meeting.find_suggestions() i vectorized.find_suggestions():
+    obu dla małych danych, tylko drugiej dla LARGE_PEOPLES osób przez
+    LARGE_DAYS dni.
+    """
+    print("vectorized.find_suggestions()")
+    arguments = search_arguments(synthetic_data(SMALL_PEOPLES, SMALL_DAYS))
+    elapsed_python, expected = measure(meeting.find_suggestions, arguments)
+    elapsed_numpy, suggestions = measure(vectorized.find_suggestions, arguments)
+    assert suggestions == expected
+    print(f"{SMALL_PEOPLES:4} osób, {SMALL_DAYS:3} dni:"
+          f" meeting {elapsed_python:8.3f} s, vectorized {elapsed_numpy:8.3f} s"
+          f" ({len(suggestions)} terminów)")
+    arguments = search_arguments(synthetic_data(LARGE_PEOPLES, LARGE_DAYS))
+    elapsed_numpy, suggestions = measure(vectorized.find_suggestions, arguments)
+    print(f"{LARGE_PEOPLES:4} osób, {LARGE_DAYS:3} dni:"
+          f" vectorized {elapsed_numpy:8.3f} s ({len(suggestions)} terminów)")
+
+
+def benchmark_bitmaps():
+    """
+    Porównanie meeting.find_suggestions() i meeting.find_suggestions_bitmaps()
+    dla małych danych oraz find_suggestions_bitmaps() i
+    vectorized.find_suggestions() dla LARGE_PEOPLES osób przez LARGE_DAYS dni.
+    """
+    print("meeting.find_suggestions_bitmaps()")
+    arguments = search_arguments(synthetic_data(SMALL_PEOPLES, SMALL_DAYS))
+    elapsed_python, expected = measure(meeting.find_suggestions, arguments)
+    elapsed_bitmaps, suggestions = measure(meeting.find_suggestions_bitmaps, arguments)
+    assert suggestions == expected
+    print(f"{SMALL_PEOPLES:4} osób, {SMALL_DAYS:3} dni:"
+          f" meeting {elapsed_python:8.3f} s, bitmaps {elapsed_bitmaps:8.3f} s"
+          f" ({len(suggestions)} terminów)")
+    arguments = search_arguments(synthetic_data(LARGE_PEOPLES, LARGE_DAYS))
+    elapsed_bitmaps, suggestions = measure(meeting.find_suggestions_bitmaps, arguments)
+    elapsed_numpy, expected = measure(vectorized.find_suggestions, arguments)
+    assert suggestions == expected
+    print(f"{LARGE_PEOPLES:4} osób, {LARGE_DAYS:3} dni:"
+          f" bitmaps {elapsed_bitmaps:8.3f} s, vectorized {elapsed_numpy:8.3f} s"
+          f" ({len(suggestions)} terminów)")
+
+
+def benchmark_sweep():
+    """
+    Porównanie meeting.find_suggestions() i meeting.find_suggestions_sweep()
+    dla małych danych oraz find_suggestions_sweep() i
+    vectorized.find_suggestions() dla LARGE_PEOPLES osób przez LARGE_DAYS dni.
+    """
+    print("meeting.find_suggestions_sweep()")
+    arguments = search_arguments(synthetic_data(SMALL_PEOPLES, SMALL_DAYS))
+    elapsed_python, expected = measure(meeting.find_suggestions, arguments)
+    elapsed_sweep, suggestions = measure(meeting.find_suggestions_sweep, arguments)
+    assert suggestions == expected
+    print(f"{SMALL_PEOPLES:4} osób, {SMALL_DAYS:3} dni:"
+          f" meeting {elapsed_python:8.3f} s, sweep {elapsed_sweep:8.3f} s"
+          f" ({len(suggestions)} terminów)")
+    arguments = search_arguments(synthetic_data(LARGE_PEOPLES, LARGE_DAYS))
+    elapsed_sweep, suggestions = measure(meeting.find_suggestions_sweep, arguments)
+    elapsed_numpy, expected = measure(vectorized.find_suggestions, arguments)
+    assert suggestions == expected
+    print(f"{LARGE_PEOPLES:4} osób, {LARGE_DAYS:3} dni:"
+          f" sweep {elapsed_sweep:8.3f} s, vectorized {elapsed_numpy:8.3f} s"
+          f" ({len(suggestions)} terminów)")
+
+
+def scaled_fixtures(file, scale=PARSER_SCALE):
+    """
+    Zapisuje do pliku file (otwartego w trybie binarnym) zawartość plików
+    FIXTURES powtórzoną scale razy.
+    """
+    content = b""
+    for fixture in FIXTURES:
+        with open(os.path.join(DATA_FOLDER, fixture), "rb") as fixture_file:
+            content += fixture_file.read().rstrip() + b"\r\n\r\n"
+    for _ in range(scale):
+        file.write(content)
+
+
+def benchmark_parser():
+    """
+    Porównanie meeting.read_data() z funkcjami z modułu fastread dla plików
+    FIXTURES powtórzonych PARSER_SCALE razy.
+    """
+    print("fastread")
+    with tempfile.TemporaryDirectory() as folder:
+        file_name = os.path.join(folder, "scaled.txt")
+        with open(file_name, "wb") as file:
+            scaled_fixtures(file)
+        size = os.path.getsize(file_name) / 2 ** 20
+        readers = (("meeting.read_data()", meeting.read_data),
+                   ("fastread.read_data()", fastread.read_data),
+                   ("fastread.read_minutes()", fastread.read_minutes),
+                   ("fastread.read_minutes(mmap)",
+                    lambda name: fastread.read_minutes(name, use_mmap=True)))
+        results = {}
+        for title, reader in readers:
+            start = time.perf_counter()
+            results[title] = reader(file_name)
+            elapsed = time.perf_counter() - start
+            print(f"{title:28} {elapsed:8.3f} s, {size / elapsed:6.1f} MiB/s")
+        assert results["fastread.read_data()"] == results["meeting.read_data()"]
+
+
+def random_queries(data, n_queries, seed=0):
+    """
+    Losowe zapytania (begin, end) w godzinach pracy, od 15 minut do 2 godzin,
+    w okresie obejmującym dane.
+    """
+    rng = random.Random(seed)
+    flatten_data = meeting.flatten(data)
+    first_day = min(begin for begin, end in flatten_data).replace(hour=0, minute=0)
+    n_days = (max(end for begin, end in flatten_data) - first_day).days + 1
+    queries = []
+    for _ in range(n_queries):
+        begin = first_day + timedelta(days=rng.randrange(n_days),
+                                      hours=8, minutes=5 * rng.randrange(96))
+        queries.append((begin, begin + timedelta(minutes=15 * rng.randrange(1, 9))))
+    return queries
+
+
+def benchmark_index():
+    """
+    Liczba zapytań "kto jest zajęty" na sekundę: przeglądanie wszystkich
+    terminów z meeting.overlapped() i intervals.IntervalIndex, dla
+    LARGE_PEOPLES osób przez LARGE_DAYS dni.
+    """
+    print("intervals.IntervalIndex")
+    data = synthetic_data(LARGE_PEOPLES, LARGE_DAYS)
+    queries = random_queries(data, INDEX_QUERIES)
+
+    start = time.perf_counter()
+    index = intervals.IntervalIndex(data)
+    elapsed = time.perf_counter() - start
+    print(f"indeks {len(index)} terminów utworzony w {elapsed:8.3f} s")
+
+    start = time.perf_counter()
+    expected = [{name for name, booked_intervals in data.items()
+                 for interval in booked_intervals
+                 if meeting.overlapped(interval, query)}
+                for query in queries[:LINEAR_QUERIES]]
+    elapsed = time.perf_counter() - start
+    print(f"overlapped()  {LINEAR_QUERIES / elapsed:10.1f} zapytań/s")
+
+    start = time.perf_counter()
+    results = [index.busy(begin, end) for begin, end in queries]
+    elapsed = time.perf_counter() - start
+    print(f"IntervalIndex {INDEX_QUERIES / elapsed:10.1f} zapytań/s")
+    assert results[:LINEAR_QUERIES] == expected
+
+
+def random_batch(data, n_queries, seed=0):
+    """
+    Losowe zapytania batch.Query: od 5 do 30 uczestników, spotkania od pół
+    godziny do półtorej godziny, różne godziny pracy.
+    """
+    rng = random.Random(seed)
+    names = list(data)
+    queries = []
+    for _ in range(n_queries):
+        workday_begin = rng.choice((time_of_day(7), time_of_day(8), time_of_day(9)))
+        workday_end = rng.choice((time_of_day(15), time_of_day(16), time_of_day(17)))
+        queries.append(batch.Query(rng.sample(names, rng.randrange(5, 31)),
+                                   timedelta(minutes=rng.choice((30, 60, 90))),
+                                   workday_begin, workday_end))
+    return queries
+
+
+def benchmark_batch():
+    """
+    Czas odpowiedzi na BATCH_QUERIES zapytań dla BATCH_PEOPLES osób przez
+    BATCH_DAYS dni, w bieżącym procesie i w 1, 2, 4... procesach roboczych,
+    aż do liczby procesorów (ale co najmniej 2).
+    """
+    print(f"batch.solve_all(), {os.cpu_count()} procesorów")
+    data = synthetic_data(BATCH_PEOPLES, BATCH_DAYS)
+    queries = random_batch(data, BATCH_QUERIES)
+    start = time.perf_counter()
+    expected = batch.solve_all(data, queries, processes=0)
+    sequential = time.perf_counter() - start
+    print(f"bez procesów roboczych {sequential:8.3f} s")
+    processes = 1
+    while True:
+        start = time.perf_counter()
+        results = batch.solve_all(data, queries, processes)
+        elapsed = time.perf_counter() - start
+        assert results == expected
+        print(f"{processes:3} procesów roboczych {elapsed:8.3f} s,"
+              f" przyspieszenie {sequential / elapsed:5.2f}")
+        if processes >= max(2, os.cpu_count() or 1):
+            break
+        processes *= 2
+
+
+def scaled_fixture(copies=SCALED_COPIES, shift=SCALED_SHIFT):
+    """
+    Dane z pliku SCALED_FIXTURE powtórzone copies razy, co shift (pełne
+    tygodnie, więc dni tygodnia się nie zmieniają).
+    """
+    data = meeting.read_data(os.path.join(DATA_FOLDER, SCALED_FIXTURE))
+    return {name: [(begin + copy * shift, end + copy * shift)
+                   for copy in range(copies) for begin, end in intervals]
+            for name, intervals in data.items()}
+
+
+def benchmark_minutes():
+    """
+    Porównanie meeting.find_suggestions(), meeting.find_suggestions_sweep()
+    (z zamianą czasu na minuty na wejściu i wyjściu) i
+    meeting.find_suggestions_minutes() (dane już w minutach) dla danych
+    z pliku SCALED_FIXTURE powtórzonych SCALED_COPIES razy.
+    """
+    data = scaled_fixture()
+    arguments = search_arguments(data)
+    weeks = (arguments[2] - arguments[1]).days // 7
+    print(f"meeting.find_suggestions_minutes(), {SCALED_FIXTURE} x {SCALED_COPIES},"
+          f" {weeks} tygodni")
+    elapsed_python, expected = measure(meeting.find_suggestions, arguments)
+    print(f"find_suggestions()         {elapsed_python:8.3f} s")
+    elapsed_sweep, suggestions = measure(meeting.find_suggestions_sweep, arguments)
+    assert suggestions == expected
+    print(f"find_suggestions_sweep()   {elapsed_sweep:8.3f} s")
+
+    data, total_begin, total_end, best, resolution = arguments
+    data_minutes = {name: [(meeting.to_minutes(begin), meeting.to_minutes_up(end))
+                           for begin, end in intervals]
+                    for name, intervals in data.items()}
+    arguments = (data_minutes, meeting.to_minutes(total_begin), meeting.to_minutes(total_end),
+                 meeting.to_minutes_up(best), resolution // meeting.MINUTE,
+                 meeting.MEETING_DURATION // meeting.MINUTE)
+    elapsed_minutes, suggestions = measure(meeting.find_suggestions_minutes, arguments)
+    assert [(meeting.from_minutes(begin), n, absentee)
+            for begin, n, absentee in suggestions] == expected
+    print(f"find_suggestions_minutes() {elapsed_minutes:8.3f} s")
+
+
+def benchmark_holidays():
+    """
+    Wyszukiwanie terminów z pominięciem dni wolnych od pracy
+    (meeting.HOLIDAYS) i bez, dla małych danych oraz dla LARGE_PEOPLES osób
+    przez LARGE_DAYS dni. Dni wolne są usuwane z przeszukiwanych terminów
+    w całości, więc w długim okresie do sprawdzenia zostaje mniej terminów.
+    """
+    print("meeting.HOLIDAYS")
+    free_days = (meeting.MEETING_DURATION, meeting.WORKDAY_BEGIN, meeting.WORKDAY_END,
+                 meeting.HOLIDAYS)
+    arguments = search_arguments(synthetic_data(SMALL_PEOPLES, SMALL_DAYS)) + free_days
+    elapsed_python, expected = measure(meeting.find_suggestions, arguments)
+    elapsed_sweep, suggestions = measure(meeting.find_suggestions_sweep, arguments)
+    assert suggestions == expected
+    print(f"{SMALL_PEOPLES:4} osób, {SMALL_DAYS:3} dni:"
+          f" meeting {elapsed_python:8.3f} s, sweep {elapsed_sweep:8.3f} s"
+          f" ({len(suggestions)} terminów)")
+    arguments = search_arguments(synthetic_data(LARGE_PEOPLES, LARGE_DAYS))
+    elapsed_all, suggestions = measure(meeting.find_suggestions_sweep, arguments)
+    print(f"{LARGE_PEOPLES:4} osób, {LARGE_DAYS:3} dni, wszystkie dni:"
+          f" sweep {elapsed_all:8.3f} s ({len(suggestions)} terminów)")
+    arguments += free_days
+    elapsed_sweep, suggestions = measure(meeting.find_suggestions_sweep, arguments)
+    elapsed_numpy, expected = measure(vectorized.find_suggestions, arguments)
+    assert suggestions == expected
+    print(f"{LARGE_PEOPLES:4} osób, {LARGE_DAYS:3} dni, dni robocze:"
+          f" sweep {elapsed_sweep:8.3f} s, vectorized {elapsed_numpy:8.3f} s"
+          f" ({len(suggestions)} terminów)")
+
+
+BENCHMARKS = {
+    "vectorized": benchmark_vectorized,
+    "bitmaps": benchmark_bitmaps,
+    "sweep": benchmark_sweep,
+    "parser": benchmark_parser,
+    "index": benchmark_index,
+    "batch": benchmark_batch,
+    "minutes": benchmark_minutes,
+    "holidays": benchmark_holidays,
+}
+
+
+def main():
+    """
+    Uruchamia pomiary wybrane argumentami wywołania programu.
+    """
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        BENCHMARKS[name]()
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Szybkie czytanie danych dla programu meeting.py.
+
+Funkcja meeting.read_data() dopasowuje wyrażenie regularne do każdej linii
+i dwukrotnie wywołuje datetime.fromisoformat(). Tutaj wykorzystujemy to,
+że daty i godziny mają stałą szerokość::
+
+    2024-04-12 15:00:00 2024-04-12 15:20:00
+    0123456789012345678901234567890123456789
+
+więc wystarczy wyciąć je z linii. Plik jest czytany jako bajty (int()
+przyjmuje także bajty, ale również znaki takie jak +, odstęp i _, więc
+najpierw sprawdzamy bytes.isdigit()), linia po linii, bez dekodowania
+UTF-8 linii z terminami. Te same daty z godzinami powtarzają się w danych wiele razy,
+więc każda z nich jest sprawdzana i zamieniana na liczbę tylko raz. Czas
+może być zamieniany od razu na całkowitą liczbę minut od początku epoki
+(1970-01-01 00:00), patrz read_minutes(), albo na obiekty datetime, patrz
+read_data().
+
+Program uruchamiany samodzielnie działa tak jak meeting.py.
+
+CC-BY-NC-ND 2024 Sławomir Marczyński
+"""
+
+import mmap
+from collections import defaultdict
+from datetime import date, datetime
+
+try:
+    from . import meeting  # gdy fastread jest importowany z pakietu meeting
+except ImportError:
+    import meeting  # gdy fastread.py jest uruchamiany jako program
+
+EPOCH = datetime(1970, 1, 1)
+EPOCH_ORDINAL = EPOCH.toordinal()
+MINUTES_PER_DAY = 24 * 60
+
+# Pozycje znaków, które w dacie z godziną (we wzorcu z meeting.read_data())
+# nie są cyframi.
+#
+SEPARATORS = ((4, ord("-")), (7, ord("-")), (10, ord(" ")), (13, ord(":")), (16, ord(":")))
+# Pozycje (początek, koniec) liczb w dacie z godziną.
+#
+FIELDS = ((0, 4), (5, 7), (8, 10), (11, 13), (14, 16), (17, 19))
+TIMESTAMP_LENGTH = 19
+LINE_LENGTH = 2 * TIMESTAMP_LENGTH + 1
+SPACE = ord(" ")
+
+
+def check_digits(timestamp):
+    """
+    Sprawdzenie, czy liczby w dacie z godziną składają się z samych cyfr
+    ASCII, tak jak wymaga datetime.fromisoformat().
+
+    Raises:
+        ValueError: gdy nie składają się.
+    """
+    for start, stop in FIELDS:
+        if not timestamp[start:stop].isdigit():
+            raise ValueError(f"niepoprawna data z godziną {timestamp!r}")
+
+
+def parse_minutes(timestamp, round_up=False):
+    """
+    Liczba minut od EPOCH dla daty z godziną zapisanych jako bajty::
+
+        b"2024-04-12 15:00:00"
+
+    Args:
+        timestamp: data i godzina, TIMESTAMP_LENGTH bajtów.
+        round_up: czy niezerowe sekundy zaokrąglać w górę (domyślnie są
+            pomijane, czyli czas jest zaokrąglany w dół).
+
+    Returns:
+        Liczbę całkowitą albo None, gdy separatory są nie na swoich miejscach.
+        Błędne liczby, tak jak w datetime.fromisoformat(), powodują ValueError.
+    """
+    if any(timestamp[index] != separator for index, separator in SEPARATORS):
+        return None
+    check_digits(timestamp)
+    ordinal = date(int(timestamp[0:4]), int(timestamp[5:7]), int(timestamp[8:10])).toordinal()
+    minutes = ((ordinal - EPOCH_ORDINAL) * MINUTES_PER_DAY
+               + int(timestamp[11:13]) * 60 + int(timestamp[14:16]))
+    if round_up and int(timestamp[17:19]):
+        minutes += 1
+    return minutes
+
+
+def parse_minutes_up(timestamp):
+    """
+    Tak jak parse_minutes(), ale z zaokrąglaniem sekund w górę.
+    """
+    return parse_minutes(timestamp, round_up=True)
+
+
+def parse_datetime(timestamp):
+    """
+    Obiekt datetime.datetime dla daty z godziną zapisanych jako bajty, tak
+    jak parse_minutes(); sekundy nie są zaokrąglane.
+    """
+    if any(timestamp[index] != separator for index, separator in SEPARATORS):
+        return None
+    check_digits(timestamp)
+    return datetime(int(timestamp[0:4]), int(timestamp[5:7]), int(timestamp[8:10]),
+                    int(timestamp[11:13]), int(timestamp[14:16]), int(timestamp[17:19]))
+
+
+def iter_blocks(lines, parse_begin=parse_minutes, parse_end=parse_minutes_up):
+    """
+    Kolejne bloki danych w formacie takim jak dla meeting.read_data().
+
+    W danych te same daty z godzinami powtarzają się wiele razy (terminy
+    zwykle zaczynają się o pełnych pięciu minutach), więc wyniki parse_begin
+    i parse_end są zapamiętywane w słownikach, których kluczami są wycięte
+    z linii bajty. Dla typowej linii wystarczają dwa wycinki i dwa
+    odczyty ze słownika.
+
+    Args:
+        lines: iterowalny ciąg linii jako bajtów w kodowaniu UTF-8, np. plik
+            otwarty w trybie binarnym.
+        parse_begin: funkcja zamieniająca początek terminu na wynik, patrz
+            parse_minutes(); domyślnie liczby minut od EPOCH zaokrąglone
+            w dół.
+        parse_end: funkcja zamieniająca koniec terminu na wynik; domyślnie
+            liczby minut od EPOCH zaokrąglone w górę, tak aby czas zajęty
+            nie uległ skróceniu.
+
+    Yields:
+        Pary (name, intervals), gdzie name to identyfikator osoby, a intervals
+        to lista par (begin, end) z kolejnych linii bloku.
+    """
+    begins = {}
+    ends = {}
+    name = None
+    intervals = None
+    for line in lines:
+        line = line.strip()
+        if intervals is not None and len(line) >= LINE_LENGTH and line[19] == SPACE:
+            begin_key = line[:TIMESTAMP_LENGTH]
+            end_key = line[TIMESTAMP_LENGTH + 1:LINE_LENGTH]
+            try:
+                begin = begins[begin_key]
+            except KeyError:
+                begin = begins[begin_key] = parse_begin(begin_key)
+            try:
+                end = ends[end_key]
+            except KeyError:
+                end = ends[end_key] = parse_end(end_key)
+            if begin is not None and end is not None:
+                intervals.append((begin, end))
+                continue
+
+        # Linie inne niż terminy są rzadkie, więc tu można sobie pozwolić na
+        # dekodowanie i usunięcie wszystkich odstępów, dokładnie tak jak
+        # w meeting.read_data() (str.strip() usuwa także np. twardą spację).
+        #
+        text = line.decode("utf8").strip()
+        if not text:
+            if intervals is not None:
+                yield name, intervals
+            intervals = None
+        elif intervals is None:
+            name = text
+            intervals = []
+        else:
+            line = text.encode("utf8")
+            if len(line) >= LINE_LENGTH and line[19] == SPACE:
+                begin = parse_begin(line[:TIMESTAMP_LENGTH])
+                end = parse_end(line[TIMESTAMP_LENGTH + 1:LINE_LENGTH])
+                if begin is not None and end is not None:
+                    intervals.append((begin, end))
+    if intervals is not None:
+        yield name, intervals
+
+
+def iter_file_lines(file_name, use_mmap=False):
+    """
+    Kolejne linie pliku jako bajty.
+
+    Args:
+        file_name: nazwa pliku.
+        use_mmap: czy plik ma być odwzorowany w pamięci (mmap) zamiast
+            czytany przez bufor.
+
+    Yields:
+        Linie pliku jako bajty, razem ze znakami końca linii.
+    """
+    with open(file_name, "rb") as file:
+        if not use_mmap:
+            yield from file
+            return
+        try:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # pliku o długości zero nie da się odwzorować
+            return
+        with mapped:
+            yield from iter(mapped.readline, b"")
+
+
+def read_minutes(file_name, use_mmap=False):
+    """
+    Czytanie danych z pliku, z czasem jako liczbą minut od EPOCH.
+
+    Początki terminów są zaokrąglane w dół, a końce w górę do pełnej minuty.
+
+    Args:
+        file_name: nazwa pliku, format pliku jak dla meeting.read_data().
+        use_mmap: czy plik ma być odwzorowany w pamięci (mmap).
+
+    Returns:
+        Słownik, którego kluczami są identyfikatory osób, a wartościami listy
+        krotek (begin, end) z liczbami minut od EPOCH.
+    """
+    booked = defaultdict(list)
+    for name, intervals in iter_blocks(iter_file_lines(file_name, use_mmap)):
+        if intervals:
+            booked[name].extend(intervals)
+    return booked
+
+
+def read_data(file_name, use_mmap=False):
+    """
+    Czytanie danych z pliku, tak jak meeting.read_data(), ale szybciej.
+
+    Args:
+        file_name: nazwa pliku, format pliku jak dla meeting.read_data().
+        use_mmap: czy plik ma być odwzorowany w pamięci (mmap).
+
+    Returns:
+        Słownik taki jak zwraca meeting.read_data().
+    """
+    booked = defaultdict(list)
+    for name, intervals in iter_blocks(iter_file_lines(file_name, use_mmap),
+                                       parse_datetime, parse_datetime):
+        if intervals:
+            booked[name].extend(intervals)
+    return booked
+
+
+if __name__ == "__main__":
+    meeting.main(read=read_data)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Indeks zajętych terminów dla wielu zapytań "kto jest zajęty między A i B".
+
+Funkcja meeting.overlapped() sprawdza jedną parę terminów, więc odpowiedź
+na jedno pytanie wymaga przejrzenia wszystkich zajętych terminów wszystkich
+osób. Klasa IntervalIndex jest tworzona raz, z danych takich jak zwraca
+meeting.read_data(), i potem używana dla dowolnie wielu zapytań.
+
+Zajęte terminy są posortowane według początków, a posortowana tablica jest
+traktowana jak zrównoważone drzewo binarne: korzeniem jest środkowy
+element, lewym poddrzewem lewa połowa tablicy itd. (tak jak w wyszukiwaniu
+binarnym). Dla każdego poddrzewa zapamiętany jest najpóźniejszy koniec
+terminu w tym poddrzewie (augmented tree, drzewo przedziałowe). Przy
+wyszukiwaniu terminów nakładających się na (begin, end) pomijamy:
+
+- terminy zaczynające się nie wcześniej niż end - są na końcu tablicy,
+  ich początek wyznacza bisect;
+- całe poddrzewa, w których wszystkie terminy kończą się nie później niż
+  begin.
+
+Każdy odwiedzony węzeł leży więc na ścieżce od korzenia do któregoś ze
+znalezionych terminów albo do granicy wyznaczonej przez bisect. Ścieżki do
+znalezionych terminów nie muszą się pokrywać, każda ma do log n węzłów,
+dlatego w najgorszym razie (np. gdy znalezione terminy są rozrzucone po
+całej tablicy, a między nimi są krótkie terminy kończące się przed begin)
+czas wyszukiwania to O(log n + k log n), a nie O(log n + k), dla
+n terminów w indeksie i k znalezionych. Gdy znalezione terminy leżą obok
+siebie w tablicy (typowe dla zapytań o krótkie okresy), ścieżki mają
+wspólne początki i czas jest bliski O(log n + k). Czas O(log n + k)
+w najgorszym razie dawałoby drzewo priorytetowe (priority search tree),
+ale zwraca ono terminy w dowolnej kolejności, które trzeba by jeszcze
+sortować według początków.
+
+CC-BY-NC-ND 2024 Sławomir Marczyński
+"""
+
+from bisect import bisect_left
+
+
+class IntervalIndex:
+    """
+    Indeks zajętych terminów.
+
+    Terminy mogą być obiektami datetime.datetime, tak jak w
+    meeting.read_data(), albo liczbami, np. minutami z fastread.read_minutes();
+    wystarczy, aby można je było porównywać.
+    """
+
+    def __init__(self, data):
+        """
+        Tworzenie indeksu.
+
+        Args:
+            data: słownik, taki jak zwraca meeting.read_data().
+        """
+        entries = sorted((begin, end, name)
+                         for name, intervals in data.items()
+                         for begin, end in intervals)
+        self.begins = [begin for begin, end, name in entries]
+        self.ends = [end for begin, end, name in entries]
+        self.names = [name for begin, end, name in entries]
+
+        # Najpóźniejszy koniec terminu w poddrzewie, którego korzeniem jest
+        # dany element tablicy. Węzły są wyliczane od korzenia, ale wartości
+        # max_ends trzeba obliczać od liści, dlatego druga pętla przechodzi
+        # przez węzły w odwrotnej kolejności.
+        #
+        self.max_ends = list(self.ends)
+        ranges = [(0, len(entries))]
+        order = []
+        while ranges:
+            lo, hi = ranges.pop()
+            if lo < hi:
+                mid = (lo + hi) // 2
+                order.append((lo, mid, hi))
+                ranges.append((lo, mid))
+                ranges.append((mid + 1, hi))
+        for lo, mid, hi in reversed(order):
+            if lo < mid:
+                self.max_ends[mid] = max(self.max_ends[mid], self.max_ends[(lo + mid) // 2])
+            if mid + 1 < hi:
+                self.max_ends[mid] = max(self.max_ends[mid],
+                                         self.max_ends[(mid + 1 + hi) // 2])
+
+    def __len__(self):
+        return len(self.begins)
+
+    def find(self, begin, end):
+        """
+        Numery (w indeksie) terminów nakładających się na termin (begin, end),
+        tak jak w meeting.overlapped().
+
+        Czas działania to O(log n + k log n) w najgorszym razie, patrz opis
+        modułu.
+
+        Args:
+            begin: początek terminu.
+            end: koniec terminu.
+
+        Returns:
+            Listę numerów, rosnąco, czyli według początków terminów.
+        """
+        begins = self.begins
+        ends = self.ends
+        max_ends = self.max_ends
+        limit = bisect_left(begins, end)  # terminy od limit zaczynają się za późno
+        found = []
+
+        def visit(lo, hi):
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if max_ends[mid] <= begin:
+                    return
+                visit(lo, mid)
+                if mid >= limit:
+                    return
+                if ends[mid] > begin:
+                    found.append(mid)
+                lo = mid + 1
+
+        visit(0, len(begins))
+        return found
+
+    def overlapping(self, begin, end):
+        """
+        Terminy nakładające się na termin (begin, end).
+
+        Returns:
+            Listę trójek (begin, end, name), według początków terminów.
+        """
+        return [(self.begins[i], self.ends[i], self.names[i])
+                for i in self.find(begin, end)]
+
+    def busy(self, begin, end):
+        """
+        Kto jest zajęty w terminie (begin, end).
+
+        Returns:
+            Zbiór identyfikatorów osób, taki sam jak dla meeting.overlapped()
+            sprawdzanego dla wszystkich zajętych terminów.
+        """
+        names = self.names
+        return {names[i] for i in self.find(begin, end)}
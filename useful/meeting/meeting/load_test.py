@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test obciążeniowy usługi service.py.
+
+Wielu klientów (każdy z osobnym połączeniem) wysyła jednocześnie zapytania
+busy, suggest, add i remove, a program wypisuje liczbę zapytań na sekundę
+i czasy odpowiedzi (mediana, 95 i 99 percentyl). Bez podania --port
+ani --unix serwer jest uruchamiany w tym samym procesie, z danymi
+syntetycznymi z benchmark.py albo z pliku, przykładowo::
+
+    python3 load_test.py --clients 20 --requests 500
+    python3 load_test.py --port 8765 ../data/input15.txt
+
+Serwer w tym samym procesie dzieli pętlę zdarzeń z klientami, więc wyniki
+są zaniżone; dokładniejsze są pomiary serwera uruchomionego osobno.
+
+CC-BY-NC-ND 2024 Sławomir Marczyński
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+try:
+    from . import benchmark, fastread, service
+except ImportError:
+    import benchmark
+    import fastread
+    import service
+
+CLIENTS = 20
+REQUESTS = 200
+COMMANDS = ("busy", "suggest", "add", "remove")
+WEIGHTS = (70, 20, 5, 5)
+
+
+def percentile(values, fraction):
+    """
+    Percentyl z posortowanej listy wartości.
+    """
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+async def run_client(number, connect, n_requests, queries, latencies, errors):
+    """
+    Jeden klient: n_requests losowych zapytań wysyłanych jedno po drugim.
+
+    Args:
+        number: numer klienta, ziarno generatora liczb pseudolosowych.
+        connect: funkcja bez argumentów zwracająca parę (reader, writer).
+        n_requests: liczba zapytań.
+        queries: lista terminów (begin, end) do zapytań.
+        latencies: słownik, do którego list są dopisywane czasy odpowiedzi.
+        errors: lista, do której są dopisywane błędy.
+    """
+    rng = random.Random(number)
+    name = f"Klient {number:04}"
+    added = []
+    reader, writer = await connect()
+    try:
+        for _ in range(n_requests):
+            command = rng.choices(COMMANDS, WEIGHTS)[0]
+            if command == "remove" and not added:
+                command = "add"
+            if command == "suggest":
+                request = {"command": command, "duration": rng.choice((30, 60, 90))}
+            elif command == "remove":
+                begin, end = added.pop(rng.randrange(len(added)))
+                request = {"command": command, "name": name,
+                           "begin": str(begin), "end": str(end)}
+            else:
+                begin, end = rng.choice(queries)
+                request = {"command": command, "begin": str(begin), "end": str(end)}
+                if command == "add":
+                    request["name"] = name
+                    added.append((begin, end))
+
+            start = time.perf_counter()
+            writer.write(json.dumps(request).encode("utf8") + b"\n")
+            await writer.drain()
+            response = json.loads(await reader.readline())
+            latencies[command].append(time.perf_counter() - start)
+            if not response["ok"]:
+                errors.append(response["error"])
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+async def load_test(data, n_clients, n_requests, host=None, port=None, path=None):
+    """
+    Test obciążeniowy.
+
+    Args:
+        data: dane, słownik taki jak zwraca meeting.read_data(); dla
+            serwera w tym samym procesie są jego danymi początkowymi, a dla
+            serwera działającego osobno tylko wyznaczają okres zapytań.
+        n_clients: liczba jednoczesnych klientów.
+        n_requests: liczba zapytań każdego klienta.
+        host, port, path: adres działającego serwera; gdy port i path są
+            None, to serwer jest uruchamiany w tym samym procesie.
+
+    Returns:
+        Krotkę (elapsed, latencies, errors): czas trwania testu w sekundach,
+        słownik z listami czasów odpowiedzi dla poszczególnych poleceń i lista
+        błędów.
+    """
+    server = None
+    if port is None and path is None:
+        server = await service.start_server(service.Scheduler(data), port=0)
+        host, port = server.sockets[0].getsockname()[:2]
+
+    async def connect():
+        if path is not None:
+            return await asyncio.open_unix_connection(path)
+        return await asyncio.open_connection(host or service.HOST, port)
+
+    queries = benchmark.random_queries(data, 10 * n_requests)
+    latencies = {command: [] for command in COMMANDS}
+    errors = []
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(run_client(number, connect, n_requests, queries,
+                                          latencies, errors)
+                               for number in range(n_clients)))
+    finally:
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+    return time.perf_counter() - start, latencies, errors
+
+
+def main(argv=None):
+    """
+    Uruchomienie testu i wypisanie wyników.
+    """
+    parser = argparse.ArgumentParser(description="Test obciążeniowy usługi service.py.")
+    parser.add_argument("file_name", nargs="?",
+                        help="plik z danymi (domyślnie dane syntetyczne z benchmark.py)")
+    parser.add_argument("--clients", type=int, default=CLIENTS,
+                        help=f"liczba jednoczesnych klientów (domyślnie {CLIENTS})")
+    parser.add_argument("--requests", type=int, default=REQUESTS,
+                        help=f"liczba zapytań każdego klienta (domyślnie {REQUESTS})")
+    parser.add_argument("--host", default=service.HOST, help="adres działającego serwera")
+    parser.add_argument("--port", type=int, help="port działającego serwera")
+    parser.add_argument("--unix", metavar="PATH", help="gniazdo Unix działającego serwera")
+    args = parser.parse_args(argv)
+
+    if args.file_name:
+        data = fastread.read_data(args.file_name)
+    else:
+        data = benchmark.synthetic_data(benchmark.SMALL_PEOPLES, benchmark.SMALL_DAYS)
+    elapsed, latencies, errors = asyncio.run(
+        load_test(data, args.clients, args.requests, args.host, args.port, args.unix))
+
+    total = sum(len(values) for values in latencies.values())
+    print(f"{args.clients} klientów, {total} zapytań w {elapsed:.3f} s:"
+          f" {total / elapsed:.1f} zapytań/s, błędów: {len(errors)}")
+    print(f"{'polecenie':10} {'liczba':>8} {'mediana':>10} {'95%':>10} {'99%':>10}")
+    for command, values in latencies.items():
+        if values:
+            values.sort()
+            print(f"{command:10} {len(values):8}"
+                  + "".join(f" {1000 * percentile(values, fraction):7.2f} ms"
+                            for fraction in (0.5, 0.95, 0.99)))
+    for error in errors[:10]:
+        print(error)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,10 +7,45 @@ Wyszukiwanie terminu spotkania dla (dużej) grupy osób, program w języku Pytho
 CC-BY-NC-ND 2024 Sławomir Marczyński
 """
 
+import importlib.util
+import math
+import os
 import re
+import sys
 from collections import defaultdict
 from datetime import datetime, time, timedelta
 
+HOLIDAYS_MODULE = "_meeting_holidays"  # nazwa, pod którą jest ładowany holidays.py
+HOLIDAYS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, os.pardir, "holidays.py")
+
+
+def load_holidays_module():
+    """
+    Moduł holidays.py z folderu useful, dwa poziomy wyżej niż meeting.py.
+
+    Moduł jest ładowany wprost z pliku HOLIDAYS_FILE i zapamiętywany
+    w sys.modules pod nazwą HOLIDAYS_MODULE. Zwykłe import holidays mogłoby
+    znaleźć zupełnie inny moduł o tej samej nazwie, np. pakiet holidays z PyPI.
+
+    Returns:
+        Obiekt modułu.
+    """
+    try:
+        return sys.modules[HOLIDAYS_MODULE]
+    except KeyError:
+        pass
+    spec = importlib.util.spec_from_file_location(HOLIDAYS_MODULE, HOLIDAYS_FILE)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[HOLIDAYS_MODULE] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[HOLIDAYS_MODULE]
+        raise
+    return module
+
+
 # @todo: Program mógłby wyszukiwać terminy mając na względzie dodatkowe
 #        postulaty, takie jak np. przedkładanie tych dni w których obciążenia
 #        uczestników innymi zajęciami są względnie małe.
@@ -27,6 +62,12 @@ MEETING_DURATION = timedelta(hours=1)  # @todo: dać możliwość wyboru
 FILE_NAME = "input4.txt"  # @todo: dać możliwość wyboru
 WORKDAY_BEGIN = time(hour=8)  # dzień pracy od 8:00 do 16:00
 WORKDAY_END = time(hour=16)  # dzień pracy od 8:00 do 16:00
+_holidays = load_holidays_module()
+HOLIDAYS = _holidays.Holidays(_holidays.HOLIDAYS_PL)  # wolne dni
+
+EPOCH = datetime(1970, 1, 1)  # początek rachuby czasu w minutach
+MINUTE = timedelta(minutes=1)
+MINUTES_PER_DAY = 24 * 60
 
 
 def read_data(file_name):
@@ -182,6 +223,32 @@ def flatten(data):
     return flatten_list
 
 
+def to_minutes(datetime_object):
+    """
+    Liczba pełnych minut od EPOCH, czyli czas zaokrąglony w dół do minuty.
+
+    Obliczenia na liczbach całkowitych są znacznie szybsze niż na obiektach
+    datetime i timedelta, dlatego w pętlach wyszukiwania czas jest
+    przechowywany jako liczba minut, a obiekty datetime są używane tylko
+    przy czytaniu danych i wypisywaniu wyników.
+    """
+    return (datetime_object - EPOCH) // MINUTE
+
+
+def to_minutes_up(datetime_object):
+    """
+    Liczba minut od EPOCH, zaokrąglona w górę.
+    """
+    return -((EPOCH - datetime_object) // MINUTE)
+
+
+def from_minutes(minutes):
+    """
+    Zamiana liczby minut od EPOCH na obiekt datetime.datetime.
+    """
+    return EPOCH + minutes * MINUTE
+
+
 def round_down(datetime_object, resolution_timedelta):
     """
     Zaokrąglanie obiektów datetime w dół (w kierunku przeszłości).
@@ -195,19 +262,12 @@ def round_down(datetime_object, resolution_timedelta):
     Returns:
         zaokrąglony w dół obiekt klasy datetime.datetime
     """
-    date = datetime_object.date()
-    h = datetime_object.hour
-    m = datetime_object.minute
-    minutes = h * 60 + m
+    minutes = to_minutes(datetime_object)
     step = int(resolution_timedelta.total_seconds() / 60)
     #
-    # Proste zaokrąglanie minut.
+    # Proste zaokrąglanie minut, licząc od północy.
     #
-    minutes = (minutes // step) * step
-    h = minutes // 60
-    m = minutes - h * 60
-    datetime_object = datetime.combine(date, time(h, m))
-    return datetime_object
+    return from_minutes(minutes - minutes % MINUTES_PER_DAY % step)
 
 
 def round_up(datetime_object, resolution_timedelta):
@@ -222,29 +282,54 @@ def round_up(datetime_object, resolution_timedelta):
 
     Returns:
         zaokrąglony w górę obiekt klasy datetime.datetime
+
+    Wcześniejsza wersja (z datetime.combine()) działała tylko dla czasu już
+    "okrągłego", a dla każdego innego zgłaszała ValueError, bo wyliczała
+    godzinę ujemną albo większą niż 23. Sekundy, tak jak wcześniej, są
+    pomijane::
+
+        >>> round_up(datetime(2024, 4, 12, 15, 7), timedelta(minutes=5))
+        datetime.datetime(2024, 4, 12, 15, 10)
+        >>> round_up(datetime(2024, 4, 12, 23, 58), timedelta(minutes=5))
+        datetime.datetime(2024, 4, 13, 0, 0)
+        >>> round_up(datetime(2024, 4, 12, 15, 10, 30), timedelta(minutes=5))
+        datetime.datetime(2024, 4, 12, 15, 10, 30)
     """
-    date = datetime_object.date()
-    h = datetime_object.hour
-    m = datetime_object.minute
-    minutes = h * 60 + m
+    minutes = to_minutes(datetime_object)
     step = int(resolution_timedelta.total_seconds() / 60)
-    if minutes % step == 0:
+    if minutes % MINUTES_PER_DAY % step == 0:
         # Zaokrąglanie nie jest potrzebne, wynik już jest "okrągły".
         #
         return datetime_object
-    if 24 * 60 - minutes <= step:
-        # Proste zaokrąglanie minut.
-        #
-        minutes = (minutes // step + 1) * step
-    else:
-        # Trochę trudniej, musimy przy zaokrąglaniu zmienić datę.
-        #
-        date = date + timedelta(days=1)
-        minutes = (minutes // step + 1) * step - 24 * 60
-    h = minutes // 60
-    m = minutes - h * 60
-    datetime_object = datetime.combine(date, time(h, m))
-    return datetime_object
+    #
+    # Proste zaokrąglanie minut, licząc od północy. Wynik może wypaść
+    # o północy następnego dnia, ale liczba minut od EPOCH nie wymaga
+    # osobnego traktowania zmiany daty.
+    #
+    return from_minutes(minutes - minutes % MINUTES_PER_DAY % step + step)
+
+
+def free_day_mask(holidays, first_day, n_days):
+    """
+    Które z kolejnych dni są wolne od pracy.
+
+    Sprawdzanie czy dzień jest wolny jest wykonywane raz dla każdego dnia,
+    a nie dla każdego terminu spotkania w tym dniu.
+
+    Args:
+        holidays: obiekt z metodą is_free(date), np. holidays.Holidays,
+            albo None, gdy żaden dzień nie jest wolny.
+        first_day: pierwszy dzień, obiekt datetime.date.
+        n_days: liczba dni.
+
+    Returns:
+        Obiekt bytearray, w którym 1 oznacza dzień wolny, a 0 dzień roboczy.
+    """
+    mask = bytearray(max(0, n_days))
+    if holidays is not None:
+        for day in range(len(mask)):
+            mask[day] = holidays.is_free(first_day + timedelta(days=day))
+    return mask
 
 
 def overlapped(interval1, interval2):
@@ -265,34 +350,28 @@ def overlapped(interval1, interval2):
     return begin1 < end2 and end1 > begin2
 
 
-def main():  # @todo: ta funkcja jest zbyt zbyt złożona, zrefaktoryzować.
-
-    # Czytanie danych i ich pobieżna weryfikacja.
-    #
-    data = read_data(FILE_NAME)
-    if not data:
-        print("Brak danych, zaawansowane wyszukiwanie terminów niemożliwe.")
-        return
-
-    number_of_peoples = len(data)
-    print(f"Planowanie spotkania {number_of_peoples} osób.")
-    flatten_data = flatten(data)
-
-    if not flatten_data:
-        print("Nie ma żadnych ograniczeń na termin spotkania.")
-        return
+def search_bounds(flatten_data, resolution, duration=MEETING_DURATION,
+                  workday_begin=WORKDAY_BEGIN, workday_end=WORKDAY_END, holidays=None):
+    """
+    Przeszukiwany okres i terminy spotkania przed i po wszystkich zajętych
+    terminach.
 
-    # Rozsądna dokładność terminów spotkań, przecież nie chcemy ustalać
-    # rozpoczęcia spotkania na takie godziny jak 13:49 czy 11:44,
-    # bo są trudne do zapamiętania.
-    #
-    # UWAGA: resolution_timedelta powinno być mniejsze niż kilka godzin
-    #        (a nawet jedna godzina), bo obecna wersja algorytmu zaokrąglania
-    #        może dawać, jeżeli ten warunek nie będzie spełniony, złe wyniki.
-    #
-    resolution = timedelta(minutes=5)
-    assert resolution <= timedelta(hours=1)
+    Args:
+        flatten_data: lista zajętych terminów, taka jak zwraca flatten(),
+            niepusta.
+        resolution: skok podziałki jako obiekt datetime.timedelta.
+        duration: czas trwania spotkania.
+        workday_begin: początek dnia pracy, obiekt datetime.time.
+        workday_end: koniec dnia pracy, obiekt datetime.time.
+        holidays: obiekt z metodą is_free(date), np. HOLIDAYS, albo None;
+            gdy podany, to before i after nie wypadają w dni wolne od pracy.
 
+    Returns:
+        Krotkę (total_begin, total_end, before, after), gdzie total_begin
+        i total_end to zaokrąglone początek i koniec przeszukiwanego okresu,
+        a before i after to terminy spotkania na pewno możliwe, przed
+        i po wszystkich zajętych terminach.
+    """
     # Szukamy najwcześniejszego i najpóźniejszego terminu w danych.
     #
     total_begin = min((begin for begin, end in flatten_data))
@@ -316,18 +395,80 @@ def main():  # @todo: ta funkcja jest zbyt zbyt złożona, zrefaktoryzować.
     # korekcja polega na przeniesienie spotkania na możliwie najwcześniejszą
     # godzinę w dniu następnym.
     #
-    before = total_begin - MEETING_DURATION
+    before = total_begin - duration
     after = total_end
     one_day = timedelta(days=1)
-    if before.time() < WORKDAY_BEGIN:
-        before = datetime.combine(before.date() - one_day, WORKDAY_END)
-        before -= MEETING_DURATION
-    if (after + MEETING_DURATION).time() > WORKDAY_END:
-        after = datetime.combine(after.date() + one_day, WORKDAY_BEGIN)
+    if before.time() < workday_begin:
+        before = datetime.combine(before.date() - one_day, workday_end)
+        before -= duration
+    if (after + duration).time() > workday_end:
+        after = datetime.combine(after.date() + one_day, workday_begin)
+
+    # Dni wolne od pracy są pomijane: spotkanie jest przenoszone na
+    # najpóźniejszą godzinę poprzedniego dnia roboczego albo na najwcześniejszą
+    # godzinę następnego dnia roboczego.
+    #
+    if holidays is not None:
+        while holidays.is_free(before.date()):
+            before = datetime.combine(before.date() - one_day, workday_end) - duration
+        while holidays.is_free(after.date()):
+            after = datetime.combine(after.date() + one_day, workday_begin)
+    return total_begin, total_end, before, after
+
+
+def main(file_name=FILE_NAME, search=None, read=None,
+         holidays=HOLIDAYS):  # @todo: zrefaktoryzować dalej.
+    """
+    Wyszukiwanie i wypisywanie terminów spotkania.
+
+    Args:
+        file_name: nazwa pliku z danymi, patrz read_data().
+        search: funkcja wyszukująca terminy, o takich argumentach i wyniku
+            jak find_suggestions(), np. vectorized.find_suggestions();
+            domyślnie find_suggestions_sweep().
+        read: funkcja czytająca dane, taka jak read_data(), np.
+            fastread.read_data(); domyślnie read_data().
+        holidays: obiekt z metodą is_free(date), np. holidays.Holidays,
+            określający dni wolne od pracy; None oznacza, że wszystkie dni
+            są dniami roboczymi.
+    """
+    if search is None:
+        search = find_suggestions_sweep
+    if read is None:
+        read = read_data
+
+    # Czytanie danych i ich pobieżna weryfikacja.
+    #
+    data = read(file_name)
+    if not data:
+        print("Brak danych, zaawansowane wyszukiwanie terminów niemożliwe.")
+        return
+
+    number_of_peoples = len(data)
+    print(f"Planowanie spotkania {number_of_peoples} osób.")
+    flatten_data = flatten(data)
+
+    if not flatten_data:
+        print("Nie ma żadnych ograniczeń na termin spotkania.")
+        return
+
+    # Rozsądna dokładność terminów spotkań, przecież nie chcemy ustalać
+    # rozpoczęcia spotkania na takie godziny jak 13:49 czy 11:44,
+    # bo są trudne do zapamiętania.
+    #
+    # UWAGA: resolution_timedelta powinno być mniejsze niż kilka godzin
+    #        (a nawet jedna godzina), bo obecna wersja algorytmu zaokrąglania
+    #        może dawać, jeżeli ten warunek nie będzie spełniony, złe wyniki.
+    #
+    resolution = timedelta(minutes=5)
+    assert resolution <= timedelta(hours=1)
+
+    total_begin, total_end, before, after = search_bounds(flatten_data, resolution,
+                                                          holidays=holidays)
 
     # Mamy już (częściowe) rozwiązanie problemu — sugerowane terminy
-    # spotkań. Nie jest jednak sprawdzane, czy terminy te nie są
-    # wyznaczone na dni ustawowo wolne od pracy, w tym soboty i niedziele.
+    # spotkań, które nie wypadają w dni wolne od pracy (o ile holidays nie
+    # jest None), w tym w soboty i niedziele.
     #
     print()
     print(f"Spotkanie może się odbyć albo wcześniej niż {before},")
@@ -336,6 +477,38 @@ def main():  # @todo: ta funkcja jest zbyt zbyt złożona, zrefaktoryzować.
     print("Inne proponowane terminy:")
     print()
 
+    for begin_meeting, n_absentee, absentee in search(data, total_begin, total_end,
+                                                      after, resolution,
+                                                      holidays=holidays):
+        print_suggestion(begin_meeting, n_absentee, absentee)
+
+
+def find_suggestions(data, total_begin, total_end, best, resolution,
+                     duration=MEETING_DURATION, workday_begin=WORKDAY_BEGIN,
+                     workday_end=WORKDAY_END, holidays=None):
+    """
+    Wyszukiwanie terminów spotkań przy coraz większej liczbie nieobecnych.
+
+    Args:
+        data: słownik, taki jak zwraca read_data().
+        total_begin: początek przeszukiwanego okresu, zaokrąglony w dół.
+        total_end: koniec przeszukiwanego okresu, zaokrąglony w górę.
+        best: termin (obiekt datetime) na pewno możliwy, szukamy wcześniejszych.
+        resolution: skok podziałki jako obiekt datetime.timedelta.
+        duration: czas trwania spotkania.
+        workday_begin: początek dnia pracy, obiekt datetime.time.
+        workday_end: koniec dnia pracy, obiekt datetime.time.
+        holidays: obiekt z metodą is_free(date), np. HOLIDAYS; spotkania
+            nie mogą się zaczynać w dni wolne od pracy. Domyślnie None,
+            czyli wszystkie dni są dniami roboczymi.
+
+    Yields:
+        Krotki (begin_meeting, n_absentee, absentee), gdzie begin_meeting to
+        początek spotkania, n_absentee to dopuszczalna liczba nieobecnych,
+        a absentee to zbiór nieobecnych. Każdy kolejny termin jest
+        wcześniejszy od poprzedniego.
+    """
+
     # Iteracyjnie sprawdzamy, co dzieje się, gdy zgodzimy się na nieobecność
     # części potencjalnych uczestników. Oczywiście zaczynamy od zgody na zero
     # nieobecności, czyli ma być pełna obecność.
@@ -344,25 +517,24 @@ def main():  # @todo: ta funkcja jest zbyt zbyt złożona, zrefaktoryzować.
     #        które obejmują dni które jeszcze nie minęły, tj. w których
     #        będzie można jeszcze coś zrobić?
     #
-    best = after  # najlepsze rozwiązanie to te z najbliższą datą spotkania
-    for n_absentee in range(number_of_peoples):  # pętla po liczbie nieobecnych
+    for n_absentee in range(len(data)):  # pętla po liczbie nieobecnych
         begin_meeting = total_begin
-        end_meeting = begin_meeting + MEETING_DURATION
+        end_meeting = begin_meeting + duration
 
         # Sprawdzamy, czy możemy dalej szukać i, dodatkowo, czy damy radę
         # znaleźć lepsze rozwiązanie niż już najlepsze znalezione do tej pory.
         #
         while end_meeting <= total_end and begin_meeting < best:
 
-            # Sprawdzamy, czy mieścimy się w godzinach pracy.
-            #
-            # @todo: A co z niedzielami i świętami ustawowymi?
+            # Sprawdzamy, czy mieścimy się w godzinach pracy i czy dzień nie
+            # jest wolny od pracy (niedziele, święta ustawowe itd.).
             #
             # @todo: Być może szybciej byłoby przechodzić najpierw po kolejnych
             #        dniach, a dopiero potem po godzinach pracy.
             #
-            if (begin_meeting.time() <= WORKDAY_END and
-                    end_meeting.time() >= WORKDAY_BEGIN):
+            if (begin_meeting.time() <= workday_end and
+                    end_meeting.time() >= workday_begin and
+                    (holidays is None or not holidays.is_free(begin_meeting.date()))):
                 meeting_interval = begin_meeting, end_meeting
 
                 # Nieobecni tworzą zbiór. Jeżeli nieobecność Pauli
@@ -378,24 +550,11 @@ def main():  # @todo: ta funkcja jest zbyt zbyt złożona, zrefaktoryzować.
                         if overlapped(interval, meeting_interval):
                             absentee.add(name)
 
-                # Jeżeli liczba nieobecnych jest dopuszczalna w danej iteracji,
-                # to wypisujemy znaleziony rezultat. Trochę kłopotliwe jest
-                # dopasowywanie odpowiedzi tak, aby nie była ona rażąco
-                # niezgodna z gramatyką języka polskiego.
-                #
-                # @todo: Jak rozdzielić wypisywanie i obliczenia "back-end"?
-                # @todo: Jak przeprowadzić i18n i L10n ?
+                # Jeżeli liczba nieobecnych jest dopuszczalna w danej
+                # iteracji, to mamy rezultat.
                 #
                 if len(absentee) <= n_absentee:
-                    print(begin_meeting, end="  ")
-                    if len(absentee) == 0:
-                        print(f"wszyscy obecni")
-                    elif len(absentee) == 1:
-                        name = list(absentee)[0]
-                        print(f" 1 nieobecny: {name}")
-                    else:
-                        names = ", ".join(sorted(list(absentee)))
-                        print(f"{n_absentee:2} nieobecnych: {names}")
+                    yield begin_meeting, n_absentee, absentee
                     best = begin_meeting
                     break
 
@@ -406,6 +565,423 @@ def main():  # @todo: ta funkcja jest zbyt zbyt złożona, zrefaktoryzować.
             end_meeting += resolution
 
 
+def blocked_slots(intervals, origin, n_slots, resolution, duration):
+    """
+    Numery terminów spotkania, w których osoba jest nieobecna.
+
+    Wszystkie czasy są liczbami całkowitymi minut, patrz to_minutes().
+    Termin o numerze i zaczyna się i * resolution po origin i trwa duration.
+    Zajęty termin (begin, end) koliduje z nim, tak jak w overlapped(), gdy
+    begin < początek + duration i end > początek, czyli dla numerów od
+    (begin - origin - duration) // resolution + 1 do ceil((end - origin) /
+    resolution) - 1. Przedziały numerów nakładające się lub sąsiadujące ze
+    sobą są łączone, więc każdy numer należy co najwyżej do jednego z nich.
+
+    Args:
+        intervals: lista zajętych terminów jednej osoby, par (begin, end).
+        origin: początek pierwszego terminu.
+        n_slots: liczba terminów.
+        resolution: skok podziałki.
+        duration: czas trwania spotkania.
+
+    Returns:
+        Posortowaną listę par (first, stop) - numerów od first do stop - 1.
+    """
+    ranges = []
+    for begin, end in intervals:
+        first = max(0, (begin - origin - duration) // resolution + 1)
+        stop = min(n_slots, (end - origin + resolution - 1) // resolution)
+        if stop > first:
+            ranges.append((first, stop))
+    ranges.sort()
+    merged = []
+    for first, stop in ranges:
+        if merged and first <= merged[-1][1]:
+            if stop > merged[-1][1]:
+                merged[-1] = merged[-1][0], stop
+        else:
+            merged.append((first, stop))
+    return merged
+
+
+def workday_windows(duration, workday_begin, workday_end):
+    """
+    Minuty doby, w których może zacząć się spotkanie, tak jak
+    w find_suggestions(): początek nie później niż workday_end, a koniec
+    (być może następnego dnia) nie wcześniej niż workday_begin.
+
+    Warunek zależy tylko od minuty doby, więc wystarczy go sprawdzić raz dla
+    każdej z 1440 minut, a nie dla każdego terminu w przeszukiwanym okresie.
+
+    Args:
+        duration: czas trwania spotkania w minutach.
+        workday_begin: początek dnia pracy, obiekt datetime.time.
+        workday_end: koniec dnia pracy, obiekt datetime.time.
+
+    Returns:
+        Listę par (first, stop) - minut doby od first do stop - 1, rosnąco.
+    """
+    windows = []
+    first = None
+    for minute in range(MINUTES_PER_DAY + 1):
+        end_minute = (minute + duration) % MINUTES_PER_DAY
+        if (minute < MINUTES_PER_DAY and
+                time(minute // 60, minute % 60) <= workday_end and
+                time(end_minute // 60, end_minute % 60) >= workday_begin):
+            if first is None:
+                first = minute
+        elif first is not None:
+            windows.append((first, minute))
+            first = None
+    return windows
+
+
+def workday_runs(origin, n_slots, resolution, duration, workday_begin, workday_end,
+                 holidays=None):
+    """
+    Ciągi kolejnych terminów mieszczących się w godzinach pracy.
+
+    Okna workday_windows() są przesuwane na kolejne dni i zamieniane na
+    numery terminów, więc praca jest proporcjonalna do liczby dni, a nie
+    liczby terminów. Dni wolne od pracy (free_day_mask()) są pomijane
+    w całości. Wszystkie czasy są liczbami całkowitymi minut.
+
+    Yields:
+        Pary (first, stop) - numery terminów od first do stop - 1, rosnąco.
+    """
+    windows = workday_windows(duration, workday_begin, workday_end)
+    day = origin // MINUTES_PER_DAY * MINUTES_PER_DAY
+    last = origin + n_slots * resolution
+    free = free_day_mask(holidays, from_minutes(day).date(),
+                         (last - day + MINUTES_PER_DAY - 1) // MINUTES_PER_DAY)
+    for is_free in free:
+        if is_free:
+            day += MINUTES_PER_DAY
+            continue
+        for window_begin, window_end in windows:
+            first = max(0, (day + window_begin - origin + resolution - 1) // resolution)
+            stop = min(n_slots, (day + window_end - origin + resolution - 1) // resolution)
+            if stop > first:
+                yield first, stop
+        day += MINUTES_PER_DAY
+
+
+def find_suggestions_minutes(data, total_begin, total_end, best, resolution,
+                             duration, workday_begin=WORKDAY_BEGIN,
+                             workday_end=WORKDAY_END, holidays=None, blocked=None):
+    """
+    Wyszukiwanie terminów spotkań, tak jak find_suggestions(), ale w jednym
+    przejściu przez czas (sweep line) i z czasem jako liczbą minut.
+
+    Zamiast przeglądać wszystkie terminy od nowa dla każdej liczby
+    nieobecnych, zamieniamy nieobecności (blocked_slots()) na zdarzenia:
+    "osoba zaczyna być nieobecna" i "osoba przestaje być nieobecna".
+    Po posortowaniu zdarzeń idziemy przez czas tylko raz, pamiętając zbiór
+    aktualnie nieobecnych. Między kolejnymi zdarzeniami zbiór ten się nie
+    zmienia, więc wystarczy sprawdzić najwcześniejszy termin w godzinach
+    pracy (workday_runs()). Pierwszy taki termin z k nieobecnymi jest
+    najwcześniejszym terminem dla wszystkich dopuszczalnych liczb
+    nieobecnych od k w górę, dla których jeszcze nic nie znaleziono. Czas
+    działania to O(E log E) dla E zdarzeń, plus czas proporcjonalny do
+    liczby dni.
+
+    Args:
+        data: słownik taki jak zwraca fastread.read_minutes(), czyli taki
+            jak z read_data(), ale z czasem jako całkowitą liczbą minut od
+            EPOCH (początki zaokrąglone w dół, końce w górę).
+        total_begin, total_end, best, resolution, duration: tak jak
+            w find_suggestions(), ale jako liczby całkowite minut.
+        workday_begin: początek dnia pracy, obiekt datetime.time.
+        workday_end: koniec dnia pracy, obiekt datetime.time.
+        holidays: tak jak w find_suggestions().
+        blocked: słownik, w którym są zapamiętywane wyniki blocked_slots()
+            dla kolejnych osób, tak aby można je było wykorzystać przy
+            następnym wywołaniu z takimi samymi total_begin, total_end,
+            resolution i duration (patrz service.Scheduler); domyślnie
+            wyniki nie są zapamiętywane.
+
+    Yields:
+        Krotki (begin_meeting, n_absentee, absentee), tak jak
+        find_suggestions(), ale z begin_meeting jako liczbą minut.
+    """
+    n_slots = max(0, (total_end - total_begin - duration) // resolution + 1)
+    limit = max(0, min(n_slots, (best - total_begin + resolution - 1) // resolution))
+
+    # Zdarzenia to trójki (numer terminu, zmiana liczby nieobecnych, osoba);
+    # przy sortowaniu -1 jest przed +1, więc w danym terminie najpierw są
+    # usuwane osoby, które już są obecne.
+    #
+    if blocked is None:
+        blocked = {}
+    events = []
+    for name, booked_intervals in data.items():
+        try:
+            ranges = blocked[name]
+        except KeyError:
+            ranges = blocked[name] = blocked_slots(booked_intervals, total_begin, n_slots,
+                                                   resolution, duration)
+        for first, stop in ranges:
+            events.append((first, 1, name))
+            events.append((stop, -1, name))
+    events.sort(key=lambda event: event[:2])
+    events.append((n_slots, 0, None))
+
+    found = {}  # liczba nieobecnych -> (numer terminu, zbiór nieobecnych)
+    unresolved = len(data)  # najmniejsza liczba nieobecnych z wynikiem
+    absentee = set()
+    runs = workday_runs(total_begin, limit, resolution, duration,
+                        workday_begin, workday_end, holidays)
+    run = next(runs, None)
+    position = 0
+    for slot, change, name in events:
+        if position >= limit or run is None:
+            break
+        if slot > position and len(absentee) < unresolved:
+            while run is not None and run[1] <= position:
+                run = next(runs, None)
+            if run is not None and run[0] < slot:
+                unresolved = len(absentee)
+                found[unresolved] = max(position, run[0]), set(absentee)
+                if unresolved == 0:
+                    break
+        position = slot
+        if change > 0:
+            absentee.add(name)
+        elif change < 0:
+            absentee.discard(name)
+
+    for n_absentee in range(len(data)):
+        if n_absentee in found:
+            slot, absentee = found[n_absentee]
+            begin_meeting = total_begin + slot * resolution
+            if begin_meeting < best:
+                yield begin_meeting, n_absentee, absentee
+                best = begin_meeting
+
+
+def find_suggestions_sweep(data, total_begin, total_end, best, resolution,
+                           duration=MEETING_DURATION, workday_begin=WORKDAY_BEGIN,
+                           workday_end=WORKDAY_END, holidays=None, blocked=None):
+    """
+    Wyszukiwanie terminów spotkań, tak jak find_suggestions(), przez
+    find_suggestions_minutes().
+
+    Czasy są zamieniane na liczby minut tylko na wejściu, a wyniki z powrotem
+    na obiekty datetime tylko na wyjściu. Ponieważ początki terminów spotkań
+    są pełnymi minutami, zaokrąglenie początków zajętych terminów w dół,
+    a końców w górę nie zmienia wyników overlapped().
+
+    Args i Yields są takie same jak w find_suggestions(), dodatkowo
+    blocked jak w find_suggestions_minutes(); total_begin, resolution
+    i duration muszą być całkowitymi liczbami minut.
+    """
+    if total_begin.second or total_begin.microsecond or resolution % MINUTE \
+            or duration % MINUTE:
+        raise ValueError("total_begin, resolution and duration must be whole minutes")
+    if blocked is None:
+        blocked = {}
+
+    # Zajęte terminy osób, dla których są już zapamiętane wyniki
+    # blocked_slots(), nie są potrzebne, więc nie są zamieniane.
+    #
+    data_minutes = {name: [] if name in blocked else
+                    [(to_minutes(begin), to_minutes_up(end)) for begin, end in intervals]
+                    for name, intervals in data.items()}
+    for begin_meeting, n_absentee, absentee in find_suggestions_minutes(
+            data_minutes, to_minutes(total_begin), to_minutes(total_end),
+            to_minutes_up(best), resolution // MINUTE, duration // MINUTE,
+            workday_begin, workday_end, holidays, blocked):
+        yield from_minutes(begin_meeting), n_absentee, absentee
+
+
+def busy_bitmap(intervals, origin, resolution, n_cells):
+    """
+    Mapa bitowa zajętości jednej osoby.
+
+    Czas od origin jest podzielony na komórki o długości resolution. Bit
+    numer j (licząc od najmniej znaczącego) jest równy 1 wtedy, gdy jakiś
+    zajęty termin nakłada się (tak jak w overlapped()) na komórkę
+    od origin + j * resolution do origin + (j + 1) * resolution. Liczby
+    całkowite w Pythonie mogą mieć dowolnie wiele bitów, więc jedna liczba
+    wystarcza na dowolnie długi okres.
+
+    Args:
+        intervals: lista zajętych terminów, par (begin, end).
+        origin: początek pierwszej komórki, obiekt datetime.datetime.
+        resolution: długość komórki, obiekt datetime.timedelta.
+        n_cells: liczba komórek.
+
+    Returns:
+        Liczbę całkowitą, której bity opisują zajętość kolejnych komórek.
+    """
+    bitmap = 0
+    for begin, end in intervals:
+        first = max(0, (begin - origin) // resolution)
+        stop = min(n_cells, -((origin - end) // resolution))
+        if stop > first:
+            bitmap |= ((1 << (stop - first)) - 1) << first
+    return bitmap
+
+
+def window_bitmap(bitmap, width):
+    """
+    Przesuwane okno: bit i wyniku jest równy 1 wtedy, gdy choć jeden z bitów
+    od i do i + width - 1 w bitmap jest równy 1.
+
+    Zamiast width przesunięć wystarczy ich około log2(width): najpierw
+    łączymy (OR) sąsiednie bity, potem sąsiednie pary itd.
+
+    Args:
+        bitmap: mapa bitowa, liczba całkowita.
+        width: szerokość okna, liczba bitów.
+
+    Returns:
+        Mapę bitową.
+    """
+    result = bitmap
+    span = 1
+    while span < width:
+        step = min(span, width - span)
+        result |= result >> step
+        span += step
+    return result
+
+
+def set_bits(bitmap):
+    """
+    Numery bitów równych 1, od najmłodszego.
+
+    Kasowanie kolejnych bitów (bitmap ^= bitmap & -bitmap) wymagałoby za
+    każdym razem skopiowania całej, być może bardzo długiej, liczby. Zamiana
+    na łańcuch znaków "0" i "1" i wyszukiwanie w nim znaków "1" jest szybsze.
+
+    Args:
+        bitmap: mapa bitowa, nieujemna liczba całkowita.
+
+    Yields:
+        Numery bitów równych 1, liczby całkowite.
+    """
+    bits = format(bitmap, "b")[::-1]
+    index = bits.find("1")
+    while index >= 0:
+        yield index
+        index = bits.find("1", index + 1)
+
+
+def find_suggestions_bitmaps(data, total_begin, total_end, best, resolution,
+                             duration=MEETING_DURATION, workday_begin=WORKDAY_BEGIN,
+                             workday_end=WORKDAY_END, holidays=None):
+    """
+    Wyszukiwanie terminów spotkań, tak jak find_suggestions(), ale z użyciem
+    map bitowych.
+
+    Dla każdej osoby tworzona jest mapa bitowa zajętości busy_bitmap(),
+    a z niej, przez przesuwane okno o szerokości czasu trwania spotkania,
+    mapa terminów w których spotkanie nie może się zacząć. Gdy wszyscy mają
+    być obecni wystarczy połączyć mapy wszystkich osób (OR) i znaleźć
+    najmłodszy bit równy 0. Dla pozostałych liczb nieobecnych mapy są
+    "transponowane": dla każdego terminu mamy liczbę, której bit p jest
+    równy 1 gdy osoba p jest nieobecna, więc liczba nieobecnych to liczba
+    bitów równych 1 (popcount), bez przeglądania list zajętych terminów.
+
+    Args i Yields są takie same jak w find_suggestions().
+    """
+    # Komórki mają długość będącą największym wspólnym dzielnikiem resolution
+    # i duration, tak aby spotkanie zajmowało całkowitą liczbę komórek.
+    # Zwykle (np. 5 minut i godzina) komórka to po prostu resolution.
+    #
+    microsecond = timedelta(microseconds=1)
+    cell = math.gcd(resolution // microsecond, duration // microsecond) * microsecond
+    step = resolution // cell
+    width = duration // cell
+    n_slots = max(0, (total_end - total_begin - duration) // resolution + 1)
+    n_cells = (n_slots - 1) * step + width if n_slots else 0
+    all_slots = (1 << n_slots) - 1
+
+    names = list(data)
+    blocked = []
+    for name in names:
+        bitmap = window_bitmap(busy_bitmap(data[name], total_begin, cell, n_cells), width)
+        if step > 1:
+            bits = format(bitmap, "b").zfill(n_cells)[::-1]
+            bitmap = int("0" + bits[::step][:n_slots][::-1], 2)
+
+        # Terminy o zerowej długości nie zajmują żadnej komórki, gdy wypadają
+        # dokładnie na granicy komórek, a mimo to overlapped() uznaje je za
+        # kolidujące ze spotkaniem, które trwa w tym momencie.
+        #
+        for begin, end in data[name]:
+            if end <= begin:
+                first = max(0, (begin - total_begin - duration) // resolution + 1)
+                stop = min(n_slots, -((total_begin - end) // resolution))
+                if stop > first:
+                    bitmap |= ((1 << (stop - first)) - 1) << first
+        blocked.append(bitmap & all_slots)
+
+    # Terminy w godzinach pracy i w dni robocze, tak jak w find_suggestions().
+    #
+    first_day = total_begin.date()
+    free = free_day_mask(holidays, first_day,
+                         (total_begin + n_slots * resolution).date().toordinal()
+                         - first_day.toordinal() + 1)
+    bits = []
+    begin_meeting = total_begin
+    for slot in range(n_slots):
+        bits.append("1" if (begin_meeting.time() <= workday_end and
+                            (begin_meeting + duration).time() >= workday_begin and
+                            not free[begin_meeting.toordinal() - first_day.toordinal()])
+                    else "0")
+        begin_meeting += resolution
+    valid = int("0" + "".join(reversed(bits)), 2)
+
+    absent_at = [0] * n_slots
+    for person, bitmap in enumerate(blocked):
+        for slot in set_bits(bitmap):
+            absent_at[slot] |= 1 << person
+
+    everybody_blocked = 0
+    for bitmap in blocked:
+        everybody_blocked |= bitmap
+
+    for n_absentee in range(len(data)):
+        n_before_best = max(0, min(n_slots, -((total_begin - best) // resolution)))
+        candidates = valid & ((1 << n_before_best) - 1)
+        if n_absentee == 0:
+            candidates &= ~everybody_blocked
+        for slot in set_bits(candidates):
+            if absent_at[slot].bit_count() <= n_absentee:
+                absentee = {names[person] for person in set_bits(absent_at[slot])}
+                best = total_begin + slot * resolution
+                yield best, n_absentee, absentee
+                break
+
+
+def print_suggestion(begin_meeting, n_absentee, absentee):
+    """
+    Wypisywanie proponowanego terminu spotkania.
+
+    Args:
+        begin_meeting: początek spotkania, obiekt datetime.datetime.
+        n_absentee: dopuszczalna liczba nieobecnych.
+        absentee: zbiór nieobecnych.
+    """
+
+    # Trochę kłopotliwe jest dopasowywanie odpowiedzi tak, aby nie była ona
+    # rażąco niezgodna z gramatyką języka polskiego.
+    #
+    # @todo: Jak przeprowadzić i18n i L10n ?
+    #
+    print(begin_meeting, end="  ")
+    if len(absentee) == 0:
+        print(f"wszyscy obecni")
+    elif len(absentee) == 1:
+        name = list(absentee)[0]
+        print(f" 1 nieobecny: {name}")
+    else:
+        names = ", ".join(sorted(list(absentee)))
+        print(f"{n_absentee:2} nieobecnych: {names}")
+
+
 # Standardowy sposób rozpoznawania czy uruchomiamy jako program, czy może
 # ładujemy jako dodatkową bibliotekę instrukcją import. Gdy jako program to
 # zmienna name zawiera tekst "__main__", ale gdy jako bibliotekę to będzie
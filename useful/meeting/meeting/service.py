@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Usługa wyszukiwania terminów spotkań działająca bez przerwy.
+
+Program meeting.py przy każdym uruchomieniu czyta cały plik z danymi
+i wszystko oblicza od nowa. Tutaj dane są przechowywane w obiekcie klasy
+Scheduler, do którego można dopisywać i z którego można usuwać pojedyncze
+zajęte terminy, a zapytania są obsługiwane przez serwer asyncio (TCP albo
+gniazdo Unix). Protokół jest tekstowy: każde zapytanie i każda odpowiedź
+to jedna linia z obiektem JSON, przykładowo::
+
+    {"command": "add", "name": "Jan Kowalski",
+     "begin": "2024-04-12 15:00:00", "end": "2024-04-12 15:20:00"}
+    {"command": "remove", "name": "Jan Kowalski",
+     "begin": "2024-04-12 15:00:00", "end": "2024-04-12 15:20:00"}
+    {"command": "busy", "begin": "2024-04-12 15:00:00", "end": "2024-04-12 16:00:00"}
+    {"command": "suggest", "duration": 60, "resolution": 5,
+     "workday_begin": "08:00", "workday_end": "16:00", "holidays": true}
+
+Odpowiedzią jest {"ok": true, "result": ...} albo {"ok": false, "error": ...}.
+Przykładowe uruchomienie (dane z pliku input15.txt, port 8765)::
+
+    python3 service.py --port 8765 ../data/input15.txt
+
+CC-BY-NC-ND 2024 Sławomir Marczyński
+"""
+
+import argparse
+import asyncio
+import json
+from bisect import bisect_left, insort
+from collections import Counter, OrderedDict
+from datetime import datetime, time, timedelta
+
+try:
+    from . import fastread, intervals, meeting
+except ImportError:
+    import fastread
+    import intervals
+    import meeting
+
+HOST = "127.0.0.1"
+PORT = 8765
+RESOLUTION = timedelta(minutes=5)
+MINUTES_LIMIT = 24 * 60  # najdłuższe spotkanie w minutach
+SUGGESTIONS_CACHE = 8  # ile zestawów parametrów suggest() jest zapamiętywanych
+INDEX_PENDING = 256  # ile zmian danych może czekać na przebudowanie IntervalIndex
+
+
+class Scheduler:
+    """
+    Zajęte terminy wielu osób, z możliwością dopisywania i usuwania terminów.
+
+    Dane są przechowywane na dwa sposoby, oba aktualizowane na miejscu
+    (bisect.insort i usuwanie z listy) przy każdej zmianie:
+
+    - self.data jest słownikiem takim jak zwraca meeting.read_data(),
+      z listami terminów posortowanymi według początków, dzięki czemu można
+      go używać z funkcjami z meeting.py;
+    - self.entries jest listą wszystkich terminów, trójek (begin, end, name),
+      posortowaną według początków.
+
+    Do zapytań kto jest zajęty służy intervals.IntervalIndex. Nie można go
+    zmieniać, a przebudowanie kosztuje O(n log n), dlatego zmiany od
+    ostatniego przebudowania są zbierane osobno: dopisane terminy
+    w posortowanej liście self.added, usunięte w self.removed (Counter).
+    Dopisany termin nakładający się na (begin, end) zaczyna się przed end,
+    ale nie wcześniej niż begin - self.added_longest, więc wystarczy
+    sprawdzić terminy pomiędzy dwoma miejscami wskazanymi przez bisect.
+    Indeks jest przebudowywany przy zapytaniu, gdy zmian jest więcej niż
+    INDEX_PENDING.
+
+    Wyniki wyszukiwania terminów spotkań są zapamiętywane (osobno dla
+    każdego zestawu parametrów, ale tylko dla SUGGESTIONS_CACHE ostatnio
+    używanych zestawów, bo parametry wybierają klienci) aż do najbliższej
+    zmiany danych. Po zmianie
+    terminów jednej osoby wyszukiwanie jest powtarzane, ale terminy
+    spotkań, w których są nieobecne pozostałe osoby (meeting.blocked_slots()),
+    są brane z pamięci, o ile nie zmienił się przeszukiwany okres.
+    """
+
+    def __init__(self, data=None):
+        """
+        Args:
+            data: początkowe dane, słownik taki jak zwraca meeting.read_data().
+        """
+        self.data = {}
+        self.entries = []
+        self.index = None  # tworzony przy pierwszym zapytaniu busy
+        self.added = []
+        self.added_longest = timedelta(0)
+        self.removed = Counter()
+        self.suggestions = OrderedDict()
+        self.blocked = OrderedDict()
+        for name, intervals in (data or {}).items():
+            for begin, end in intervals:
+                self.data.setdefault(name, []).append((begin, end))
+                self.entries.append((begin, end, name))
+        for intervals in self.data.values():
+            intervals.sort()
+        self.entries.sort()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, name, begin, end):
+        """
+        Dopisanie zajętego terminu.
+
+        Args:
+            name: identyfikator osoby.
+            begin: początek terminu, obiekt datetime.datetime.
+            end: koniec terminu, obiekt datetime.datetime.
+        """
+        insort(self.data.setdefault(name, []), (begin, end))
+        insort(self.entries, (begin, end, name))
+        if self.index is not None:
+            insort(self.added, (begin, end, name))
+            self.added_longest = max(self.added_longest, end - begin)
+        self.changed(name)
+
+    def remove(self, name, begin, end):
+        """
+        Usunięcie zajętego terminu (jednego, gdyby było kilka takich samych).
+
+        Osoba, która nie ma już żadnych zajętych terminów, jest usuwana
+        z self.data, tak jakby nie było jej w danych. Wartość
+        self.added_longest nie jest zmniejszana, bo i tak jest poprawnym
+        ograniczeniem.
+
+        Raises:
+            ValueError: gdy takiego terminu nie ma.
+        """
+        intervals = self.data.get(name, [])
+        index = bisect_left(intervals, (begin, end))
+        if index == len(intervals) or intervals[index] != (begin, end):
+            raise ValueError(f"{name} nie ma zajętego terminu {begin} - {end}")
+        del intervals[index]
+        if not intervals:
+            del self.data[name]
+        del self.entries[bisect_left(self.entries, (begin, end, name))]
+        if self.index is not None:
+            index = bisect_left(self.added, (begin, end, name))
+            if index < len(self.added) and self.added[index] == (begin, end, name):
+                del self.added[index]
+            else:
+                self.removed[begin, end, name] += 1
+        self.changed(name)
+
+    def changed(self, name):
+        """
+        Usunięcie zapamiętanych wyników, które mogły się zmienić po zmianie
+        terminów osoby name.
+        """
+        self.suggestions.clear()
+        for bounds, blocked in self.blocked.values():
+            blocked.pop(name, None)
+
+    def busy(self, begin, end):
+        """
+        Kto jest zajęty w terminie (begin, end), tak jak w meeting.overlapped().
+
+        Returns:
+            Zbiór identyfikatorów osób.
+        """
+        if self.index is None or len(self.added) + len(self.removed) > INDEX_PENDING:
+            self.index = intervals.IntervalIndex(self.data)
+            self.added = []
+            self.added_longest = timedelta(0)
+            self.removed = Counter()
+        if self.removed:
+            result = set()
+            skipped = Counter()
+            for entry in self.index.overlapping(begin, end):
+                if skipped[entry] < self.removed[entry]:
+                    skipped[entry] += 1
+                else:
+                    result.add(entry[2])
+        else:
+            result = self.index.busy(begin, end)
+        added = self.added
+        first = bisect_left(added, (begin - self.added_longest,))
+        stop = bisect_left(added, (end,))
+        result.update(name for entry_begin, entry_end, name in added[first:stop]
+                      if entry_end > begin)
+        return result
+
+    def suggest(self, duration=meeting.MEETING_DURATION, resolution=RESOLUTION,
+                workday_begin=meeting.WORKDAY_BEGIN, workday_end=meeting.WORKDAY_END,
+                holidays=meeting.HOLIDAYS):
+        """
+        Terminy spotkań, takie jak wypisuje meeting.main().
+
+        Args:
+            duration: czas trwania spotkania.
+            resolution: skok podziałki jako obiekt datetime.timedelta.
+            workday_begin: początek dnia pracy, obiekt datetime.time.
+            workday_end: koniec dnia pracy, obiekt datetime.time.
+            holidays: dni wolne od pracy, tak jak w meeting.main().
+
+        Returns:
+            Krotkę (before, after, suggestions), gdzie before i after są
+            takie jak w meeting.search_bounds(), a suggestions to lista
+            krotek (begin_meeting, n_absentee, absentee) takich jak
+            z meeting.find_suggestions(). Gdy nie ma danych: (None, None, []).
+        """
+        parameters = duration, resolution, workday_begin, workday_end, holidays
+        try:
+            self.suggestions.move_to_end(parameters)
+            return self.suggestions[parameters]
+        except KeyError:
+            pass
+        if not self.entries:
+            result = None, None, []
+        else:
+            total_begin, total_end, before, after = meeting.search_bounds(
+                [(begin, end) for begin, end, name in self.entries], resolution,
+                duration, workday_begin, workday_end, holidays)
+            bounds = total_begin, total_end
+            if parameters not in self.blocked or self.blocked[parameters][0] != bounds:
+                self.blocked[parameters] = bounds, {}
+            self.blocked.move_to_end(parameters)
+            if len(self.blocked) > SUGGESTIONS_CACHE:
+                self.blocked.popitem(last=False)
+            suggestions = list(meeting.find_suggestions_sweep(
+                self.data, total_begin, total_end, after, resolution, duration,
+                workday_begin, workday_end, holidays, self.blocked[parameters][1]))
+            result = before, after, suggestions
+        self.suggestions[parameters] = result
+        if len(self.suggestions) > SUGGESTIONS_CACHE:
+            self.suggestions.popitem(last=False)
+        return result
+
+
+def parse_datetime(text):
+    """
+    Data i czas z zapytania, bez strefy czasowej (tak jak w meeting.read_data()).
+    """
+    result = datetime.fromisoformat(text)
+    if result.tzinfo is not None:
+        raise ValueError(f"data {text!r} nie może zawierać strefy czasowej")
+    return result
+
+
+def minutes(request, key, default, limit=MINUTES_LIMIT):
+    """
+    Liczba minut z zapytania jako obiekt datetime.timedelta.
+
+    Args:
+        request: słownik z zapytaniem.
+        key: klucz liczby minut w zapytaniu.
+        default: wartość domyślna, gdy w zapytaniu nie ma klucza key.
+        limit: największa dopuszczalna liczba minut.
+
+    Raises:
+        ValueError: gdy nie jest to całkowita liczba minut od 1 do limit
+            (ułamki minut i tak nie są obsługiwane przez
+            meeting.find_suggestions_sweep(), a zbyt duże liczby powodowałyby
+            OverflowError w datetime.timedelta).
+    """
+    value = request.get(key)
+    if value is None:
+        return default
+    if isinstance(value, bool) or not isinstance(value, (int, float)) \
+            or not 0 < value <= limit or value % 1:
+        raise ValueError(f"{key} musi być całkowitą liczbą minut od 1 do {limit}")
+    return timedelta(minutes=int(value))
+
+
+def execute(scheduler, request):
+    """
+    Wykonanie jednego zapytania.
+
+    Args:
+        scheduler: obiekt klasy Scheduler.
+        request: słownik z zapytaniem, patrz opis modułu.
+
+    Returns:
+        Wynik zapytania, nadający się do zapisania jako JSON.
+
+    Raises:
+        ValueError, KeyError, TypeError, OverflowError: gdy zapytanie jest
+            błędne.
+    """
+    command = request["command"]
+    if command in ("add", "remove"):
+        name = request["name"]
+        if not isinstance(name, str) or not name.strip():
+            raise ValueError("name musi być niepustym tekstem")
+        interval = parse_datetime(request["begin"]), parse_datetime(request["end"])
+        getattr(scheduler, command)(name.strip(), *interval)
+        return len(scheduler)
+    if command == "busy":
+        return sorted(scheduler.busy(parse_datetime(request["begin"]),
+                                     parse_datetime(request["end"])))
+    if command == "suggest":
+        duration = minutes(request, "duration", meeting.MEETING_DURATION)
+        resolution = minutes(request, "resolution", RESOLUTION, 60)
+        workday_begin = time.fromisoformat(request.get("workday_begin",
+                                                       meeting.WORKDAY_BEGIN.isoformat()))
+        workday_end = time.fromisoformat(request.get("workday_end",
+                                                     meeting.WORKDAY_END.isoformat()))
+        holidays = request.get("holidays", True)
+        if not isinstance(holidays, bool):
+            raise ValueError("holidays musi być wartością logiczną")
+        before, after, suggestions = scheduler.suggest(
+            duration, resolution, workday_begin, workday_end,
+            meeting.HOLIDAYS if holidays else None)
+        return {
+            "before": before and str(before),
+            "after": after and str(after),
+            "suggestions": [{"begin": str(begin_meeting),
+                             "n_absentee": n_absentee,
+                             "absentee": sorted(absentee)}
+                            for begin_meeting, n_absentee, absentee in suggestions],
+        }
+    raise ValueError(f"nieznane polecenie {command!r}")
+
+
+async def execute_async(scheduler, lock, request):
+    """
+    Wykonanie jednego zapytania bez blokowania pętli zdarzeń.
+
+    Wyszukiwanie terminów spotkań zajmuje dużo czasu procesora, dlatego
+    zapytanie suggest jest wykonywane w innym wątku (loop.run_in_executor()),
+    a w tym czasie są obsługiwane zapytania busy innych klientów. Zapytania
+    add i remove czekają na zakończenie wyszukiwania (lock), żeby dane nie
+    zmieniały się w jego trakcie.
+
+    Args:
+        scheduler: obiekt klasy Scheduler.
+        lock: obiekt asyncio.Lock wspólny dla wszystkich połączeń.
+        request: słownik z zapytaniem, patrz opis modułu.
+
+    Returns:
+        Wynik zapytania, tak jak z execute().
+    """
+    command = request.get("command") if isinstance(request, dict) else None
+    if command == "suggest":
+        async with lock:
+            return await asyncio.get_running_loop().run_in_executor(
+                None, execute, scheduler, request)
+    if command in ("add", "remove"):
+        async with lock:
+            return execute(scheduler, request)
+    return execute(scheduler, request)
+
+
+async def handle_connection(scheduler, lock, reader, writer):
+    """
+    Obsługa jednego połączenia: kolejne linie z zapytaniami JSON.
+    """
+    try:
+        while line := await reader.readline():
+            try:
+                response = {"ok": True,
+                            "result": await execute_async(scheduler, lock, json.loads(line))}
+            except (ValueError, KeyError, TypeError, OverflowError) as error:
+                response = {"ok": False, "error": f"{type(error).__name__}: {error}"}
+            writer.write(json.dumps(response, ensure_ascii=False).encode("utf8") + b"\n")
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def start_server(scheduler, host=HOST, port=PORT, path=None):
+    """
+    Uruchomienie serwera.
+
+    Args:
+        scheduler: obiekt klasy Scheduler.
+        host: adres, na którym serwer ma oczekiwać na połączenia TCP.
+        port: numer portu TCP, 0 oznacza dowolny wolny port.
+        path: ścieżka gniazda Unix; gdy podana, to host i port są pomijane.
+
+    Returns:
+        Obiekt asyncio.Server.
+    """
+    lock = asyncio.Lock()
+
+    def handler(reader, writer):
+        return handle_connection(scheduler, lock, reader, writer)
+
+    if path is not None:
+        return await asyncio.start_unix_server(handler, path)
+    return await asyncio.start_server(handler, host, port)
+
+
+def main(argv=None):
+    """
+    Uruchomienie usługi z danymi początkowymi z pliku.
+    """
+    parser = argparse.ArgumentParser(description="Usługa wyszukiwania terminów spotkań.")
+    parser.add_argument("file_name", nargs="?",
+                        help="plik z danymi początkowymi, w formacie jak dla meeting.py")
+    parser.add_argument("--host", default=HOST, help=f"adres serwera (domyślnie {HOST})")
+    parser.add_argument("--port", type=int, default=PORT,
+                        help=f"port TCP serwera (domyślnie {PORT})")
+    parser.add_argument("--unix", metavar="PATH", help="gniazdo Unix zamiast TCP")
+    args = parser.parse_args(argv)
+
+    scheduler = Scheduler(fastread.read_data(args.file_name) if args.file_name else None)
+
+    async def serve():
+        server = await start_server(scheduler, args.host, args.port, args.unix)
+        for sock in server.sockets:
+            print(f"Usługa gotowa: {sock.getsockname()}, {len(scheduler)} terminów.")
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testy jednostkowe programu meeting.py i modułów z nim związanych.
+
+Uruchamianie, np. z folderu useful/meeting::
+
+    python3 -m pytest meeting
+
+CC-BY-NC-ND 2024 Sławomir Marczyński
+"""
+
+import asyncio
+import doctest
+import importlib.util
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import types
+import unittest
+from datetime import date, datetime, time, timedelta
+from unittest import mock
+
+try:
+    from . import batch, fastread, intervals, meeting, service
+except ImportError:
+    import batch
+    import fastread
+    import intervals
+    import meeting
+    import service
+
+try:
+    from . import vectorized
+except ImportError:
+    try:
+        import vectorized
+    except ImportError:  # brak biblioteki NumPy
+        vectorized = None
+
+DATA_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "data")
+DATA_FILES = ["input3.txt", "input4.txt", "input10.txt", "input15.txt"]
+DATA = {
+    "Anna": [(datetime(2024, 4, 8, 9), datetime(2024, 4, 8, 11)),
+             (datetime(2024, 4, 9, 13), datetime(2024, 4, 9, 14))],
+    "Jan": [(datetime(2024, 4, 8, 10), datetime(2024, 4, 8, 12)),
+            (datetime(2024, 4, 10, 8), datetime(2024, 4, 10, 16))],
+}
+
+
+class TestHolidaysModule(unittest.TestCase):
+
+    def test_other_holidays_module(self):
+        """
+        Inny moduł o nazwie holidays (np. pakiet z PyPI) nie przeszkadza
+        w imporcie meeting.py.
+        """
+        other = types.ModuleType("holidays")
+        with mock.patch.dict(sys.modules, {"holidays": other}):
+            sys.modules.pop(meeting.HOLIDAYS_MODULE, None)
+            spec = importlib.util.spec_from_file_location("_meeting_test", meeting.__file__)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            self.assertIs(sys.modules["holidays"], other)
+        self.assertTrue(module.HOLIDAYS.is_free(date(2024, 4, 1)))  # Poniedziałek Wielkanocny
+        self.assertTrue(module.HOLIDAYS.is_free(date(2024, 3, 30)))  # sobota
+        self.assertFalse(module.HOLIDAYS.is_free(date(2024, 4, 2)))
+
+
+def random_calendar(seed, n_peoples=6, n_days=10):
+    """
+    Losowe zajęte terminy, także nakładające się, o zerowej długości, z sekundami
+    i w dni wolne od pracy (od środy 2024-03-27, z Wielkanocą).
+    """
+    rng = random.Random(seed)
+    first_day = datetime(2024, 3, 27)
+    data = {}
+    for person in range(n_peoples):
+        intervals = []
+        for _ in range(rng.randrange(3 * n_days)):
+            begin = first_day + timedelta(days=rng.randrange(n_days),
+                                          minutes=rng.randrange(6 * 60, 19 * 60),
+                                          seconds=rng.choice((0, 0, 0, rng.randrange(60))))
+            intervals.append((begin, begin + timedelta(minutes=rng.randrange(0, 180))))
+        data[f"Osoba {person}"] = sorted(intervals)
+    return data
+
+
+def suggestions(search, data, resolution=timedelta(minutes=5),
+                duration=meeting.MEETING_DURATION, holidays=None):
+    """
+    Terminy spotkań znalezione przez funkcję search, z argumentami takimi
+    jak w meeting.main().
+    """
+    total_begin, total_end, before, after = meeting.search_bounds(
+        meeting.flatten(data), resolution, duration, holidays=holidays)
+    return list(search(data, total_begin, total_end, after, resolution, duration,
+                       holidays=holidays))
+
+
+class SearchEquivalence:
+    """
+    Porównanie funkcji self.search z meeting.find_suggestions(), wzorcową
+    pętlą przeglądającą wszystkie terminy.
+    """
+
+    search = None
+
+    def assert_same(self, data, **arguments):
+        self.assertEqual(suggestions(self.search, data, **arguments),
+                         suggestions(meeting.find_suggestions, data, **arguments))
+
+    def test_data_files(self):
+        for file_name in DATA_FILES:
+            data = meeting.read_data(os.path.join(DATA_FOLDER, file_name))
+            for holidays in (None, meeting.HOLIDAYS):
+                with self.subTest(file_name=file_name, holidays=holidays):
+                    self.assert_same(data, holidays=holidays)
+
+    def test_random_calendars(self):
+        for seed in range(20):
+            data = random_calendar(seed, 2 + seed % 7, 2 + seed % 9)
+            for holidays in (None, meeting.HOLIDAYS):
+                with self.subTest(seed=seed, holidays=holidays):
+                    self.assert_same(data, holidays=holidays)
+                    self.assert_same(data, resolution=timedelta(minutes=15),
+                                     duration=timedelta(minutes=45), holidays=holidays)
+
+    def test_edge_cases(self):
+        """
+        Terminy jeden po drugim, kończące się z końcem dnia pracy, nakładające
+        się terminy jednej osoby i podziałka, która nie dzieli doby na równe
+        części.
+        """
+        def hours(hour, days=0):
+            return datetime(2024, 4, 8) + timedelta(days=days, hours=hour)  # poniedziałek
+
+        data = {
+            "jeden po drugim": [(hours(8), hours(9)), (hours(9), hours(10)),
+                                (hours(10), hours(10.5))],
+            "do końca dnia": [(hours(15), hours(16)), (hours(15.5, 1), hours(16, 1))],
+            "nakładające się": [(hours(9), hours(11)), (hours(10), hours(12)),
+                                (hours(10.5), hours(10.75)), (hours(9), hours(11))],
+            "zerowy": [(hours(13), hours(13)), (hours(8, 1), hours(8, 1))],
+        }
+        subsets = [names for n_peoples in range(1, len(data) + 1)
+                   for names in itertools.combinations(data, n_peoples)]
+        for names, minutes, duration, holidays in itertools.product(
+                subsets, (5, 7, 11, 60), (30, 60), (None, meeting.HOLIDAYS)):
+            with self.subTest(names=names, minutes=minutes, duration=duration,
+                              holidays=holidays):
+                self.assert_same({name: data[name] for name in names},
+                                 resolution=timedelta(minutes=minutes),
+                                 duration=timedelta(minutes=duration), holidays=holidays)
+
+
+@unittest.skipUnless(vectorized, "brak biblioteki NumPy")
+class TestVectorized(SearchEquivalence, unittest.TestCase):
+
+    search = staticmethod(vectorized and vectorized.find_suggestions)
+
+
+class TestSweep(SearchEquivalence, unittest.TestCase):
+
+    search = staticmethod(meeting.find_suggestions_sweep)
+
+
+class TestBitmaps(SearchEquivalence, unittest.TestCase):
+
+    search = staticmethod(meeting.find_suggestions_bitmaps)
+
+    def test_window_bitmap(self):
+        rng = random.Random(0)
+        for _ in range(200):
+            bitmap = rng.getrandbits(rng.randrange(1, 80))
+            width = rng.randrange(1, 20)
+            expected = sum(1 << i for i in range(bitmap.bit_length())
+                           if any(bitmap >> j & 1 for j in range(i, i + width)))
+            self.assertEqual(meeting.window_bitmap(bitmap, width), expected)
+
+    def test_set_bits(self):
+        for bitmap in (0, 1, 0b1010, (1 << 100) | 5):
+            self.assertEqual(list(meeting.set_bits(bitmap)),
+                             [i for i in range(bitmap.bit_length()) if bitmap >> i & 1])
+
+    def test_busy_bitmap(self):
+        origin = datetime(2024, 4, 8, 8)
+        intervals = [(origin + timedelta(minutes=7), origin + timedelta(minutes=10)),
+                     (origin + timedelta(minutes=20), origin + timedelta(minutes=20)),
+                     (origin - timedelta(hours=1), origin + timedelta(minutes=1)),
+                     (origin + timedelta(minutes=48), origin + timedelta(hours=2))]
+        self.assertEqual(meeting.busy_bitmap(intervals, origin, timedelta(minutes=5), 10),
+                         0b1000000011)
+
+
+class TestRounding(unittest.TestCase):
+
+    def test_doctests(self):
+        self.assertEqual(doctest.testmod(meeting).failed, 0)
+
+    def test_not_round(self):
+        """Czas, który nie jest "okrągły" (wcześniej round_up() zgłaszało ValueError)."""
+        rng = random.Random(0)
+        for _ in range(500):
+            datetime_object = datetime(2024, 4, 12) + timedelta(minutes=rng.randrange(3 * 1440))
+            step = rng.choice((1, 5, 7, 15, 60))
+            resolution = timedelta(minutes=step)
+            up = meeting.round_up(datetime_object, resolution)
+            down = meeting.round_down(datetime_object, resolution)
+            # Podziałka 7 minut nie dzieli doby na równe części, więc po
+            # zaokrągleniu w górę za północ wynik nie musi leżeć na podziałce
+            # liczonej od północy następnego dnia.
+            #
+            for rounded in (up, down) if meeting.MINUTES_PER_DAY % step == 0 else (down,):
+                midnight = datetime.combine(rounded.date(), time())
+                self.assertEqual((rounded - midnight) // timedelta(minutes=1) % step, 0)
+            self.assertTrue(datetime_object <= up < datetime_object + resolution)
+            self.assertTrue(datetime_object - resolution < down <= datetime_object)
+
+
+class TestIntervalIndex(unittest.TestCase):
+
+    def check(self, data, begin, end):
+        index = intervals.IntervalIndex(data)
+        expected = sorted((entry_begin, entry_end, name)
+                          for name, booked_intervals in data.items()
+                          for entry_begin, entry_end in booked_intervals
+                          if meeting.overlapped((entry_begin, entry_end), (begin, end)))
+        self.assertEqual(index.overlapping(begin, end), expected)
+        self.assertEqual(index.busy(begin, end), {name for _, _, name in expected})
+
+    def test_empty(self):
+        for data in ({}, {"Anna": []}):
+            self.assertEqual(len(intervals.IntervalIndex(data)), 0)
+            self.check(data, 0, 10)
+
+    def test_touching(self):
+        """Termin kończący się dokładnie na początku zapytania nie koliduje."""
+        data = {"Anna": [(0, 10), (20, 30)], "Jan": [(10, 20)], "Ewa": [(5, 5)]}
+        for begin, end in ((10, 20), (0, 10), (20, 20), (5, 5), (30, 40), (-5, 0), (9, 11)):
+            with self.subTest(begin=begin, end=end):
+                self.check(data, begin, end)
+
+    def test_random(self):
+        rng = random.Random(0)
+        for _ in range(300):
+            data = {}
+            for person in range(rng.randrange(6)):
+                booked_intervals = []
+                for _ in range(rng.randrange(30)):
+                    begin = rng.randrange(100)
+                    booked_intervals.append((begin, begin + rng.randrange(-2, 20)))
+                data[f"Osoba {person}"] = booked_intervals
+            begin = rng.randrange(-10, 110)
+            end = begin + rng.randrange(0, 30)
+            with self.subTest(data=data, begin=begin, end=end):
+                self.check(data, begin, end)
+
+    def test_datetimes(self):
+        index = intervals.IntervalIndex(DATA)
+        self.assertEqual(index.busy(datetime(2024, 4, 8, 11), datetime(2024, 4, 8, 12)), {"Jan"})
+        self.assertEqual(index.busy(datetime(2024, 4, 8, 12), datetime(2024, 4, 9, 13)), set())
+
+
+class TestBatch(unittest.TestCase):
+
+    def test_solve_all(self):
+        data = random_calendar(1, 5, 8)
+        names = sorted(data)
+        queries = [batch.Query(),
+                   batch.Query(names[:2], timedelta(minutes=30)),
+                   batch.Query(names[1:] + ["Nieznana osoba"], holidays=None),
+                   batch.Query(["Nieznana osoba"]),
+                   batch.Query([names[0], "Nieznana osoba"], timedelta(minutes=45),
+                               meeting.WORKDAY_BEGIN, meeting.WORKDAY_END,
+                               timedelta(minutes=15))]
+        expected = []
+        for query in queries:
+            participants = data if query.participants is None else query.participants
+            subset = {name: data.get(name, []) for name in participants}
+            flatten_data = meeting.flatten(subset)
+            if not flatten_data:
+                expected.append((None, None, []))
+                continue
+            total_begin, total_end, before, after = meeting.search_bounds(
+                flatten_data, query.resolution, query.duration,
+                query.workday_begin, query.workday_end, query.holidays)
+            expected.append((before, after, list(meeting.find_suggestions_sweep(
+                subset, total_begin, total_end, after, query.resolution, query.duration,
+                query.workday_begin, query.workday_end, query.holidays))))
+        result = batch.solve_all(data, queries, processes=2, chunk_size=2)
+        self.assertEqual(result, expected)
+        self.assertEqual(batch.solve_all(data, queries, processes=0), expected)
+
+        # Osoba spoza danych jest uczestnikiem bez zajętych terminów: liczy
+        # się do liczby osób (zakresu n_absentee), ale nigdy nie jest nieobecna.
+        #
+        self.assertEqual(result[3], (None, None, []))
+        for before, after, suggestions in result[2:]:
+            for begin_meeting, n_absentee, absentee in suggestions:
+                self.assertNotIn("Nieznana osoba", absentee)
+        subset = {name: data.get(name, []) for name in queries[2].participants}
+        total_begin, total_end, before, after = meeting.search_bounds(
+            meeting.flatten(subset), queries[2].resolution)
+        self.assertEqual(result[2][2], list(meeting.find_suggestions(
+            subset, total_begin, total_end, after, queries[2].resolution)))
+
+
+class TestFastRead(unittest.TestCase):
+
+    INVALID = [b"2024-04-+4 15:00:00", b"2024-04-12  4:00:00", b"1_24-04-12 15:00:00",
+               b"2024-04-12 15:00:+0", b"2024-04-12 15:0 :00"]
+
+    def test_invalid_digits(self):
+        for timestamp in self.INVALID:
+            with self.assertRaises(ValueError):
+                datetime.fromisoformat(timestamp.decode())
+            with self.assertRaises(ValueError):
+                fastread.parse_minutes(timestamp)
+            with self.assertRaises(ValueError):
+                fastread.parse_minutes_up(timestamp)
+            with self.assertRaises(ValueError):
+                fastread.parse_datetime(timestamp)
+
+    def test_valid(self):
+        timestamp = b"2024-04-12 15:00:30"
+        self.assertEqual(fastread.parse_datetime(timestamp), datetime(2024, 4, 12, 15, 0, 30))
+        self.assertEqual(fastread.parse_minutes_up(timestamp) - fastread.parse_minutes(timestamp), 1)
+
+    def test_read_data(self):
+        with tempfile.TemporaryDirectory() as folder:
+            file_name = os.path.join(folder, "data.txt")
+            with open(file_name, "w", encoding="utf8") as file:
+                file.write("Anna\n2024-04-12 15:00:00 2024-04-12 +5:20:00\n")
+            with self.assertRaises(ValueError):
+                meeting.read_data(file_name)
+            with self.assertRaises(ValueError):
+                fastread.read_data(file_name)
+            with self.assertRaises(ValueError):
+                fastread.read_minutes(file_name)
+
+
+class TestScheduler(unittest.TestCase):
+
+    def test_suggestions_cache_limit(self):
+        scheduler = service.Scheduler(DATA)
+        for duration in range(1, 4 * service.SUGGESTIONS_CACHE):
+            result = scheduler.suggest(timedelta(minutes=duration))
+            self.assertLessEqual(len(scheduler.suggestions), service.SUGGESTIONS_CACHE)
+            self.assertLessEqual(len(scheduler.blocked), service.SUGGESTIONS_CACHE)
+        self.assertEqual(result, service.Scheduler(DATA).suggest(timedelta(minutes=duration)))
+        scheduler.add("Ewa", datetime(2024, 4, 8, 8), datetime(2024, 4, 8, 9))
+        self.assertEqual(scheduler.suggest(), service.Scheduler(
+            dict(DATA, Ewa=[(datetime(2024, 4, 8, 8), datetime(2024, 4, 8, 9))])).suggest())
+
+    def test_busy_after_changes(self):
+        rng = random.Random(1)
+        scheduler = service.Scheduler(DATA)
+        entries = [(begin, end, name) for name, intervals in DATA.items()
+                   for begin, end in intervals]
+        with mock.patch.object(service, "INDEX_PENDING", 5):
+            for step in range(200):
+                if entries and rng.random() < 0.4:
+                    entry = entries.pop(rng.randrange(len(entries)))
+                    scheduler.remove(entry[2], entry[0], entry[1])
+                else:
+                    begin = datetime(2024, 4, 8, 8) + timedelta(minutes=15 * rng.randrange(40))
+                    entry = begin, begin + timedelta(minutes=15 * rng.randrange(1, 12)), \
+                        rng.choice(["Anna", "Jan", "Ewa"])
+                    entries.append(entry)
+                    scheduler.add(entry[2], entry[0], entry[1])
+                begin = datetime(2024, 4, 8, 8) + timedelta(minutes=15 * rng.randrange(40))
+                end = begin + timedelta(minutes=15 * rng.randrange(1, 8))
+                self.assertEqual(scheduler.busy(begin, end),
+                                 {name for entry_begin, entry_end, name in entries
+                                  if meeting.overlapped((entry_begin, entry_end), (begin, end))},
+                                 step)
+
+
+class TestService(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.server = await service.start_server(service.Scheduler(DATA), port=0)
+        host, port = self.server.sockets[0].getsockname()[:2]
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+
+    async def asyncTearDown(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def request(self, **request):
+        self.writer.write(json.dumps(request).encode() + b"\n")
+        return json.loads(await asyncio.wait_for(self.reader.readline(), 10))
+
+    async def test_invalid_minutes(self):
+        for duration in (1e300, 10 ** 400, float("inf"), float("nan"), 0, -5, 30.5, "60", True):
+            response = await self.request(command="suggest", duration=duration)
+            self.assertFalse(response["ok"], duration)
+            self.assertIn("ValueError", response["error"])
+        response = await self.request(command="suggest", resolution=61)
+        self.assertFalse(response["ok"])
+        response = await self.request(command="suggest", duration=30, resolution=15)
+        self.assertTrue(response["ok"])
+        self.assertTrue(response["result"]["suggestions"])
+
+    async def test_busy_during_suggest(self):
+        """Zapytanie busy nie czeka na zakończenie wyszukiwania terminów."""
+        busy_answered = threading.Event()
+        waited = []
+
+        def suggest(*args):
+            waited.append(busy_answered.wait(5))
+            return None, None, []
+
+        with mock.patch.object(service.Scheduler, "suggest", side_effect=suggest):
+            host, port = self.server.sockets[0].getsockname()[:2]
+            reader, writer = await asyncio.open_connection(host, port)
+            writer.write(b'{"command": "suggest"}\n')
+            await asyncio.sleep(0.1)
+            response = await self.request(command="busy", begin="2024-04-08 10:30:00",
+                                          end="2024-04-08 11:30:00")
+            busy_answered.set()
+            self.assertEqual(response["result"], ["Anna", "Jan"])
+            self.assertTrue(json.loads(await asyncio.wait_for(reader.readline(), 10))["ok"])
+            writer.close()
+            await writer.wait_closed()
+        self.assertEqual(waited, [True])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Wyszukiwanie terminu spotkania z użyciem biblioteki NumPy.
+
+Funkcja meeting.find_suggestions() dla każdego możliwego terminu (co 5 minut)
+sprawdza wszystkie zajęte terminy wszystkich osób, i to od nowa dla każdej
+dopuszczalnej liczby nieobecnych. Tutaj zajęte terminy są zamieniane na
+całkowite liczby minut, a liczby nieobecnych są obliczane jednocześnie dla
+wszystkich możliwych terminów, przez tablicę różnic (difference array):
+w tablicy zapisujemy +1 tam gdzie zaczyna się nieobecność danej osoby
+i -1 tam, gdzie się kończy, a sumy skumulowane (np.cumsum) dają liczby
+nieobecnych. Wyniki są takie same jak z meeting.find_suggestions().
+
+Program uruchamiany samodzielnie działa tak jak meeting.py.
+
+CC-BY-NC-ND 2024 Sławomir Marczyński
+"""
+
+from datetime import timedelta
+
+import numpy as np
+
+try:
+    from . import meeting  # gdy vectorized jest importowany z pakietu meeting
+except ImportError:
+    import meeting  # gdy vectorized.py jest uruchamiany jako program
+
+MINUTE = timedelta(minutes=1)
+MINUTES_PER_DAY = 24 * 60
+
+
+def minutes_down(datetime_object, origin):
+    """
+    Liczba pełnych minut od origin do datetime_object, zaokrąglona w dół.
+    """
+    return (datetime_object - origin) // MINUTE
+
+
+def minutes_up(datetime_object, origin):
+    """
+    Liczba minut od origin do datetime_object, zaokrąglona w górę.
+    """
+    return -((origin - datetime_object) // MINUTE)
+
+
+def seconds_of_day(time_object):
+    """
+    Liczba sekund od północy dla obiektu datetime.time.
+    """
+    return (time_object.hour * 3600 + time_object.minute * 60 + time_object.second
+            + time_object.microsecond / 1e6)
+
+
+def absentee_counts(data, origin, n_slots, resolution, duration):
+    """
+    Liczby nieobecnych dla kolejnych terminów spotkania.
+
+    Termin o numerze i zaczyna się i * resolution po origin i trwa duration.
+    Zajęty termin (begin, end) koliduje z nim, tak jak w meeting.overlapped(),
+    gdy begin < początek + duration i end > początek, czyli dla numerów od
+    i_begin = (begin - duration) // resolution + 1 do i_end = ceil(end /
+    resolution) - 1, licząc w minutach od origin. Aby każda osoba była
+    liczona tylko raz, przedziały numerów tej samej osoby są łączone:
+    po posortowaniu według początku każdy przedział zaczyna się nie wcześniej
+    niż koniec wszystkich poprzednich (np.maximum.accumulate).
+
+    Args:
+        data: słownik, taki jak zwraca meeting.read_data().
+        origin: początek pierwszego terminu, obiekt datetime.datetime
+            z całkowitą liczbą minut.
+        n_slots: liczba terminów.
+        resolution: skok podziałki w minutach (liczba całkowita).
+        duration: czas trwania spotkania w minutach (liczba całkowita).
+
+    Returns:
+        Tablicę NumPy z liczbami nieobecnych dla kolejnych terminów.
+    """
+    persons = []
+    begins = []
+    ends = []
+    for person, intervals in enumerate(data.values()):
+        for begin, end in intervals:
+            persons.append(person)
+            begins.append(minutes_down(begin, origin))
+            ends.append(minutes_up(end, origin))
+    if not persons:
+        return np.zeros(n_slots, dtype=np.int64)
+    persons = np.array(persons, dtype=np.int64)
+    begins = np.array(begins, dtype=np.int64)
+    ends = np.array(ends, dtype=np.int64)
+
+    first = np.clip((begins - duration) // resolution + 1, 0, n_slots)
+    stop = np.clip(-(-ends // resolution), 0, n_slots)
+
+    # Przesunięcie numerów terminów każdej osoby o (n_slots + 1) * numer osoby
+    # sprawia, że przedziały różnych osób nie mogą się na siebie nałożyć,
+    # więc wszystkie osoby można przetwarzać jednocześnie.
+    #
+    order = np.lexsort((first, persons))
+    shift = persons[order] * (n_slots + 1)
+    first = first[order] + shift
+    stop = stop[order] + shift
+    covered = np.maximum.accumulate(stop)
+    first = np.maximum(first, np.concatenate(([0], covered[:-1])))
+    new = stop > first
+    first = first[new] - shift[new]
+    stop = stop[new] - shift[new]
+
+    differences = (np.bincount(first, minlength=n_slots + 1)
+                   - np.bincount(stop, minlength=n_slots + 1))
+    return np.cumsum(differences)[:n_slots]
+
+
+def workday_mask(origin, n_slots, resolution, duration, workday_begin, workday_end,
+                 holidays=None):
+    """
+    Które terminy mieszczą się w godzinach pracy i nie wypadają w dni wolne
+    od pracy, tak jak w meeting.find_suggestions().
+
+    Dni wolne są sprawdzane raz dla każdego dnia (meeting.free_day_mask()),
+    a numer dnia terminu wyznacza dzielenie całkowite przez MINUTES_PER_DAY.
+
+    Returns:
+        Tablicę NumPy wartości logicznych.
+    """
+    origin_minutes = origin.hour * 60 + origin.minute
+    begin_minutes = origin_minutes + resolution * np.arange(n_slots, dtype=np.int64)
+    end_minutes = begin_minutes + duration
+    mask = ((begin_minutes % MINUTES_PER_DAY) * 60 <= seconds_of_day(workday_end)) & \
+        ((end_minutes % MINUTES_PER_DAY) * 60 >= seconds_of_day(workday_begin))
+    if holidays is not None and n_slots:
+        days = begin_minutes // MINUTES_PER_DAY
+        free = meeting.free_day_mask(holidays, origin.date(), int(days[-1]) + 1)
+        mask &= ~np.frombuffer(bytes(free), dtype=np.uint8).astype(bool)[days]
+    return mask
+
+
+def find_suggestions(data, total_begin, total_end, best, resolution,
+                     duration=meeting.MEETING_DURATION,
+                     workday_begin=meeting.WORKDAY_BEGIN,
+                     workday_end=meeting.WORKDAY_END, holidays=None):
+    """
+    Wyszukiwanie terminów spotkań, tak jak meeting.find_suggestions().
+
+    Args i Yields są takie same jak w meeting.find_suggestions();
+    total_begin, resolution i duration muszą być całkowitymi liczbami minut.
+    """
+    step = resolution // MINUTE
+    length = duration // MINUTE
+    n_slots = max(0, (minutes_down(total_end, total_begin) - length) // step + 1)
+    counts = absentee_counts(data, total_begin, n_slots, step, length)
+    valid = workday_mask(total_begin, n_slots, step, length, workday_begin, workday_end,
+                         holidays)
+
+    # Dla każdej liczby nieobecnych najwcześniejszy termin z taką liczbą,
+    # a potem (minimum skumulowane) najwcześniejszy termin z co najwyżej
+    # taką liczbą nieobecnych.
+    #
+    n_peoples = len(data)
+    indexes = np.flatnonzero(valid)
+    earliest = np.full(n_peoples + 1, n_slots, dtype=np.int64)
+    np.minimum.at(earliest, np.minimum(counts[indexes], n_peoples), indexes)
+    earliest = np.minimum.accumulate(earliest)
+
+    for n_absentee in range(n_peoples):
+        index = int(earliest[n_absentee])
+        if index >= n_slots:
+            continue
+        begin_meeting = total_begin + index * resolution
+        if begin_meeting >= best:
+            continue
+        meeting_interval = begin_meeting, begin_meeting + duration
+        absentee = {name for name, booked_intervals in data.items()
+                    for interval in booked_intervals
+                    if meeting.overlapped(interval, meeting_interval)}
+        yield begin_meeting, n_absentee, absentee
+        best = begin_meeting
+
+
+if __name__ == "__main__":
+    meeting.main(search=find_suggestions)
@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testy jednostkowe programu cerber.py.
+
+Uruchamianie, np. z folderu useful::
+
+    python3 -m pytest test_cerber.py
+
+CC-BY-NC-ND 2022 Sławomir Marczyński
+"""
+
+import asyncio
+import csv
+import io
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+import cerber
+
+
+def digest(text):
+    """Wartość skrótu SHA-1 dla tekstu."""
+    return cerber.HASH_ALGORITHMS['sha1'](text.encode()).digest()
+
+
+def snapshot(files):
+    """
+    Obiekt Snapshot (po merkle('root')) dla słownika: (folder, nazwa) -> treść.
+    """
+    result = cerber.Snapshot((digest(text), name, path, os.path.join(path, name))
+                             for (path, name), text in files.items())
+    result.merkle('root')
+    return result
+
+
+class TestSnapshotChanges(unittest.TestCase):
+
+    OLD = {('root/a', 'f'): 'f', ('root/b', 'g'): 'g', ('root/c', 'h'): 'h'}
+
+    def changes(self, new, old=None):
+        records = cerber.iter_snapshot_changes(snapshot(old or self.OLD), snapshot(new))
+        return sorted((description, f_old and f_old[3], f_new and f_new[3])
+                      for description, f_old, f_new in records)
+
+    def test_copy_from_unchanged_folder(self):
+        new = dict(self.OLD)
+        new['root/a', 'gcopy'] = 'g'
+        self.assertEqual(self.changes(new),
+                         [('moved and renamed files', 'b/g', 'a/gcopy')])
+
+    def test_same_as_compare_digests(self):
+        new = {('root/a', 'f2'): 'f', ('root/b', 'g'): 'g', ('root/c', 'h'): 'h',
+               ('root/d', 'h2'): 'h', ('root/a', 'x'): 'x'}
+        old_snapshot, new_snapshot = snapshot(self.OLD), snapshot(new)
+        folders = set(old_snapshot.tree).union(new_snapshot.tree)
+        expected = [(description, f_old, f_new)
+                    for description, result in cerber.compare_digests(
+                        cerber.snapshot_files(old_snapshot, folders),
+                        cerber.snapshot_files(new_snapshot, folders))
+                    for f_old, f_new in result]
+        self.assertCountEqual(cerber.iter_snapshot_changes(old_snapshot, new_snapshot),
+                              expected)
+
+    def test_copies_in_unchanged_folders(self):
+        """
+        Kopie tego samego pliku w niezmienionych folderach nie są raportowane,
+        inaczej niż przez compare_digests() dla wszystkich plików.
+        """
+        old = {('root/a', 'x'): 'same', ('root/b', 'y'): 'same', ('root/c', 'z'): 'z'}
+        new = dict(old)
+        new['root/c', 'z'] = 'z changed'
+        old_snapshot, new_snapshot = snapshot(old), snapshot(new)
+        full = [(description, f_old and f_old[3], f_new and f_new[3])
+                for description, result in cerber.compare_digests(
+                    cerber.snapshot_files(old_snapshot, old_snapshot.tree),
+                    cerber.snapshot_files(new_snapshot, new_snapshot.tree))
+                for f_old, f_new in result]
+        self.assertCountEqual(full, [('changed files', None, 'c/z'),
+                                     ('moved and renamed files', 'a/x', 'b/y'),
+                                     ('moved and renamed files', 'b/y', 'a/x')])
+        self.assertEqual(self.changes(new, old), [('changed files', None, 'c/z')])
+
+    def test_same_as_compare_digests_on_all_files(self):
+        """
+        Raporty są takie jak z compare_digests() dla wszystkich plików, bez par
+        plików, z których oba są w niezmienionych folderach.
+        """
+        rng = random.Random(0)
+        for _ in range(100):
+            old = {(f'root/{rng.choice("abcde")}', f'f{i}'): str(rng.randrange(6))
+                   for i in range(rng.randrange(1, 12))}
+            new = dict(old)
+            for _ in range(rng.randrange(1, 4)):
+                key = rng.choice(list(old))
+                change = rng.randrange(3)
+                if change == 0:
+                    new.pop(key, None)
+                elif change == 1:
+                    new[key] = str(rng.randrange(6))
+                else:
+                    new[f'root/{rng.choice("abcdef")}', f'g{rng.randrange(4)}'] = old[key]
+            old_snapshot, new_snapshot = snapshot(old), snapshot(new)
+            unchanged = set(old_snapshot.tree) - set(cerber.changed_folders(old_snapshot,
+                                                                              new_snapshot))
+            expected = [(description, f_old, f_new)
+                        for description, result in cerber.compare_digests(
+                            cerber.snapshot_files(old_snapshot, old_snapshot.tree),
+                            cerber.snapshot_files(new_snapshot, new_snapshot.tree))
+                        for f_old, f_new in result
+                        if f_old is None or f_new is None
+                        or f_old[2] not in unchanged or f_new[2] not in unchanged]
+            with self.subTest(old=old, new=new):
+                self.assertCountEqual(
+                    cerber.iter_snapshot_changes(old_snapshot, new_snapshot), expected)
+
+
+def write_files(folder, files):
+    """Zapisuje pliki: słownik (folder względny, nazwa) -> treść."""
+    for (path, name), text in files.items():
+        os.makedirs(os.path.join(folder, path), exist_ok=True)
+        with open(os.path.join(folder, path, name), 'w', encoding='utf-8') as file:
+            file.write(text)
+
+
+def run_cerber(*args):
+    """Uruchamia cerber.py jako osobny program, zwraca standardowe wyjście."""
+    return subprocess.run([sys.executable, cerber.__file__, *args], check=True,
+                          capture_output=True, text=True).stdout
+
+
+class TestCreateDigestsAsync(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+        rng = random.Random(0)
+        write_files(self.folder, {
+            (os.path.join('.', *[f'd{rng.randrange(3)}' for _ in range(rng.randrange(4))]),
+             f'f{i}.txt'): 'x' * rng.choice([0, 1, 100, 5000]) + str(rng.randrange(5))
+            for i in range(60)})
+
+    def both(self, in_flight=cerber.ASYNC_IN_FLIGHT, **kwargs):
+        """Wyniki create_digests() i create_digests_async() (oraz słowniki stats)."""
+        stats, stats_async = {}, {}
+        expected = cerber.create_digests(self.folder, stats=stats, **kwargs)
+        result = asyncio.run(cerber.create_digests_async(self.folder, stats=stats_async,
+                                                         in_flight=in_flight, **kwargs))
+        return expected, result, stats, stats_async
+
+    def test_same_as_create_digests(self):
+        stats = {}
+        listing = cerber.create_digests(self.folder, stats=stats)
+        cache = cerber.digests_cache([(digest(full), name, path, full)
+                                      for _, name, path, full in listing[::2]], stats)
+        for kwargs in ({}, {'in_flight': 1}, {'use_mmap': True, 'block_size': 64},
+                       {'exclude': ('d1', '*0.txt')}, {'algorithm': 'sha256'},
+                       {'cache': cache}):
+            with self.subTest(**{key: value for key, value in kwargs.items()
+                                 if key != 'cache'}, cache='cache' in kwargs):
+                expected, result, stats, stats_async = self.both(**kwargs)
+                self.assertTrue(expected)
+                self.assertEqual(result, expected)
+                self.assertEqual(stats_async, stats)
+
+    def test_unreadable_folder(self):
+        unreadable = os.path.join(self.folder, 'd0')
+        scan_folder = cerber.scan_folder
+
+        def failing_scan_folder(folder_name, *args):
+            if folder_name == unreadable:
+                raise PermissionError(folder_name)
+            return scan_folder(folder_name, *args)
+
+        with mock.patch.object(cerber, 'scan_folder', failing_scan_folder):
+            expected, result, stats, stats_async = self.both()
+        self.assertFalse([full for *_, full in expected if full.startswith(unreadable)])
+        self.assertEqual(result, expected)
+        self.assertEqual(stats_async, stats)
+
+    def test_unreadable_file(self):
+        unreadable = cerber.create_digests(self.folder)[5][3]
+
+        def failing_open(file_name, *args, **kwargs):
+            if file_name == unreadable:
+                raise PermissionError(file_name)
+            return open(file_name, *args, **kwargs)
+
+        with mock.patch.object(cerber, 'open', failing_open, create=True):
+            with self.assertRaises(PermissionError):
+                cerber.create_digests(self.folder)
+            with self.assertRaises(PermissionError):
+                asyncio.run(cerber.create_digests_async(self.folder))
+
+
+class TestDigestsIndex(unittest.TestCase):
+
+    def test_update(self):
+        entries = [(digest(''), '__init__.py', f'p{i}', f'p{i}/__init__.py') for i in range(10)]
+        entries.append((digest('x'), 'x', 'p0', 'p0/x'))
+        index = cerber.DigestsIndex(entries)
+        removed = entries[2:8:2]
+        added = [(digest(''), 'empty', 'p3', 'p3/empty')]
+        index.update(removed, added)
+        expected = cerber.DigestsIndex([entry for entry in entries if entry not in removed]
+                                       + added)
+        for name in cerber.DigestsIndex.KEYS:
+            self.assertEqual({key: list(values) for key, values in getattr(index, name).items()},
+                             {key: list(values) for key, values in getattr(expected, name).items()})
+        self.assertEqual(list(index.with_digest(digest(''))),
+                         [entry for entry in entries + added
+                          if entry[0] == digest('') and entry not in removed])
+        index.update(removed=[entries[-1]])
+        self.assertEqual(len(index.with_digest(digest('x'))), 0)
+        self.assertNotIn(digest('x'), index.by_digest)
+
+
+class TestReports(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(0)
+        self.old_list = [(digest(str(i)), f'f{i}', f'p{i % 7}', f'p{i % 7}/f{i}')
+                         for i in range(100)]
+        self.new_list = [entry for entry in self.old_list if rng.random() < 0.7]
+        self.new_list += [(digest(f'x{i}'), f'f{i}', f'p{i % 7}', f'p{i % 7}/f{i}')
+                          for i in range(100, 140)]
+        self.new_list += [(entry[0], 'renamed' + entry[1], entry[2],
+                           entry[2] + '/renamed' + entry[1]) for entry in self.old_list[:30:3]]
+        rng.shuffle(self.new_list)
+        self.expected = [cerber.ReportWriter.record(*record) for record in sorted(
+            cerber.iter_changes(self.old_list, self.new_list), key=cerber.report_sort_key)]
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+
+    def write(self, format_name):
+        """Zapisuje raport z sortowaniem w porcjach po 7 rekordów, zwraca nazwę pliku."""
+        file_name = os.path.join(self.folder, 'report.' + format_name)
+        with mock.patch.object(cerber, 'REPORT_SORT_CHUNK', 7), \
+                mock.patch.object(cerber, '_dump_sorted_chunk',
+                                  wraps=cerber._dump_sorted_chunk) as dump:
+            count = cerber.write_changes(self.old_list, self.new_list, format_name,
+                                         file_name, sort=True)
+        self.assertEqual(count, len(self.expected))
+        self.assertGreater(dump.call_count, 2)  # rekordy są scalane z plików
+        return file_name
+
+    def test_jsonl(self):
+        with open(self.write('jsonl'), encoding='utf-8') as file:
+            self.assertEqual([json.loads(line) for line in file], self.expected)
+
+    def test_csv(self):
+        with open(self.write('csv'), encoding='utf-8', newline='') as file:
+            rows = list(csv.DictReader(file))
+        self.assertEqual(rows, [{field: value or '' for field, value in record.items()}
+                                for record in self.expected])
+
+    def test_external_sort(self):
+        rng = random.Random(1)
+        for n_records in (0, 1, 9, 10, 11, 100, 257):
+            records = [rng.randrange(50) for _ in range(n_records)]
+            with self.subTest(n_records=n_records):
+                self.assertEqual(list(cerber.external_sort(iter(records), None, 10)),
+                                 sorted(records))
+
+
+class TestMainDiff(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+
+    def test_same_as_compare_digests(self):
+        old = os.path.join(self.folder, 'old')
+        new = os.path.join(self.folder, 'new')
+        write_files(old, {('a', 'f'): 'f', ('b', 'g'): 'g', ('c', 'h'): 'h',
+                          ('e', 'k'): 'k'})
+        write_files(new, {('a', 'f'): 'f changed', ('a', 'gcopy'): 'g', ('b', 'g'): 'g',
+                          ('d', 'h'): 'h', ('e', 'k2'): 'k', ('e', 'new'): 'new'})
+        run_cerber(old)
+        run_cerber(new)
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            cerber.main_diff([old, new])
+
+        expected = io.StringIO()
+        old_snapshot, algorithm = cerber.load_snapshot(old)
+        new_snapshot, algorithm = cerber.load_snapshot(new)
+        folders = set(old_snapshot.tree).union(new_snapshot.tree)
+        with redirect_stdout(expected):
+            for description, result in cerber.compare_digests(
+                    cerber.snapshot_files(old_snapshot, folders),
+                    cerber.snapshot_files(new_snapshot, folders)):
+                cerber.print_report(description, result)
+        self.assertIn('b/g -> a/gcopy', expected.getvalue())
+        self.assertEqual(output.getvalue(), expected.getvalue())
+
+
+class TestFindDuplicates(unittest.TestCase):
+
+    FILES = {('a', 'x'): 'head' + 'A' * 20 + 'tail', ('b', 'x'): 'head' + 'A' * 20 + 'tail',
+             ('b', 'y'): 'head' + 'B' * 20 + 'tail', ('c', 'z'): 'head' + 'B' * 20 + 'tail',
+             ('c', 'short'): 'abc', ('d', 'short'): 'abc', ('d', 'unique'): 'unique'}
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+        write_files(self.folder, self.FILES)
+
+    def check(self):
+        duplicates, stages, total_size = cerber.find_duplicates(self.folder, part_size=4)
+        self.assertEqual(sorted(sorted(os.path.relpath(full, self.folder)
+                                       for digest, name, path, full in f_list)
+                                for f_list in duplicates),
+                         [['a/x', 'b/x'], ['b/y', 'c/z'], ['c/short', 'd/short']])
+        for f_list in duplicates:
+            for digest, name, path, full in f_list:
+                self.assertEqual(digest, cerber.create_digest(full))
+        return sum(n_bytes for description, n_files, n_bytes in stages), total_size
+
+    def test_bytes_read(self):
+        bytes_read, total_size = self.check()
+        self.assertLessEqual(bytes_read, total_size)
+        self.assertEqual(bytes_read, total_size - len(self.FILES['d', 'unique']))
+
+    def test_tails_not_in_memory(self):
+        with mock.patch.object(cerber, 'PARTIAL_DIGEST_MEMORY', 4):
+            bytes_read, total_size = self.check()
+        self.assertEqual(bytes_read, total_size - len(self.FILES['d', 'unique']) + 3 * 4)
+
+
+class TestWatchOptions(unittest.TestCase):
+
+    def test_watch_full_interval(self):
+        with tempfile.TemporaryDirectory() as folder:
+            write_files(folder, {('a', 'f'): 'f'})
+            argv = ['cerber.py', folder, '--watch', '--watch-full-interval', '5']
+            with mock.patch.object(sys, 'argv', argv), \
+                    mock.patch.object(cerber.Watcher, 'run') as run, \
+                    redirect_stdout(io.StringIO()):
+                cerber.main()
+        self.assertEqual(run.call_args.kwargs['full_interval'], 5.0)
+
+
+class TestCheckFolder(unittest.TestCase):
+
+    def test_copies_in_unchanged_folders(self):
+        """Tak jak TestSnapshotChanges.test_copies_in_unchanged_folders, ale dla cerber FOLDER."""
+        with tempfile.TemporaryDirectory() as folder:
+            write_files(folder, {('a', 'x'): 'same', ('b', 'y'): 'same', ('c', 'z'): 'z'})
+            run_cerber(folder)
+            write_files(folder, {('c', 'z'): 'z changed'})
+            output = run_cerber(folder)
+        self.assertIn('changed files', output)
+        self.assertIn(os.path.join('c', 'z'), output)
+        self.assertNotIn('moved and renamed files', output)
+
+
+class InterruptedCheckpoint(cerber.Checkpoint):
+    """Punkt kontrolny zapisujący każdy plik i przerywający po n_files plikach."""
+
+    def __init__(self, store, algorithm, n_files):
+        super().__init__(store, algorithm, interval=0)
+        self.n_files = n_files
+
+    def __call__(self, digests_and_names_list, stats):
+        super().__call__(digests_and_names_list, stats)
+        if len(digests_and_names_list) >= self.n_files:
+            raise KeyboardInterrupt
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+        self.files = os.path.join(self.folder, 'files')
+        write_files(self.files, {('.', str(i)): str(i) for i in range(4)})
+
+    def interrupt(self, store, algorithm, n_files):
+        with self.assertRaises(KeyboardInterrupt):
+            cerber.create_digests(self.files, algorithm=algorithm,
+                                  checkpoint=InterruptedCheckpoint(store, algorithm, n_files))
+
+    def test_resume_after_algorithm_change(self):
+        with cerber.DigestsStore(self.folder) as store:
+            self.interrupt(store, 'sha1', 3)
+            self.assertEqual(len(store.load_checkpoint('sha1')[0]), 3)
+        with cerber.DigestsStore(self.folder) as store:
+            self.assertEqual(store.load_checkpoint('sha256'), ([], {}))
+            self.interrupt(store, 'sha256', 1)
+        with cerber.DigestsStore(self.folder) as store:
+            done, done_stats = store.load_checkpoint('sha256')
+        self.assertEqual(len(done), 1)
+        for digest, name, path, full in done:
+            self.assertEqual(digest, cerber.create_digest(full, algorithm='sha256'))
+
+
+if __name__ == '__main__':
+    unittest.main()